@@ -0,0 +1,96 @@
+import json
+from collections import defaultdict
+
+from app import principals
+from app.db import pool_capacity, pool_in_use
+
+
+class AdmissionController:
+    # Límite global de requests en curso + límite por usuario + pool de conexiones lleno.
+    # key=None (sin usuario verificado: /auth/*, tokens que no están en cache) solo cuenta para el
+    # límite global. per_user=0 => sin límite por usuario.
+    # Se usa desde el event loop (un solo hilo): los contadores no necesitan lock.
+    def __init__(self, max_concurrent: int, per_user: int, retry_after: int):
+        self.max_concurrent = max_concurrent or pool_capacity()
+        self.per_user = per_user
+        self.retry_after = retry_after
+        self.active = 0
+        self.active_by_user = defaultdict(int)
+        self.admitted = 0
+        self.shed = 0
+
+    def try_enter(self, key: str | None) -> bool:
+        in_use = pool_in_use()
+        if (
+            self.active >= self.max_concurrent
+            or (key and self.per_user and self.active_by_user[key] >= self.per_user)
+            or (in_use is not None and in_use >= pool_capacity())
+        ):
+            self.shed += 1
+            return False
+        self.active += 1
+        if key:
+            self.active_by_user[key] += 1
+        self.admitted += 1
+        return True
+
+    def leave(self, key: str | None):
+        self.active -= 1
+        if not key:
+            return
+        self.active_by_user[key] -= 1
+        if not self.active_by_user[key]:
+            del self.active_by_user[key]
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "max_concurrent": self.max_concurrent,
+            "per_user": self.per_user,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "pool_in_use": pool_in_use(),
+            "pool_capacity": pool_capacity(),
+        }
+
+
+class AdmissionMiddleware:
+    # corta temprano con 503 en vez de dejar que los requests se encolen en el pool
+    def __init__(self, app, controller: AdmissionController, exempt=("/health", "/metrics")):
+        self.app = app
+        self.controller = controller
+        self.exempt = set(exempt)
+
+    def _principal(self, scope) -> str | None:
+        # solo el sub verificado (token en cache); un token desconocido no abre un cupo propio.
+        # Sin IP como clave: detrás del proxy todos los clientes llegan desde la misma dirección.
+        for name, value in scope.get("headers", []):
+            if name == b"authorization":
+                token = value.decode("latin-1").removeprefix("Bearer ").strip()
+                return principals.peek_sub(token)
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exempt or scope["method"] == "OPTIONS":
+            return await self.app(scope, receive, send)
+
+        key = self._principal(scope)
+        if not self.controller.try_enter(key):
+            return await self._reject(send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.leave(key)
+
+    async def _reject(self, send):
+        body = json.dumps({"detail": "Server busy, retry shortly"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(self.controller.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
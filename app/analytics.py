@@ -0,0 +1,299 @@
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, defaultdict
+from datetime import date
+from uuid import UUID
+
+from sqlalchemy import event
+from sqlmodel import Session
+
+from app import projection
+from app.config import settings
+from app.models import PayMethod, Transaction, TxType, User
+
+# Agregaciones ad hoc (GET /dashboard/aggregate) sobre una copia columnar en memoria:
+#  - por usuario: arrays (fecha ordinal, monto, tipo, cuenta, categoría, medio de pago, contraparte),
+#    ordenados por fecha => un rango es un bisect y el group by una pasada sobre arrays, sin hidratar entidades
+#  - se arma la primera vez que se consulta (opt-in: ANALYTICS_ENABLED), LRU acotado por ANALYTICS_MEMORY_MB
+#  - cada copia lleva la data_version que refleja; los movimientos nuevos se agregan después del commit
+#    (record_transactions) y cualquier otra escritura la descarta
+# Con el engine desactivado se arma una copia solo del rango pedido y no se guarda.
+
+TX_TYPES = [t.value for t in TxType]
+PAY_METHODS = [m.value for m in PayMethod]
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+GROUP_BY = ("day", "weekday", "month", "type", "account", "category", "payment_method", "counterparty")
+
+_COLUMNS = [
+    Transaction.transaction_date, Transaction.amount, Transaction.type, Transaction.account_id,
+    Transaction.category_id, Transaction.payment_method, Transaction.counterparty,
+]
+
+
+def _v(value):
+    return getattr(value, "value", value)
+
+
+class _Index:
+    # valores (uuid / texto) <-> códigos enteros; None = -1
+    def __init__(self):
+        self.values: list = []
+        self.codes: dict = {}
+
+    def code(self, value) -> int:
+        if value is None:
+            return -1
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def value(self, code: int):
+        return None if code < 0 else self.values[code]
+
+
+class Snapshot:
+    def __init__(self, version: int | None):
+        self.version = version
+        self.day = array("l")
+        self.amount = array("q")
+        self.type = array("b")
+        self.method = array("b")
+        self.account = array("l")
+        self.category = array("l")
+        self.counterparty = array("l")
+        self.accounts = _Index()
+        self.categories = _Index()
+        self.counterparties = _Index()
+
+    def _codes(self, row) -> tuple:
+        day, amount, tx_type, account_id, category_id, method, counterparty = row
+        method = _v(method)
+        return (
+            day.toordinal(), amount, TX_TYPES.index(_v(tx_type)),
+            PAY_METHODS.index(method) if method else -1,
+            self.accounts.code(account_id), self.categories.code(category_id),
+            self.counterparties.code(counterparty),
+        )
+
+    def _arrays(self) -> tuple:
+        return self.day, self.amount, self.type, self.method, self.account, self.category, self.counterparty
+
+    def extend(self, rows):
+        # rows ordenadas por fecha
+        arrays = self._arrays()
+        for row in rows:
+            for arr, value in zip(arrays, self._codes(row)):
+                arr.append(value)
+
+    def insert(self, rows):
+        # movimientos nuevos: casi siempre al final; los de fecha vieja se intercalan
+        arrays = self._arrays()
+        for row in sorted(rows, key=lambda r: r[0]):
+            codes = self._codes(row)
+            i = bisect_right(self.day, codes[0])
+            for arr, value in zip(arrays, codes):
+                arr.insert(i, value)
+
+    def nbytes(self) -> int:
+        data = sum(a.itemsize * len(a) for a in self._arrays())
+        # aproximado para las claves de los índices
+        keys = 100 * (len(self.accounts.values) + len(self.categories.values) + len(self.counterparties.values))
+        return data + keys
+
+    def _keys(self, group_by: str, lo: int, hi: int):
+        if group_by == "day":
+            return self.day[lo:hi]
+        if group_by == "weekday":
+            # date.fromordinal(1) es lunes
+            return [(d - 1) % 7 for d in self.day[lo:hi]]
+        if group_by == "month":
+            months = {}
+            out = []
+            for d in self.day[lo:hi]:
+                m = months.get(d)
+                if m is None:
+                    dt = date.fromordinal(d)
+                    m = months[d] = dt.year * 12 + dt.month - 1
+                out.append(m)
+            return out
+        column = {"type": self.type, "account": self.account, "category": self.category,
+                  "payment_method": self.method, "counterparty": self.counterparty}[group_by]
+        return column[lo:hi]
+
+    def _label(self, group_by: str, code: int):
+        if group_by == "day":
+            return date.fromordinal(code).isoformat()
+        if group_by == "weekday":
+            return WEEKDAYS[code]
+        if group_by == "month":
+            return f"{code // 12:04d}-{code % 12 + 1:02d}"
+        if group_by == "type":
+            return TX_TYPES[code]
+        if group_by == "payment_method":
+            return None if code < 0 else PAY_METHODS[code]
+        index = {"account": self.accounts, "category": self.categories, "counterparty": self.counterparties}[group_by]
+        value = index.value(code)
+        return str(value) if isinstance(value, UUID) else value
+
+    def aggregate(self, group_by: str, from_: date, to: date, types: list[str]) -> list[dict]:
+        # types obligatorio: sumar ingresos, gastos y pagos de tarjeta juntos mezcla signos y cuenta doble
+        lo = bisect_left(self.day, from_.toordinal())
+        hi = bisect_right(self.day, to.toordinal())
+        totals = defaultdict(int)
+        counts = defaultdict(int)
+        keys = self._keys(group_by, lo, hi)
+        wanted = {TX_TYPES.index(t) for t in types}
+        for key, amount, tx_type in zip(keys, self.amount[lo:hi], self.type[lo:hi]):
+            if tx_type in wanted:
+                totals[key] += amount
+                counts[key] += 1
+        out = [{"key": self._label(group_by, k), "total": totals[k], "count": counts[k]} for k in totals]
+        out.sort(key=lambda r: r["total"], reverse=True)
+        return out
+
+
+class SnapshotCache:
+    # LRU por usuario acotado por memoria (bytes aproximados de los arrays)
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: OrderedDict[UUID, Snapshot] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, user_id: UUID, version: int) -> Snapshot | None:
+        with self._lock:
+            snap = self._data.get(user_id)
+            if snap is None or snap.version != version:
+                self.misses += 1
+                return None
+            self._data.move_to_end(user_id)
+            self.hits += 1
+            return snap
+
+    def _drop(self, user_id: UUID):
+        snap = self._data.pop(user_id, None)
+        if snap is not None:
+            self._bytes -= snap.nbytes()
+
+    def put(self, user_id: UUID, snap: Snapshot):
+        size = snap.nbytes()
+        if size > self.budget:
+            return
+        with self._lock:
+            current = self._data.get(user_id)
+            # una escritura concurrente ya dejó una copia más nueva
+            if current is not None and current.version is not None and current.version > snap.version:
+                return
+            self._drop(user_id)
+            self._data[user_id] = snap
+            self._bytes += size
+            while self._bytes > self.budget:
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def patch(self, user_id: UUID, versions: list[int], rows: list[tuple] | None):
+        # rows=None: escritura que no se puede aplicar (recategorizar, borrar...) => se descarta la copia
+        with self._lock:
+            snap = self._data.get(user_id)
+            if snap is None or snap.version >= max(versions):
+                return
+            if rows is None or snap.version != min(versions) - 1:
+                self._drop(user_id)
+                return
+            self._bytes -= snap.nbytes()
+            snap.insert(rows)
+            snap.version = max(versions)
+            self._bytes += snap.nbytes()
+            while self._bytes > self.budget and self._data:
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def invalidate(self, user_id: UUID):
+        with self._lock:
+            self._drop(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        return {"users": len(self._data), "bytes": self._bytes, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions}
+
+
+snapshots = SnapshotCache(settings.ANALYTICS_MEMORY_MB * 1024 * 1024)
+
+
+def build(session: Session, user_id: UUID, from_: date | None = None, to: date | None = None) -> Snapshot:
+    # una sola sentencia (users LEFT JOIN transactions): la versión y las filas son del mismo instante
+    on = (Transaction.user_id == User.id)
+    if from_:
+        on &= Transaction.transaction_date >= from_
+    if to:
+        on &= Transaction.transaction_date <= to
+    result = session.exec(
+        projection.select(User.data_version, *_COLUMNS)
+        .select_from(User)
+        .outerjoin(Transaction, on)
+        .where(User.id == user_id)
+        .order_by(Transaction.transaction_date)
+    ).all()
+    snap = Snapshot(result[0][0] if result else None)
+    snap.extend(row[1:] for row in result if row[1] is not None)
+    return snap
+
+
+def snapshot(session: Session, user_id: UUID, version: int, from_: date, to: date) -> Snapshot:
+    if not settings.ANALYTICS_ENABLED:
+        return build(session, user_id, from_, to)
+    snap = snapshots.get(user_id, version)
+    if snap is None:
+        snap = build(session, user_id)
+        snapshots.put(user_id, snap)
+    return snap
+
+
+# Parches después del commit. versions.bump deja en session.info["bumped"] las versiones nuevas
+# de cada usuario; record_transactions (track) asocia a cada versión los movimientos que la generaron.
+
+def track(session: Session, txs: list[Transaction]):
+    if not settings.ANALYTICS_ENABLED:
+        return
+    bumped = session.info.get("bumped", {})
+    recorded = session.info.setdefault("analytics", {})
+    by_user = defaultdict(list)
+    for t in txs:
+        # tuplas planas: después del commit las entidades quedan expiradas
+        by_user[t.user_id].append(tuple(getattr(t, c.key) for c in _COLUMNS))
+    for user_id, rows in by_user.items():
+        if bumped.get(user_id):
+            recorded[(user_id, bumped[user_id][-1])] = rows
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    bumped = session.info.pop("bumped", {})
+    recorded = session.info.pop("analytics", {})
+    if not settings.ANALYTICS_ENABLED:
+        return
+    for user_id, versions in bumped.items():
+        rows = []
+        for v in versions:
+            if (user_id, v) not in recorded:
+                rows = None
+                break
+            rows.extend(recorded[(user_id, v)])
+        snapshots.patch(user_id, versions, rows)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop("bumped", None)
+    session.info.pop("analytics", None)
@@ -0,0 +1,164 @@
+import re
+import time
+from dataclasses import dataclass
+from uuid import UUID
+
+from sqlalchemy import func, literal, update
+from sqlmodel import Session, select
+
+from app.config import settings
+from app.models import Category, CategoryRule, Transaction
+from app.principals import TTLCache
+from app.search import unaccent
+
+# Reglas de categorización por usuario.
+#  - en memoria: todas las reglas del usuario compiladas en un Matcher (cache con TTL);
+#    un único regex con todos los patrones descarta de una los movimientos sin ningún texto conocido
+#  - en la base: cada regla es un UPDATE ... WHERE (recategorize), nunca fila por fila
+# Una regla solo asigna categorías del mismo tipo que el movimiento (income / expense).
+
+
+def normalize(value: str | None) -> str:
+    return unaccent(value.lower()) if value else ""
+
+
+def _v(value):
+    return getattr(value, "value", value)
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    category_id: UUID
+    category_type: str
+    counterparty: str
+    description: str
+    min_amount: int | None
+    max_amount: int | None
+    account_id: UUID | None
+    payment_method: str | None
+
+    def matches(self, tx_type, amount, account_id, payment_method, counterparty: str, description: str) -> bool:
+        return (
+            self.category_type == _v(tx_type)
+            and (self.min_amount is None or amount >= self.min_amount)
+            and (self.max_amount is None or amount <= self.max_amount)
+            and (self.account_id is None or self.account_id == account_id)
+            and (self.payment_method is None or self.payment_method == _v(payment_method))
+            and self.counterparty in counterparty
+            and self.description in description
+        )
+
+
+class Matcher:
+    def __init__(self, rules: list[CompiledRule]):
+        # rules ya viene ordenado por prioridad
+        self.rules = rules
+        self.plain = [r for r in rules if not r.counterparty and not r.description]
+        patterns = {p for r in rules for p in (r.counterparty, r.description) if p}
+        self.any_pattern = re.compile("|".join(map(re.escape, patterns))) if patterns else None
+
+    def match(self, tx_type, amount, account_id, payment_method, counterparty, description) -> UUID | None:
+        cp = normalize(counterparty)
+        desc = normalize(description)
+        has_text = self.any_pattern and (self.any_pattern.search(cp) or self.any_pattern.search(desc))
+        for rule in self.rules if has_text else self.plain:
+            if rule.matches(tx_type, amount, account_id, payment_method, cp, desc):
+                return rule.category_id
+        return None
+
+
+_matchers = TTLCache(settings.RULES_CACHE_SIZE)
+
+
+def load_rules(session: Session, user_id: UUID) -> list[tuple[CategoryRule, str]]:
+    return session.exec(
+        select(CategoryRule, Category.type)
+        .join(Category, Category.id == CategoryRule.category_id)
+        .where(CategoryRule.user_id == user_id)
+        .order_by(CategoryRule.priority, CategoryRule.created_at)
+    ).all()
+
+
+def matcher_for(session: Session, user_id: UUID) -> Matcher:
+    matcher = _matchers.get(user_id)
+    if matcher is None:
+        matcher = Matcher([
+            CompiledRule(
+                category_id=rule.category_id,
+                category_type=_v(category_type),
+                counterparty=normalize(rule.counterparty),
+                description=normalize(rule.description),
+                min_amount=rule.min_amount,
+                max_amount=rule.max_amount,
+                account_id=rule.account_id,
+                payment_method=_v(rule.payment_method),
+            )
+            for rule, category_type in load_rules(session, user_id)
+        ])
+        _matchers.set(user_id, matcher, time.time() + settings.RULES_CACHE_TTL_SEC)
+    return matcher
+
+
+def invalidate(user_id: UUID):
+    _matchers.pop(user_id)
+
+
+def apply(session: Session, user_id: UUID, txs: list[Transaction]) -> int:
+    # completa category_id (in place) en los movimientos que no lo traen; devuelve cuántos
+    pending = [p for p in txs if not p.category_id and _v(p.type) in ("income", "expense")]
+    if not pending:
+        return 0
+    matcher = matcher_for(session, user_id)
+    if not matcher.rules:
+        return 0
+    done = 0
+    for p in pending:
+        category_id = matcher.match(p.type, p.amount, p.account_id, p.payment_method, p.counterparty, p.description)
+        if category_id:
+            p.category_id = category_id
+            done += 1
+    return done
+
+
+def _contains(column, pattern: str):
+    escaped = pattern.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    text = func.f_unaccent(func.lower(func.coalesce(column, literal(""))))
+    return text.like(f"%{escaped}%", escape="\\")
+
+
+def rule_conditions(rule: CategoryRule, category_type) -> list:
+    conditions = [Transaction.user_id == rule.user_id, Transaction.type == _v(category_type)]
+    if rule.min_amount is not None:
+        conditions.append(Transaction.amount >= rule.min_amount)
+    if rule.max_amount is not None:
+        conditions.append(Transaction.amount <= rule.max_amount)
+    if rule.account_id:
+        conditions.append(Transaction.account_id == rule.account_id)
+    if rule.payment_method:
+        conditions.append(Transaction.payment_method == rule.payment_method)
+    if rule.counterparty:
+        conditions.append(_contains(Transaction.counterparty, normalize(rule.counterparty)))
+    if rule.description:
+        conditions.append(_contains(Transaction.description, normalize(rule.description)))
+    return conditions
+
+
+def recategorize(session: Session, user_id: UUID, only_uncategorized: bool, extra_conditions: list) -> int:
+    # un UPDATE por regla. Solo sin categoría: en orden de prioridad y cada UPDATE toca solo
+    # lo que sigue en NULL. Sobrescribiendo: de menor a mayor prioridad, la última en escribir gana.
+    rules = load_rules(session, user_id)
+    if not only_uncategorized:
+        rules = list(reversed(rules))
+    changed = 0
+    for rule, category_type in rules:
+        conditions = rule_conditions(rule, category_type) + extra_conditions
+        if only_uncategorized:
+            conditions.append(Transaction.category_id.is_(None))
+        else:
+            conditions.append((Transaction.category_id != rule.category_id) | Transaction.category_id.is_(None))
+        res = session.exec(
+            update(Transaction).where(*conditions).values(category_id=rule.category_id)
+            .execution_options(synchronize_session=False)
+        )
+        changed += res.rowcount
+    return changed
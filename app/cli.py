@@ -0,0 +1,135 @@
+import argparse
+import json
+from datetime import date
+from uuid import UUID
+
+from sqlmodel import Session
+
+from app import ledger, migrations, partitions, rollups
+from app.migrations.report import index_report
+from app.db import engine
+
+
+def migrate(args):
+    if args.status:
+        todo = migrations.pending(engine)
+        for version, name, _ in todo:
+            print(f"pending {version:04d}_{name}")
+        print(f"migrations: {len(todo)} pending")
+        return 1 if todo else 0
+    applied = migrations.migrate(engine)
+    print(f"migrations: {len(applied)} applied")
+    return 0
+
+
+def index_report_cmd(args):
+    report = index_report(engine)
+    print(json.dumps(report, indent=2))
+    return 1 if report["missing"] else 0
+
+
+def ledger_rebuild(args):
+    with Session(engine) as session:
+        mismatches = ledger.rebuild(session, fix=not args.check)
+    for m in mismatches:
+        print(json.dumps(m))
+    action = "found" if args.check else "fixed"
+    print(f"ledger: {len(mismatches)} account(s) {action}")
+    return 1 if args.check and mismatches else 0
+
+
+def rollups_rebuild(args):
+    with Session(engine) as session:
+        count = rollups.rebuild(session, user_id=args.user)
+    print(f"rollups: rebuilt {count} user(s)")
+    return 0
+
+
+def _partitions_supported() -> bool:
+    if not partitions.supported(engine):
+        print(f"partitions: not supported on {engine.dialect.name}, nothing to do")
+        return False
+    return True
+
+
+def partitions_setup(args):
+    if not _partitions_supported():
+        return 0
+    created = partitions.setup(engine, args.granularity, args.ahead)
+    print(f"partitions: {len(created)} created" if created else "partitions: transactions already partitioned")
+    return 0
+
+
+def partitions_ensure(args):
+    if not _partitions_supported():
+        return 0
+    created = partitions.ensure(engine, args.ahead)
+    for name in created:
+        print(f"created {name}")
+    print(f"partitions: {len(created)} created")
+    return 0
+
+
+def partitions_archive(args):
+    if not _partitions_supported():
+        return 0
+    done = partitions.archive(engine, args.before, args.tablespace)
+    for name in done:
+        print(f"archived {name}")
+    print(f"partitions: {len(done)} archived")
+    return 0
+
+
+def partitions_status(args):
+    if not _partitions_supported():
+        return 0
+    with engine.connect() as conn:
+        parts = partitions.partitions(conn) if partitions.is_partitioned(conn) else []
+    for p in parts:
+        print(json.dumps(p, default=str))
+    print(f"partitions: {len(parts)}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("migrate", help="apply pending schema migrations")
+    p.add_argument("--status", action="store_true", help="only list pending migrations")
+    p.set_defaults(func=migrate)
+
+    p = sub.add_parser("index-report", help="report missing, unexpected and unused indexes")
+    p.set_defaults(func=index_report_cmd)
+
+    p = sub.add_parser("ledger-rebuild", help="recompute account balances from transactions")
+    p.add_argument("--check", action="store_true", help="only report differences, do not write")
+    p.set_defaults(func=ledger_rebuild)
+
+    p = sub.add_parser("rollups-rebuild", help="backfill monthly_rollups from transactions")
+    p.add_argument("--user", type=UUID, default=None, help="only this user id")
+    p.set_defaults(func=rollups_rebuild)
+
+    p = sub.add_parser("partitions-setup", help="convert transactions into a range-partitioned table (postgres)")
+    p.add_argument("--granularity", choices=partitions.GRANULARITIES, default="year")
+    p.add_argument("--ahead", type=int, default=1, help="future periods to create")
+    p.set_defaults(func=partitions_setup)
+
+    p = sub.add_parser("partitions-ensure", help="create upcoming transactions partitions (postgres)")
+    p.add_argument("--ahead", type=int, default=1, help="future periods to create")
+    p.set_defaults(func=partitions_ensure)
+
+    p = sub.add_parser("partitions-archive", help="compact old partitions, optionally into a cold tablespace (postgres)")
+    p.add_argument("--before", type=date.fromisoformat, required=True, help="partitions ending on or before this date")
+    p.add_argument("--tablespace", default=None)
+    p.set_defaults(func=partitions_archive)
+
+    p = sub.add_parser("partitions-status", help="list transactions partitions (postgres)")
+    p.set_defaults(func=partitions_status)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -13,10 +13,72 @@ class Settings(BaseSettings):
     DATABASE_URL: str
     JWT_SECRET: str
 
+    # pool de conexiones (en SQLite se ignoran tamaño/overflow/timeouts)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SEC: int = 5
+    DB_POOL_RECYCLE_SEC: int = 1800
+    DB_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 0  # 0 = sin límite
+
+    # réplicas de lectura (URLs separadas por coma); vacío = todo va al primario
+    DB_REPLICA_URLS: str = ""
+    DB_REPLICA_RETRY_SEC: int = 30
+
+    # control de admisión: 0 => DB_POOL_SIZE + DB_MAX_OVERFLOW
+    ADMISSION_MAX_CONCURRENT: int = 0
+    # por usuario verificado, muy por encima de los requests en paralelo de un cliente normal; 0 = sin límite
+    ADMISSION_PER_USER: int = 32
+    ADMISSION_RETRY_AFTER_SEC: int = 1
+
+    # True: routers con AsyncSession (asyncpg en Postgres, aiosqlite en local)
+    DB_ASYNC: bool = False
+
+    # instrumentación: header Server-Timing y log de queries lentas (logger app.sql.slow)
+    SERVER_TIMING: bool = True
+    SLOW_QUERY_MS: int = 200  # 0 = sin log
+
     # defaults seguros
     JWT_ALG: str = "HS256"
     JWT_EXPIRE_MIN: int = 60 * 24 * 30  # 30 días
 
+    # bcrypt: costo y pool dedicado (workers + cola); saturado => 503 con Retry-After
+    BCRYPT_ROUNDS: int = 12
+    PWD_WORKERS: int = 2
+    PWD_QUEUE: int = 8
+    PWD_RETRY_AFTER_SEC: int = 2
+
+    # cache de tokens/usuarios autenticados (0 = desactivado)
+    AUTH_CACHE_SIZE: int = 10000
+    AUTH_CACHE_TTL_SEC: int = 60
+    # reglas de categorización compiladas por usuario (0 = desactivado)
+    RULES_CACHE_SIZE: int = 10000
+    RULES_CACHE_TTL_SEC: int = 60
+
+    # GET /dashboard/aggregate: copia columnar en memoria por usuario (False = se arma por request)
+    ANALYTICS_ENABLED: bool = False
+    ANALYTICS_MEMORY_MB: int = 64
+
+    # reportes en segundo plano (POST /reports): pool propio, cola acotada y límite por usuario
+    REPORT_WORKERS: int = 2
+    REPORT_QUEUE: int = 16
+    REPORT_PER_USER: int = 2
+    REPORT_RETRY_AFTER_SEC: int = 5
+    REPORT_RESULT_TTL_SEC: int = 3600
+    # tamaño máximo de un resultado y de todos los terminados en memoria (se descartan los más viejos)
+    REPORT_RESULT_MAX_MB: int = 8
+    REPORT_MEMORY_MB: int = 64
+    REPORT_EXPORT_MAX_ROWS: int = 20000
+    # True: los jobs se guardan en report_jobs (sobreviven a un reinicio y se ven desde cualquier proceso)
+    REPORT_DURABLE: bool = False
+    REPORT_JOB_TIMEOUT_SEC: int = 900
+
+    # paginación de GET /transactions
+    TX_PAGE_SIZE: int = 100
+    TX_PAGE_MAX: int = 500
+    BULK_IMPORT_MAX_ROWS: int = 10000
+    OPERATIONS_BATCH_MAX: int = 1000
+
 
 settings = Settings()
 
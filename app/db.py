@@ -1,13 +1,108 @@
-from sqlmodel import SQLModel, create_engine, Session
+from uuid import UUID
+
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.config import settings
+from app.metrics import instrument_engine
+from app.replicas import ReplicaSet
+from app.search import unaccent
 from app import models  # <-- IMPORTANTE: asegura que se registren en metadata
 
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+def engine_options(url: str, is_async: bool = False) -> dict:
+    opts = {"pool_pre_ping": settings.DB_PRE_PING}
+    if url.startswith("sqlite"):
+        return opts
+    opts.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SEC,
+        pool_recycle=settings.DB_POOL_RECYCLE_SEC,
+    )
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        ms = settings.DB_STATEMENT_TIMEOUT_MS
+        if is_async:
+            opts["connect_args"] = {"server_settings": {"statement_timeout": str(ms)}}
+        else:
+            opts["connect_args"] = {"options": f"-c statement_timeout={ms}"}
+    return opts
+
+def pool_capacity() -> int:
+    return settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+
+def _sqlite_functions(dbapi_connection, connection_record):
+    # en Postgres f_unaccent la crea la migración de búsqueda
+    dbapi_connection.create_function("f_unaccent", 1, unaccent, deterministic=True)
+
+def prepare_engine(engine):
+    instrument_engine(engine)
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _sqlite_functions)
+
+engine = create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL))
+prepare_engine(engine)
+
+def async_url(url: str) -> str:
+    # postgres -> asyncpg, sqlite -> aiosqlite
+    scheme, rest = url.split("://", 1)
+    driver = scheme.split("+", 1)[0]
+    if driver in ("postgres", "postgresql"):
+        return f"postgresql+asyncpg://{rest}"
+    if driver == "sqlite":
+        return f"sqlite+aiosqlite://{rest}"
+    return url
 
-def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
+# solo se crea si DB_ASYNC está activo (requiere asyncpg / aiosqlite)
+async_engine = create_async_engine(
+    async_url(settings.DATABASE_URL), **engine_options(settings.DATABASE_URL, is_async=True)
+) if settings.DB_ASYNC else None
+if async_engine:
+    prepare_engine(async_engine.sync_engine)
+
+replica_urls = [u.strip() for u in settings.DB_REPLICA_URLS.split(",") if u.strip()]
+replicas = ReplicaSet(
+    [create_async_engine(async_url(u), **engine_options(u, is_async=True)) for u in replica_urls]
+    if settings.DB_ASYNC else
+    [create_engine(u, **engine_options(u)) for u in replica_urls],
+    retry_after=settings.DB_REPLICA_RETRY_SEC,
+)
+for replica in replicas.engines:
+    prepare_engine(getattr(replica, "sync_engine", replica))
+
+def pool_in_use() -> int | None:
+    pool = (async_engine.sync_engine if async_engine else engine).pool
+    checkedout = getattr(pool, "checkedout", None)
+    return checkedout() if checkedout else None
 
 def get_session():
     with Session(engine) as session:
         yield session
+
+async def get_async_session():
+    # expire_on_commit=False: la respuesta se serializa fuera del greenlet, sin lazy loads
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+def upsert(session: Session, model, rows: list[dict], keys: list[str], set_):
+    # INSERT ... ON CONFLICT DO UPDATE (postgres / sqlite)
+    # set_ recibe la pseudo-tabla "excluded" y devuelve las columnas a actualizar
+    if not rows:
+        return
+    dialect = session.get_bind().dialect.name
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    stmt = insert(model).values(rows)
+    stmt = stmt.on_conflict_do_update(index_elements=keys, set_=set_(stmt.excluded))
+    session.exec(stmt)
+
+def lock_user(session: Session, *user_ids: UUID):
+    # Postgres: advisory lock por usuario hasta el fin de la transacción. Lo toman las escrituras
+    # de saldos/rollups antes de tocar esas filas y los recálculos (leer todo + reescribir) antes de
+    # leer: un recálculo no pisa una escritura concurrente. Orden fijo => sin deadlocks entre usuarios.
+    # SQLite: no-op (la base entera se bloquea para escribir).
+    if session.get_bind().dialect.name != "postgresql":
+        return
+    for user_id in sorted(set(user_ids)):
+        session.exec(select(func.pg_advisory_xact_lock(int.from_bytes(user_id.bytes[:8], "big", signed=True))))
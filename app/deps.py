@@ -1,27 +1,159 @@
-from fastapi import Depends, HTTPException
+from uuid import UUID
+
+from fastapi import Depends, HTTPException, Request
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy.exc import DBAPIError
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.db import get_session
+from app import metrics, principals, versions
+from app.db import get_async_session, get_session, replicas
 from app.models import User
 from app.security import decode_token
 
 bearer = HTTPBearer(auto_error=True)
 
+def _user_id(token: str) -> UUID:
+    # cache en proceso: evita verificar la firma en casi todos los requests
+    payload = principals.get_claims(token)
+    if payload is None:
+        try:
+            payload = decode_token(token)
+            if not payload.get("sub"):
+                raise ValueError("Missing sub")
+        except Exception:
+            raise HTTPException(status_code=401, detail="Invalid or expired token")
+        principals.put_claims(token, payload)
+
+    try:
+        return UUID(payload["sub"])
+    except ValueError:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
 def get_current_user(
     creds: HTTPAuthorizationCredentials = Depends(bearer),
     session: Session = Depends(get_session),
 ) -> User:
-    token = creds.credentials
+    with metrics.span("auth"):
+        user_id = _user_id(creds.credentials)
+        user = principals.get_user(user_id)
+        if user:
+            return user
+
+        user = session.exec(select(User).where(User.id == user_id)).first()
+        if not user:
+            raise HTTPException(status_code=401, detail="User not found")
+        principals.put_user(user)
+        return user
+
+async def get_current_user_async(
+    creds: HTTPAuthorizationCredentials = Depends(bearer),
+    session: AsyncSession = Depends(get_async_session),
+) -> User:
+    with metrics.span("auth"):
+        user_id = _user_id(creds.credentials)
+        user = principals.get_user(user_id)
+        if user:
+            return user
+
+        user = (await session.exec(select(User).where(User.id == user_id))).first()
+        if not user:
+            raise HTTPException(status_code=401, detail="User not found")
+        principals.put_user(user)
+        return user
+
+def _check_etag(request: Request, user_id: UUID, version: int):
+    tag = versions.etag(user_id, version)
+    if versions.matches(request.headers.get("if-none-match"), tag):
+        raise HTTPException(status_code=304, headers={"ETag": tag})
+    request.state.etag = tag
+
+def conditional_get(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+):
+    # una sola consulta; si el cliente ya tiene esta versión => 304 antes de correr el handler
+    version = session.exec(select(User.data_version).where(User.id == current_user.id)).one()
+    _check_etag(request, current_user.id, version)
+    return version
+
+async def conditional_get_async(
+    request: Request,
+    current_user: User = Depends(get_current_user_async),
+    session: AsyncSession = Depends(get_async_session),
+):
+    version = (await session.exec(select(User.data_version).where(User.id == current_user.id))).one()
+    _check_etag(request, current_user.id, version)
+    return version
+
+# Lecturas por réplica. Read-your-writes: la versión de datos del usuario se lee del primario
+# (conditional_get); si la réplica todavía no la tiene (lag) la lectura va al primario.
+
+def _replica_session(user_id: UUID, version: int) -> Session | None:
+    replica = replicas.pick()
+    if replica is None:
+        return None
+    session = Session(replica, info={"replica": True})
     try:
-        payload = decode_token(token)
-        user_id = payload.get("sub")
-        if not user_id:
-            raise ValueError("Missing sub")
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid or expired token")
+        seen = session.exec(select(User.data_version).where(User.id == user_id)).first()
+    except DBAPIError:
+        session.close()
+        replicas.mark_down(replica)
+        return None
+    if seen is None or seen < version:
+        session.close()
+        replicas.fallback()
+        return None
+    return session
+
+def get_read_session(
+    version: int = Depends(conditional_get),
+    current_user: User = Depends(get_current_user),
+    primary: Session = Depends(get_session),
+):
+    # sin réplica: la misma sesión del primario que usó la autenticación (una sola conexión por request)
+    if not replicas.engines:
+        yield primary
+        return
+    # con réplica: se devuelve al pool la conexión del primario antes de tomar la de la réplica
+    primary.close()
+    session = _replica_session(current_user.id, version)
+    if session is None:
+        yield primary
+        return
+    with session:
+        yield session
+
+async def _replica_session_async(user_id: UUID, version: int) -> AsyncSession | None:
+    replica = replicas.pick()
+    if replica is None:
+        return None
+    session = AsyncSession(replica, expire_on_commit=False, info={"replica": True})
+    try:
+        seen = (await session.exec(select(User.data_version).where(User.id == user_id))).first()
+    except DBAPIError:
+        await session.close()
+        replicas.mark_down(replica)
+        return None
+    if seen is None or seen < version:
+        await session.close()
+        replicas.fallback()
+        return None
+    return session
 
-    user = session.exec(select(User).where(User.id == user_id)).first()
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
-    return user
+async def get_read_session_async(
+    version: int = Depends(conditional_get_async),
+    current_user: User = Depends(get_current_user_async),
+    primary: AsyncSession = Depends(get_async_session),
+):
+    if not replicas.engines:
+        yield primary
+        return
+    await primary.close()
+    session = await _replica_session_async(current_user.id, version)
+    if session is None:
+        yield primary
+        return
+    async with session:
+        yield session
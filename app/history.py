@@ -0,0 +1,151 @@
+import calendar
+from datetime import date, timedelta
+
+from sqlalchemy import case, func
+from sqlmodel import Session, select
+
+from app import ledger, rollups
+from app.db import lock_user, upsert
+from app.models import Account, BalanceCheckpoint, MonthlyRollup, Transaction
+
+# Historial de saldo de una cuenta:
+#  - saldo de apertura = último cierre de mes guardado (balance_checkpoints) + movimientos del mes en curso;
+#    los cierres que faltan se completan desde monthly_rollups (un registro por mes, no por movimiento)
+#  - dentro del rango, suma acumulada con window function sobre los totales por día
+# El costo depende del largo del rango, no de la antigüedad de la cuenta.
+
+MAX_POINTS = 1000
+# límite inferior de `from` en el historial (el mes anterior a 0001-01 no existe)
+MIN_DATE = date(1900, 1, 1)
+
+
+def _v(value):
+    return getattr(value, "value", value)
+
+
+def _signed(acc: Account, type_col, amount_col):
+    signs = ledger.BALANCE_SIGNS[_v(acc.type)]
+    # type_col == t: el parámetro va con el tipo de la columna (enum txtype en Postgres; asyncpg no castea VARCHAR)
+    return case(*((type_col == t, sign) for t, sign in signs.items()), else_=0) * amount_col
+
+
+def _prev_month(d: date) -> date:
+    return (d.replace(day=1) - timedelta(days=1)).replace(day=1)
+
+
+def _last_checkpoint(session: Session, acc: Account, month: date):
+    return session.exec(
+        select(BalanceCheckpoint.month, BalanceCheckpoint.balance)
+        .where(BalanceCheckpoint.account_id == acc.id, BalanceCheckpoint.month <= month)
+        .order_by(BalanceCheckpoint.month.desc())
+        .limit(1)
+    ).first()
+
+
+def month_end_balance(session: Session, acc: Account, month: date) -> int:
+    # saldo al cierre de `month` (primer día del mes)
+    last = _last_checkpoint(session, acc, month)
+    if last and last[0] == month:
+        return last[1]
+
+    # los cierres calculados se guardan: con el lock (como las escrituras del ledger) se leen
+    # cierres, rollups y saldo inicial después de cualquier movimiento retroactivo en curso
+    replica = session.info.get("replica")
+    if not replica:
+        lock_user(session, acc.user_id)
+        session.refresh(acc)
+        last = _last_checkpoint(session, acc, month)
+
+    balance = last[1] if last else int(acc.initial_balance)
+    query = (
+        select(MonthlyRollup.month, func.sum(_signed(acc, MonthlyRollup.type, MonthlyRollup.total)))
+        .where(MonthlyRollup.account_id == acc.id, MonthlyRollup.month <= month)
+        .group_by(MonthlyRollup.month)
+        .order_by(MonthlyRollup.month)
+    )
+    if last:
+        query = query.where(MonthlyRollup.month > last[0])
+
+    checkpoints = {}
+    for m, total in session.exec(query).all():
+        balance += int(total or 0)
+        checkpoints[m] = balance
+    checkpoints[month] = balance
+
+    # en una réplica no se escribe: se calcula y listo
+    if not replica:
+        rows = [{"account_id": acc.id, "month": m, "user_id": acc.user_id, "balance": v} for m, v in checkpoints.items()]
+        upsert(session, BalanceCheckpoint, rows, ["account_id", "month"], lambda excluded: {"balance": excluded.balance})
+        session.commit()
+    return balance
+
+
+def opening_balance(session: Session, acc: Account, day: date) -> int:
+    # saldo antes de los movimientos de `day`
+    start = rollups.month_start(day)
+    balance = month_end_balance(session, acc, _prev_month(start))
+    if day > start:
+        partial = session.exec(
+            select(func.sum(_signed(acc, Transaction.type, Transaction.amount))).where(
+                Transaction.account_id == acc.id,
+                Transaction.transaction_date >= start,
+                Transaction.transaction_date < day,
+            )
+        ).one()
+        balance += int(partial or 0)
+    return balance
+
+
+def _period_end(d: date, granularity: str) -> date:
+    # sin pasar de date.max (9999-12-31)
+    if granularity == "day":
+        return d
+    if granularity == "week":
+        return d + timedelta(days=min(6 - d.weekday(), (date.max - d).days))
+    return d.replace(day=calendar.monthrange(d.year, d.month)[1])
+
+
+def point_count(from_: date, to: date, granularity: str) -> int:
+    if granularity == "day":
+        return (to - from_).days + 1
+    if granularity == "week":
+        return (to - (from_ - timedelta(days=from_.weekday()))).days // 7 + 1
+    return (to.year - from_.year) * 12 + (to.month - from_.month) + 1
+
+
+def periods(from_: date, to: date, granularity: str) -> list[tuple[date, date]]:
+    out = []
+    start = from_
+    while start <= to:
+        end = min(_period_end(start, granularity), to)
+        out.append((start, end))
+        if end == to:
+            break
+        start = end + timedelta(days=1)
+    return out
+
+
+def balance_history(session: Session, acc: Account, from_: date, to: date, granularity: str) -> list[dict]:
+    opening = opening_balance(session, acc, from_)
+    daily = func.sum(_signed(acc, Transaction.type, Transaction.amount))
+    running = func.sum(daily).over(order_by=Transaction.transaction_date)
+    rows = session.exec(
+        select(Transaction.transaction_date, running)
+        .where(
+            Transaction.account_id == acc.id,
+            Transaction.transaction_date >= from_,
+            Transaction.transaction_date <= to,
+        )
+        .group_by(Transaction.transaction_date)
+        .order_by(Transaction.transaction_date)
+    ).all()
+
+    out = []
+    i = 0
+    change = 0
+    for start, end in periods(from_, to, granularity):
+        while i < len(rows) and rows[i][0] <= end:
+            change = int(rows[i][1] or 0)
+            i += 1
+        out.append({"from": start.isoformat(), "to": end.isoformat(), "balance": opening + change})
+    return out
@@ -0,0 +1,261 @@
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from uuid import UUID
+
+import orjson
+from sqlalchemy import delete, or_, update
+from sqlmodel import Session, select
+
+from app import reports
+from app.config import settings
+from app.db import engine
+from app.models import ReportJob, utcnow
+
+# Jobs de reportes en proceso:
+#  - pool propio (REPORT_WORKERS) con cola acotada (REPORT_QUEUE) y límite de jobs activos por usuario
+#  - resultado cacheado por (usuario, reporte, parámetros, data_version): si no hubo escrituras,
+#    el mismo pedido devuelve el job ya hecho (o el que está en curso) sin recalcular
+#  - resultados acotados: cada uno hasta REPORT_RESULT_MAX_MB (si no, el job falla) y en memoria
+#    hasta REPORT_MEMORY_MB en total; al pasarse se descartan los terminados más viejos
+#  - REPORT_DURABLE: además se guardan en report_jobs; al arrancar se retoman los pendientes y
+#    GET /reports/{id} encuentra jobs de otros procesos (también los descartados de memoria)
+
+logger = logging.getLogger("app.jobs")
+
+ACTIVE = ("queued", "running")
+
+
+class QueueFull(Exception):
+    pass
+
+
+class UserLimit(Exception):
+    pass
+
+
+def params_key(params: dict) -> str:
+    return json.dumps(params, sort_keys=True, separators=(",", ":"))
+
+
+class ReportQueue:
+    def __init__(self, workers: int, queue: int, per_user: int, ttl: int, durable: bool,
+                 max_result: int, budget: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reports")
+        self._lock = threading.Lock()
+        self._jobs: dict[UUID, ReportJob] = {}
+        self._by_key: dict[tuple, UUID] = {}
+        self._sizes: dict[UUID, int] = {}
+        self._bytes = 0
+        self.workers = workers
+        self.capacity = workers + queue
+        self.per_user = per_user
+        self.ttl = ttl
+        self.durable = durable
+        self.max_result = max_result
+        self.budget = budget
+        self.submitted = 0
+        self.cache_hits = 0
+        self.rejected = 0
+        self.failed = 0
+        self.evictions = 0
+
+    def _key(self, job: ReportJob) -> tuple:
+        return job.user_id, job.kind, job.params, job.data_version
+
+    def _forget(self, job_id: UUID):
+        # con el lock tomado
+        job = self._jobs.pop(job_id, None)
+        if job is not None and self._by_key.get(self._key(job)) == job_id:
+            del self._by_key[self._key(job)]
+        self._bytes -= self._sizes.pop(job_id, 0)
+
+    def _expire(self):
+        # con el lock tomado: descarta resultados viejos (los activos quedan siempre)
+        cutoff = utcnow() - timedelta(seconds=self.ttl)
+        for job_id, job in list(self._jobs.items()):
+            if job.status not in ACTIVE and job.finished_at and job.finished_at < cutoff:
+                self._forget(job_id)
+
+    def _evict(self):
+        # con el lock tomado: presupuesto de memoria, primero los terminados más viejos
+        if self._bytes <= self.budget:
+            return
+        for job_id in sorted((j for j, size in self._sizes.items() if size), key=lambda j: self._jobs[j].finished_at):
+            self._forget(job_id)
+            self.evictions += 1
+            if self._bytes <= self.budget:
+                break
+
+    def _stored(self, session: Session, user_id: UUID, kind: str, params: str, version: int) -> ReportJob | None:
+        cutoff = utcnow() - timedelta(seconds=self.ttl)
+        return session.exec(
+            select(ReportJob).where(
+                ReportJob.user_id == user_id, ReportJob.kind == kind,
+                ReportJob.params == params, ReportJob.data_version == version,
+                or_(ReportJob.status.in_(ACTIVE), ReportJob.finished_at >= cutoff),
+                ReportJob.status != "failed",
+            ).order_by(ReportJob.created_at.desc()).limit(1)
+        ).first()
+
+    def submit(self, session: Session, user_id: UUID, kind: str, params: dict, version: int) -> tuple[ReportJob, bool]:
+        # (job, nuevo): nuevo=False si se reutilizó un job con la misma clave
+        key = params_key(params)
+        with self._lock:
+            self._expire()
+            job = self._jobs.get(self._by_key.get((user_id, kind, key, version)))
+            if job is not None and job.status != "failed":
+                self.cache_hits += 1
+                return job, False
+        if self.durable:
+            job = self._stored(session, user_id, kind, key, version)
+            if job is not None:
+                session.expunge(job)
+                with self._lock:
+                    self.cache_hits += 1
+                return job, False
+
+        with self._lock:
+            active = [j for j in self._jobs.values() if j.status in ACTIVE]
+            if sum(1 for j in active if j.user_id == user_id) >= self.per_user:
+                self.rejected += 1
+                raise UserLimit()
+            if len(active) >= self.capacity:
+                self.rejected += 1
+                raise QueueFull()
+            job = ReportJob(user_id=user_id, kind=kind, params=key, data_version=version, created_at=utcnow())
+            self._jobs[job.id] = job
+            self._by_key[self._key(job)] = job.id
+            self.submitted += 1
+
+        if self.durable:
+            # copia: el job en memoria no queda atado a la sesión del request
+            session.add(ReportJob(**job.model_dump()))
+            session.commit()
+        self._executor.submit(self._run, job)
+        return job, True
+
+    def _save(self, job: ReportJob, **values):
+        if not self.durable:
+            return
+        cutoff = utcnow() - timedelta(seconds=self.ttl)
+        with Session(engine) as session:
+            session.exec(update(ReportJob).where(ReportJob.id == job.id).values(**values))
+            # los resultados vencidos no se vuelven a servir: se borran de la tabla
+            session.exec(delete(ReportJob).where(ReportJob.status.not_in(ACTIVE), ReportJob.finished_at < cutoff))
+            session.commit()
+
+    def _claim(self, job: ReportJob) -> bool:
+        # en modo durable otro proceso puede haber tomado el mismo job (recover)
+        started = utcnow()
+        if self.durable:
+            with Session(engine) as session:
+                res = session.exec(
+                    update(ReportJob).where(ReportJob.id == job.id, ReportJob.status == "queued")
+                    .values(status="running", started_at=started)
+                )
+                session.commit()
+                if res.rowcount == 0:
+                    return False
+        with self._lock:
+            job.status = "running"
+            job.started_at = started
+        return True
+
+    def _run(self, job: ReportJob):
+        if not self._claim(job):
+            with self._lock:
+                self._forget(job.id)
+            return
+        start = time.perf_counter()
+        size = 0
+        try:
+            with Session(engine) as session:
+                result = reports.run(session, job.user_id, job.kind, json.loads(job.params))
+            raw = orjson.dumps(result)
+            size = len(raw)
+            if size > self.max_result:
+                raise ValueError(
+                    f"Report result too large ({size // 2**20} MB, max {self.max_result // 2**20} MB), narrow the date range"
+                )
+            # uuid/date -> tipos JSON (también para la columna JSON de report_jobs)
+            result = orjson.loads(raw)
+            status, error = "done", None
+        except Exception as e:
+            logger.exception("report %s (%s) failed", job.id, job.kind)
+            result, status, error, size = None, "failed", str(e), 0
+        finished = utcnow()
+        with self._lock:
+            job.result, job.status, job.error, job.finished_at = result, status, error, finished
+            if status == "failed":
+                self.failed += 1
+            if job.id in self._jobs:
+                self._sizes[job.id] = size
+                self._bytes += size
+                self._evict()
+        self._save(job, status=status, result=result, error=error, finished_at=finished)
+        logger.info("report %s (%s) %s in %.0fms", job.id, job.kind, status, 1000 * (time.perf_counter() - start))
+
+    def get(self, session: Session, job_id: UUID) -> ReportJob | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.durable:
+            job = session.get(ReportJob, job_id)
+        return job
+
+    def recover(self) -> int:
+        # al arrancar (modo durable): pendientes y "running" de un proceso que murió vuelven a la cola
+        if not self.durable:
+            return 0
+        stale = utcnow() - timedelta(seconds=settings.REPORT_JOB_TIMEOUT_SEC)
+        with Session(engine) as session:
+            session.exec(
+                update(ReportJob).where(ReportJob.status == "running", ReportJob.started_at < stale)
+                .values(status="queued", started_at=None)
+            )
+            session.commit()
+            jobs = session.exec(
+                select(ReportJob).where(ReportJob.status == "queued").order_by(ReportJob.created_at)
+            ).all()
+            for job in jobs:
+                session.expunge(job)
+        with self._lock:
+            for job in jobs:
+                self._jobs[job.id] = job
+                self._by_key[self._key(job)] = job.id
+        for job in jobs:
+            self._executor.submit(self._run, job)
+        return len(jobs)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            active = [j for j in self._jobs.values() if j.status in ACTIVE]
+            return {
+                "workers": self.workers,
+                "queued": sum(1 for j in active if j.status == "queued"),
+                "running": sum(1 for j in active if j.status == "running"),
+                "cached": len(self._jobs) - len(active),
+                "result_bytes": self._bytes,
+                "evictions": self.evictions,
+                "submitted": self.submitted,
+                "cache_hits": self.cache_hits,
+                "rejected": self.rejected,
+                "failed": self.failed,
+            }
+
+
+report_queue = ReportQueue(
+    workers=settings.REPORT_WORKERS,
+    queue=settings.REPORT_QUEUE,
+    per_user=settings.REPORT_PER_USER,
+    ttl=settings.REPORT_RESULT_TTL_SEC,
+    durable=settings.REPORT_DURABLE,
+    max_result=settings.REPORT_RESULT_MAX_MB * 2**20,
+    budget=settings.REPORT_MEMORY_MB * 2**20,
+)
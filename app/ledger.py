@@ -0,0 +1,185 @@
+from collections import defaultdict
+from datetime import date
+from uuid import UUID
+
+from sqlalchemy import delete, func, insert, or_, update
+from sqlmodel import Session, select
+
+from app import analytics, rollups, versions
+from app.db import lock_user, upsert
+from app.models import Account, AccountBalance, BalanceCheckpoint, Transaction
+
+# Cómo afecta cada tipo de movimiento al saldo (bank/cash) o a la deuda (credit_card)
+BALANCE_SIGNS = {
+    "bank": {"income": 1, "transfer_in": 1, "expense": -1, "transfer_out": -1},
+    "cash": {"income": 1, "transfer_in": 1, "expense": -1, "transfer_out": -1},
+    "credit_card": {"expense": 1, "credit_payment": -1},
+}
+
+
+def _v(value):
+    return getattr(value, "value", value)
+
+
+def signed_amount(account_type, tx_type, amount) -> int:
+    return BALANCE_SIGNS[_v(account_type)].get(_v(tx_type), 0) * amount
+
+
+def balance_payload(acc: Account, value: int) -> dict:
+    return payload(acc.id, acc.type, value)
+
+
+def payload(account_id: UUID, account_type, value: int) -> dict:
+    # bank/cash => saldo, credit_card => deuda (unidades menores; schemas.money_out al responder)
+    if _v(account_type) in ("bank", "cash"):
+        return {"account_id": str(account_id), "type": account_type, "balance": int(value)}
+    return {"account_id": str(account_id), "type": account_type, "debt": int(value)}
+
+
+def compute_balances(session: Session, accounts: list[Account]) -> dict[UUID, int]:
+    # recalcula desde la tabla transactions con un solo GROUP BY
+    if not accounts:
+        return {}
+    by_id = {a.id: a for a in accounts}
+    out = {a.id: int(a.initial_balance) for a in accounts}
+    rows = session.exec(
+        select(Transaction.account_id, Transaction.type, func.sum(Transaction.amount))
+        .where(Transaction.account_id.in_(list(by_id)))
+        .group_by(Transaction.account_id, Transaction.type)
+    ).all()
+    for account_id, tx_type, total in rows:
+        # SUM de BIGINT: exacto (en Postgres llega como Decimal)
+        out[account_id] += signed_amount(by_id[account_id].type, tx_type, int(total or 0))
+    return out
+
+
+def store_balances(session: Session, accounts: list[Account], balances: dict[UUID, int]):
+    rows = [{"account_id": a.id, "user_id": a.user_id, "balance": balances[a.id]} for a in accounts]
+    upsert(session, AccountBalance, rows, ["account_id"], lambda excluded: {"balance": excluded.balance})
+
+
+def get_balances(session: Session, accounts: list[Account]) -> dict[UUID, int]:
+    if not accounts:
+        return {}
+    rows = session.exec(
+        select(AccountBalance).where(AccountBalance.account_id.in_([a.id for a in accounts]))
+    ).all()
+    out = {r.account_id: r.balance for r in rows}
+
+    # cuentas anteriores al ledger: se inicializan desde el histórico
+    # (en una réplica solo se calculan; se guardan en la próxima lectura contra el primario)
+    missing = [a for a in accounts if a.id not in out]
+    if missing:
+        replica = session.info.get("replica")
+        if not replica:
+            # como rebuild: lock y relectura antes de calcular, una escritura concurrente no queda pisada
+            lock_user(session, *{a.user_id for a in missing})
+            missing = session.exec(
+                select(Account).where(Account.id.in_([a.id for a in missing]))
+                .execution_options(populate_existing=True)
+            ).all()
+        computed = compute_balances(session, missing)
+        if not replica:
+            store_balances(session, missing, computed)
+            session.commit()
+        out.update(computed)
+    return out
+
+
+def balances_by_id(session: Session, account_ids: list[UUID]) -> dict[UUID, int]:
+    # para listados que ya traen el saldo por JOIN y solo completan las cuentas sin fila
+    if not account_ids:
+        return {}
+    accounts = session.exec(select(Account).where(Account.id.in_(account_ids))).all()
+    return get_balances(session, accounts)
+
+
+def get_balance(session: Session, acc: Account) -> int:
+    return get_balances(session, [acc])[acc.id]
+
+
+def open_account(session: Session, acc: Account):
+    session.add(AccountBalance(account_id=acc.id, user_id=acc.user_id, balance=acc.initial_balance))
+
+
+def adjust(session: Session, acc: Account, delta: int):
+    # UPDATE atómico (balance = balance + delta) dentro de la misma transacción de la escritura
+    if not delta:
+        return
+    lock_user(session, acc.user_id)
+    res = session.exec(
+        update(AccountBalance)
+        .where(AccountBalance.account_id == acc.id)
+        .values(balance=AccountBalance.balance + delta)
+    )
+    if res.rowcount == 0:
+        session.flush()
+        store_balances(session, [acc], compute_balances(session, [acc]))
+
+
+def invalidate_checkpoints(session: Session, since: dict[UUID, date]):
+    # los cierres de mes desde la fecha del movimiento más viejo quedan desactualizados
+    if not since:
+        return
+    session.exec(delete(BalanceCheckpoint).where(or_(*(
+        (BalanceCheckpoint.account_id == account_id) & (BalanceCheckpoint.month >= rollups.month_start(d))
+        for account_id, d in since.items()
+    ))))
+
+
+def record_transactions(session: Session, txs: list[Transaction], accounts: list[Account]):
+    # Único punto de entrada para mantener los datos derivados de cada movimiento nuevo.
+    # Se llama antes del commit de la escritura.
+    lock_user(session, *{t.user_id for t in txs})
+    by_id = {a.id: a for a in accounts}
+    deltas = defaultdict(int)
+    oldest = {}
+    for t in txs:
+        deltas[t.account_id] += signed_amount(by_id[t.account_id].type, t.type, t.amount)
+        oldest[t.account_id] = min(oldest.get(t.account_id, t.transaction_date), t.transaction_date)
+    for account_id, delta in deltas.items():
+        adjust(session, by_id[account_id], delta)
+    rollups.add(session, txs)
+    invalidate_checkpoints(session, oldest)
+    versions.bump(session, *{t.user_id for t in txs})
+    analytics.track(session, txs)
+
+
+def insert_transactions(session: Session, txs: list[Transaction], accounts: list[Account], chunk: int = 1000):
+    # INSERT multi-fila (executemany / insertmanyvalues) por lotes, sin identity map
+    columns = [c.name for c in Transaction.__table__.columns if c.name != "created_at"]
+    rows = [{c: getattr(t, c) for c in columns} for t in txs]
+    for i in range(0, len(rows), chunk):
+        session.exec(insert(Transaction), params=rows[i:i + chunk])
+    record_transactions(session, txs, accounts)
+
+
+def rebuild(session: Session, fix: bool = True, batch_size: int = 500) -> list[dict]:
+    # compara el ledger contra transactions y (opcional) lo corrige
+    mismatches = []
+    offset = 0
+    while True:
+        accounts = session.exec(select(Account).order_by(Account.id).offset(offset).limit(batch_size)).all()
+        if not accounts:
+            break
+        # con el lock tomado se releen las cuentas (initial_balance) y se calcula sobre datos confirmados
+        lock_user(session, *{a.user_id for a in accounts})
+        accounts = session.exec(
+            select(Account).where(Account.id.in_([a.id for a in accounts])).order_by(Account.id)
+            .execution_options(populate_existing=True)
+        ).all()
+        expected = compute_balances(session, accounts)
+        stored = {
+            r.account_id: r.balance
+            for r in session.exec(
+                select(AccountBalance).where(AccountBalance.account_id.in_(list(expected)))
+            ).all()
+        }
+        wrong = [a for a in accounts if stored.get(a.id) != expected[a.id]]
+        for a in wrong:
+            mismatches.append({"account_id": str(a.id), "stored": stored.get(a.id), "expected": expected[a.id]})
+        if fix and wrong:
+            store_balances(session, wrong, expected)
+            session.commit()
+        offset += batch_size
+    return mismatches
@@ -1,10 +1,36 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from app import analytics, metrics, principals, versions
+from app.admission import AdmissionController, AdmissionMiddleware
+from app.config import settings
+from app.jobs import report_queue
+from app.db import engine, async_engine, pool_in_use, replicas
+from app.schemas import AmountPrecisionError
+from app.security import PasswordPoolBusy, password_pool
+from app.routers import aio, auth, accounts, categories, transactions, operations, dashboard, reports
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # REPORT_DURABLE: retoma los reportes que quedaron pendientes en report_jobs
+    report_queue.recover()
+    yield
+    report_queue.shutdown()
 
-from app.db import create_db_and_tables
-from app.routers import auth, accounts, categories, transactions, operations, dashboard
+app = FastAPI(title="Personal Finance API", version="0.1.0", lifespan=lifespan)
 
-app = FastAPI(title="Personal Finance API", version="0.1.0")
+admission = AdmissionController(
+    max_concurrent=settings.ADMISSION_MAX_CONCURRENT,
+    per_user=settings.ADMISSION_PER_USER,
+    retry_after=settings.ADMISSION_RETRY_AFTER_SEC,
+)
+app.add_middleware(AdmissionMiddleware, controller=admission)
+app.add_middleware(versions.ETagMiddleware)
+# por fuera de admisión: también mide los 503 rechazados
+app.add_middleware(metrics.InstrumentationMiddleware)
 
 # Ajustá CORS cuando tengas el dominio de la PWA
 app.add_middleware(
@@ -13,19 +39,57 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
-@app.on_event("startup")
-def on_startup():
-    create_db_and_tables()
+@app.exception_handler(PasswordPoolBusy)
+def password_pool_busy(request: Request, exc: PasswordPoolBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many login attempts in progress, retry shortly"},
+        headers={"Retry-After": str(settings.PWD_RETRY_AFTER_SEC)},
+    )
+
+@app.exception_handler(AmountPrecisionError)
+def amount_precision(request: Request, exc: AmountPrecisionError):
+    return JSONResponse(status_code=422, content={"detail": str(exc)})
 
+# auth no se convierte: usa la Session sync en el threadpool y espera bcrypt en password_pool
 app.include_router(auth.router)
-app.include_router(accounts.router)
-app.include_router(categories.router)
-app.include_router(transactions.router)
-app.include_router(operations.router)
-app.include_router(dashboard.router)
+for router in (accounts.router, categories.router, transactions.router, operations.router, dashboard.router, reports.router):
+    app.include_router(aio.asyncify(router) if settings.DB_ASYNC else router)
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    return {
+        "status": "ok",
+        "principal_cache": principals.stats(),
+        "password_pool": password_pool.stats(),
+        "admission": admission.stats(),
+        "replicas": replicas.stats(),
+        "reports": report_queue.stats(),
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    pool = (async_engine.sync_engine if async_engine else engine).pool
+    size = getattr(pool, "size", None)
+    overflow = getattr(pool, "overflow", None)
+    caches = principals.stats()
+    pwd = password_pool.stats()
+    adm = admission.stats()
+    gauges = {
+        "db_pool_size": size() if size else None,
+        "db_pool_checked_out": pool_in_use(),
+        "db_pool_overflow": overflow() if overflow else None,
+        "auth_cache_token_hits": caches["tokens"]["hits"],
+        "auth_cache_token_misses": caches["tokens"]["misses"],
+        "auth_cache_user_hits": caches["users"]["hits"],
+        "auth_cache_user_misses": caches["users"]["misses"],
+    }
+    gauges.update({f"password_pool_{k}": v for k, v in pwd.items() if isinstance(v, (int, float))})
+    gauges.update({f"admission_{k}": v for k, v in adm.items() if isinstance(v, (int, float))})
+    gauges.update({f"db_replica_{k}": v for k, v in replicas.stats().items()})
+    gauges.update({f"analytics_{k}": v for k, v in analytics.snapshots.stats().items()})
+    gauges.update({f"report_{k}": v for k, v in report_queue.stats().items()})
+    return metrics.render(gauges)
@@ -0,0 +1,223 @@
+import inspect
+import logging
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+from app.config import settings
+
+slow_log = logging.getLogger("app.sql.slow")
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+@dataclass
+class RequestStats:
+    scope: dict
+    start: float = field(default_factory=time.perf_counter)
+    queries: int = 0
+    db_sec: float = 0.0
+    endpoint_end: float | None = None
+    spans: dict = field(default_factory=lambda: defaultdict(float))
+
+    @property
+    def route(self) -> str:
+        route = self.scope.get("route")
+        return getattr(route, "path", "<unmatched>")
+
+
+_current: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+@contextmanager
+def span(name: str):
+    # tiempo de una etapa (p. ej. "auth") para Server-Timing
+    stats = _current.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if stats:
+            stats.spans[name] += time.perf_counter() - start
+
+
+class Histogram:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}  # labels -> [counts por bucket..., +Inf], suma
+
+    def observe(self, labels: tuple, value: float):
+        with self._lock:
+            counts, total = self._data.get(labels, ([0] * (len(BUCKETS) + 1), 0.0))
+            for i, b in enumerate(BUCKETS):
+                if value <= b:
+                    counts[i] += 1
+            counts[-1] += 1
+            self._data[labels] = (counts, total + value)
+
+    def items(self):
+        with self._lock:
+            return [(k, list(c), s) for k, (c, s) in self._data.items()]
+
+
+request_seconds = Histogram()
+db_queries = defaultdict(int)  # (method, route) -> sentencias
+db_seconds = defaultdict(float)
+slow_queries = 0
+
+
+# --- SQL ---------------------------------------------------------------------------
+
+_PLACEHOLDERS = re.compile(r"(\?|%\(\w+\)s|\$\d+|__\[POSTCOMPILE_\w+\])(\s*,\s*(\?|%\(\w+\)s|\$\d+))+")
+# $1 (placeholder de asyncpg) no es un literal
+_LITERALS = re.compile(r"'(?:[^']|'')*'|(?<!\$)\b\d+(?:\.\d+)?\b")
+
+
+def normalize(statement: str) -> str:
+    s = " ".join(statement.split())
+    s = _PLACEHOLDERS.sub("?, ...", s)
+    return _LITERALS.sub("?", s)
+
+
+def _before(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after(conn, cursor, statement, parameters, context, executemany):
+    global slow_queries
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    stats = _current.get()
+    if stats:
+        stats.queries += 1
+        stats.db_sec += elapsed
+    if settings.SLOW_QUERY_MS and elapsed * 1000 >= settings.SLOW_QUERY_MS:
+        slow_queries += 1
+        slow_log.warning(
+            "slow query %.1fms route=%s sql=%s",
+            elapsed * 1000, stats.route if stats else "-", normalize(statement),
+        )
+
+
+def instrument_engine(engine):
+    event.listen(engine, "before_cursor_execute", _before)
+    event.listen(engine, "after_cursor_execute", _after)
+
+
+# --- rutas / middleware ------------------------------------------------------------
+
+class TimedRoute(APIRoute):
+    # marca cuándo termina el handler: lo que sigue hasta el response es serialización
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        call = self.dependant.call
+        if call is None:
+            return
+        if inspect.iscoroutinefunction(call):
+            @wraps(call)
+            async def timed(*a, **kw):
+                try:
+                    return await call(*a, **kw)
+                finally:
+                    _mark_endpoint_end()
+        else:
+            @wraps(call)
+            def timed(*a, **kw):
+                try:
+                    return call(*a, **kw)
+                finally:
+                    _mark_endpoint_end()
+        self.dependant.call = timed
+
+
+def _mark_endpoint_end():
+    stats = _current.get()
+    if stats:
+        stats.endpoint_end = time.perf_counter()
+
+
+class InstrumentationMiddleware:
+    # Server-Timing por request + histogramas por ruta para /metrics
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats(scope=scope)
+        token = _current.set(stats)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if settings.SERVER_TIMING:
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [
+                        (b"server-timing", _server_timing(stats).encode())
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            elapsed = time.perf_counter() - stats.start
+            key = (scope["method"], stats.route)
+            request_seconds.observe(key + (str(status),), elapsed)
+            db_queries[key] += stats.queries
+            db_seconds[key] += stats.db_sec
+
+
+def _server_timing(stats: RequestStats) -> str:
+    now = time.perf_counter()
+    parts = [f'db;dur={stats.db_sec * 1000:.1f};desc="{stats.queries} queries"']
+    for name, sec in stats.spans.items():
+        parts.append(f"{name};dur={sec * 1000:.1f}")
+    if stats.endpoint_end:
+        parts.append(f"app;dur={(stats.endpoint_end - stats.start) * 1000:.1f}")
+        parts.append(f"ser;dur={(now - stats.endpoint_end) * 1000:.1f}")
+    parts.append(f"total;dur={(now - stats.start) * 1000:.1f}")
+    return ", ".join(parts)
+
+
+# --- exposición Prometheus ---------------------------------------------------------
+
+def _labels(**kw) -> str:
+    return "{" + ",".join(f'{k}="{str(v).replace(chr(34), "")}"' for k, v in kw.items()) + "}"
+
+
+def render(gauges: dict[str, float]) -> str:
+    lines = [
+        "# HELP http_request_duration_seconds Request latency by route.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (method, route, status), counts, total in sorted(request_seconds.items()):
+        for b, c in zip(BUCKETS, counts):
+            lines.append(f"http_request_duration_seconds_bucket{_labels(method=method, route=route, status=status, le=b)} {c}")
+        lines.append(f"http_request_duration_seconds_bucket{_labels(method=method, route=route, status=status, le='+Inf')} {counts[-1]}")
+        lines.append(f"http_request_duration_seconds_sum{_labels(method=method, route=route, status=status)} {total}")
+        lines.append(f"http_request_duration_seconds_count{_labels(method=method, route=route, status=status)} {counts[-1]}")
+
+    lines += ["# HELP db_queries_total SQL statements by route.", "# TYPE db_queries_total counter"]
+    for (method, route), n in sorted(db_queries.items()):
+        lines.append(f"db_queries_total{_labels(method=method, route=route)} {n}")
+    lines += ["# HELP db_seconds_total Time spent in SQL by route.", "# TYPE db_seconds_total counter"]
+    for (method, route), sec in sorted(db_seconds.items()):
+        lines.append(f"db_seconds_total{_labels(method=method, route=route)} {sec}")
+    lines += ["# TYPE db_slow_queries_total counter", f"db_slow_queries_total {slow_queries}"]
+
+    for name, value in gauges.items():
+        if value is None:
+            continue
+        lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
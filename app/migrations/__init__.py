@@ -0,0 +1,70 @@
+import importlib
+import pkgutil
+import re
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+
+# Migraciones versionadas: módulos mNNNN_<nombre>.py con upgrade(connection).
+# Se corren una vez por deploy (python -m app.cli migrate), no en el arranque de los workers.
+
+_meta = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _meta,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime(timezone=True), nullable=False),
+)
+
+LOCK_ID = 727_001  # pg_advisory_lock: un solo runner a la vez
+
+
+def discover() -> list[tuple[int, str, object]]:
+    out = []
+    for info in pkgutil.iter_modules(__path__):
+        m = re.fullmatch(r"m(\d{4})_(\w+)", info.name)
+        if m:
+            out.append((int(m.group(1)), m.group(2), importlib.import_module(f"{__name__}.{info.name}")))
+    return sorted(out, key=lambda x: x[0])
+
+
+def applied_versions(connection) -> set[int]:
+    if not inspect(connection).has_table("schema_migrations"):
+        return set()
+    return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+
+def pending(engine) -> list[tuple[int, str, object]]:
+    with engine.connect() as conn:
+        done = applied_versions(conn)
+    return [m for m in discover() if m[0] not in done]
+
+
+def migrate(engine, log=print) -> list[int]:
+    applied = []
+    with engine.connect() as lock_conn:
+        if engine.dialect.name == "postgresql":
+            lock_conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": LOCK_ID})
+        try:
+            with engine.begin() as conn:
+                _meta.create_all(conn)
+            for version, name, module in pending(engine):
+                # cada migración en su propia transacción, junto con su registro
+                with engine.begin() as conn:
+                    log(f"applying {version:04d}_{name}")
+                    module.upgrade(conn)
+                    conn.execute(schema_migrations.insert().values(
+                        version=version, name=name, applied_at=datetime.now(timezone.utc),
+                    ))
+                applied.append(version)
+        finally:
+            if engine.dialect.name == "postgresql":
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": LOCK_ID})
+                lock_conn.commit()
+    return applied
+
+
+def add_column_if_missing(connection, table: str, column: str, ddl: str):
+    # ADD COLUMN ... IF NOT EXISTS no existe en SQLite
+    if column not in {c["name"] for c in inspect(connection).get_columns(table)}:
+        connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
@@ -0,0 +1,11 @@
+from sqlmodel import SQLModel
+
+from app import models  # noqa: F401  (registra las tablas en metadata)
+
+# Esquema base (lo que antes hacía create_all en el startup). checkfirst: en bases
+# existentes no hace nada. Las tablas nuevas se agregan en sus propias migraciones.
+TABLES = ["users", "accounts", "categories", "transactions", "account_balances", "monthly_rollups"]
+
+
+def upgrade(connection):
+    SQLModel.metadata.create_all(connection, tables=[SQLModel.metadata.tables[t] for t in TABLES])
@@ -0,0 +1,5 @@
+from app import search
+
+
+def upgrade(connection):
+    search.install(connection)
@@ -0,0 +1,34 @@
+from sqlalchemy import text
+
+# Índices de transactions según las consultas reales de los routers:
+#  - list/export/rollups: WHERE user_id [+ rango de fechas] ORDER BY fecha, created_at, id
+#  - ledger/bulk dedupe/historial por cuenta: WHERE account_id IN (...) [+ rango de fechas]
+#  - filtro por categoría y FK al borrar categorías: category_id
+# Los índices de una sola columna sobre id (ya es PK), type, payment_method, counterparty
+# (la búsqueda usa el índice trigram/FTS), group_id, user_id y transaction_date sobran.
+
+DROP = [
+    "ix_transactions_id",
+    "ix_transactions_user_id",
+    "ix_transactions_account_id",
+    "ix_transactions_type",
+    "ix_transactions_payment_method",
+    "ix_transactions_transaction_date",
+    "ix_transactions_counterparty",
+    "ix_transactions_group_id",
+]
+
+CREATE = [
+    "CREATE INDEX IF NOT EXISTS ix_transactions_user_date "
+    "ON transactions (user_id, transaction_date, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_transactions_account_date "
+    "ON transactions (account_id, transaction_date)",
+    "CREATE INDEX IF NOT EXISTS ix_transactions_category_id ON transactions (category_id)",
+]
+
+
+def upgrade(connection):
+    for name in DROP:
+        connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    for ddl in CREATE:
+        connection.execute(text(ddl))
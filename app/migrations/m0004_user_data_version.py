@@ -0,0 +1,5 @@
+from app.migrations import add_column_if_missing
+
+
+def upgrade(connection):
+    add_column_if_missing(connection, "users", "data_version", "BIGINT NOT NULL DEFAULT 0")
@@ -0,0 +1,7 @@
+from sqlmodel import SQLModel
+
+from app import models  # noqa: F401
+
+
+def upgrade(connection):
+    SQLModel.metadata.create_all(connection, tables=[SQLModel.metadata.tables["category_rules"]])
@@ -0,0 +1,66 @@
+from sqlalchemy import Integer, inspect, select, text
+from sqlmodel import Session, SQLModel
+
+from app import ledger, models, rollups  # noqa: F401
+from app.schemas import MINOR_DIGITS
+
+# Montos de REAL/DOUBLE a BIGINT en unidades menores de la moneda de cada usuario.
+# Columnas de origen: columna nueva, UPDATE con el factor del usuario, DROP + RENAME.
+# Tablas derivadas (saldos, rollups, cierres de mes): se recrean y se recalculan desde transactions,
+# así no arrastran el redondeo acumulado de los floats.
+
+SOURCE = {
+    "accounts": [("initial_balance", "NOT NULL DEFAULT 0")],
+    "transactions": [("amount", "NOT NULL DEFAULT 0")],
+    "category_rules": [("min_amount", ""), ("max_amount", "")],
+}
+DERIVED = ["account_balances", "monthly_rollups", "balance_checkpoints"]
+
+
+def _factor_sql() -> str:
+    # factor 10^decimales según users.currency (2 si no está en MINOR_DIGITS)
+    whens = " ".join(f"WHEN '{code}' THEN {10 ** digits}" for code, digits in MINOR_DIGITS.items())
+    return f"(SELECT CASE upper(u.currency) {whens} ELSE 100 END FROM users u WHERE u.id = {{table}}.user_id)"
+
+
+def _is_integer(connection, table: str, column: str) -> bool:
+    columns = {c["name"]: c["type"] for c in inspect(connection).get_columns(table)}
+    return isinstance(columns[column], Integer)
+
+
+def _convert(connection, table: str, column: str, ddl: str):
+    tmp = f"{column}_minor"
+    connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {tmp} BIGINT {ddl}"))
+    factor = _factor_sql().format(table=table)
+    connection.execute(text(f"UPDATE {table} SET {tmp} = CAST(ROUND({column} * {factor}) AS BIGINT)"))
+    connection.execute(text(f"ALTER TABLE {table} DROP COLUMN {column}"))
+    connection.execute(text(f"ALTER TABLE {table} RENAME COLUMN {tmp} TO {column}"))
+    if ddl and connection.dialect.name == "postgresql":
+        connection.execute(text(f"ALTER TABLE {table} ALTER COLUMN {column} DROP DEFAULT"))
+
+
+def upgrade(connection):
+    converted = False
+    for table, columns in SOURCE.items():
+        for column, ddl in columns:
+            # bases nuevas: m0001/m0005/m0006 ya crean las columnas como BIGINT
+            if not _is_integer(connection, table, column):
+                _convert(connection, table, column, ddl)
+                converted = True
+
+    stale = [t for t in DERIVED if not _is_integer(
+        connection, t, "total" if t == "monthly_rollups" else "balance",
+    )]
+    if not converted and not stale:
+        return
+
+    tables = [SQLModel.metadata.tables[t] for t in DERIVED]
+    SQLModel.metadata.drop_all(connection, tables=tables)
+    SQLModel.metadata.create_all(connection, tables=tables)
+
+    # misma conexión y transacción de la migración
+    with Session(bind=connection) as session:
+        for user_id in session.exec(select(models.User.id)).scalars():
+            rollups.rebuild_user(session, user_id)
+        ledger.rebuild(session, fix=True)
+        session.flush()
@@ -0,0 +1,46 @@
+from sqlalchemy import inspect, text
+from sqlmodel import SQLModel
+
+from app import models  # noqa: F401
+
+# índices que no vienen de los modelos (DDL propio en migraciones)
+EXTRA_EXPECTED = {
+    "postgresql": {"transactions": {"ix_transactions_search_trgm"}},
+}
+
+
+def expected_indexes(dialect: str) -> dict[str, set[str]]:
+    out = {}
+    for name, table in SQLModel.metadata.tables.items():
+        out[name] = {ix.name for ix in table.indexes}
+    for name, extra in EXTRA_EXPECTED.get(dialect, {}).items():
+        out.setdefault(name, set()).update(extra)
+    return out
+
+
+def index_report(engine) -> dict:
+    # missing: en el plan pero no en la base; unexpected: en la base pero no en el plan;
+    # unused (solo postgres): idx_scan = 0 desde el último reset de estadísticas
+    dialect = engine.dialect.name
+    expected = expected_indexes(dialect)
+    report = {"missing": [], "unexpected": [], "unused": []}
+    with engine.connect() as conn:
+        insp = inspect(conn)
+        for table, names in sorted(expected.items()):
+            if not insp.has_table(table):
+                report["missing"].extend(f"{table}.{n}" for n in sorted(names))
+                continue
+            actual = {ix["name"] for ix in insp.get_indexes(table)}
+            report["missing"].extend(f"{table}.{n}" for n in sorted(names - actual))
+            report["unexpected"].extend(f"{table}.{n}" for n in sorted(actual - names))
+
+        if dialect == "postgresql":
+            rows = conn.execute(text("""
+                SELECT s.relname, s.indexrelname, pg_relation_size(s.indexrelid)
+                FROM pg_stat_user_indexes s
+                JOIN pg_index i ON i.indexrelid = s.indexrelid
+                WHERE s.idx_scan = 0 AND NOT i.indisprimary AND NOT i.indisunique
+                ORDER BY pg_relation_size(s.indexrelid) DESC
+            """)).all()
+            report["unused"] = [{"index": f"{t}.{ix}", "bytes": size} for t, ix, size in rows]
+    return report
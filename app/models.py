@@ -1,12 +1,16 @@
-from __future__ import annotations
-
-from datetime import datetime, date
+from datetime import datetime, date, timezone
 from typing import Optional
 from uuid import UUID, uuid4
 from enum import Enum
 
 from sqlmodel import SQLModel, Field, Relationship
-from sqlalchemy import Column, String, text, DateTime
+from sqlalchemy import JSON, BigInteger, Column, String, DateTime, Index, func
+
+
+def utcnow() -> datetime:
+    # también se setea del lado de Python: en SQLite el formato de CURRENT_TIMESTAMP
+    # no coincide con el que usa SQLAlchemy y rompe comparaciones (keyset)
+    return datetime.now(timezone.utc)
 
 
 class AccountType(str, Enum):
@@ -47,8 +51,13 @@ class User(SQLModel, table=True):
     password_hash: str
     currency: str = Field(default="CRC", max_length=3)
 
+    # se incrementa con cada escritura de datos del usuario (ETag de las lecturas)
+    data_version: int = Field(
+        default=0, sa_column=Column(BigInteger, nullable=False, default=0, server_default="0")
+    )
+
     created_at: datetime = Field(
-        sa_column=Column(nullable=False, server_default=text("now()"))
+        sa_column=Column(DateTime(timezone=True), nullable=False, default=utcnow, server_default=func.now())
     )
 
     accounts: list["Account"] = Relationship(back_populates="user")
@@ -64,11 +73,12 @@ class Account(SQLModel, table=True):
 
     name: str = Field(index=True)
     type: AccountType = Field(index=True)
-    initial_balance: float = Field(default=0.0)
+    # montos en unidades menores de la moneda del usuario (ver schemas.to_minor)
+    initial_balance: int = Field(default=0, sa_column=Column(BigInteger, nullable=False, default=0))
     active: bool = Field(default=True)
 
     created_at: datetime = Field(
-        sa_column=Column(DateTime(timezone=True), nullable=False, server_default=text("now()"))
+        sa_column=Column(DateTime(timezone=True), nullable=False, default=utcnow, server_default=func.now())
     )
 
     user: "User" = Relationship(back_populates="accounts")
@@ -85,7 +95,7 @@ class Category(SQLModel, table=True):
     type: CategoryType = Field(index=True)
 
     created_at: datetime = Field(
-        sa_column=Column(DateTime(timezone=True), nullable=False, server_default=text("now()"))
+        sa_column=Column(DateTime(timezone=True), nullable=False, default=utcnow, server_default=func.now())
     )
 
     user: "User" = Relationship(back_populates="categories")
@@ -93,26 +103,116 @@ class Category(SQLModel, table=True):
 
 class Transaction(SQLModel, table=True):
     __tablename__ = "transactions"
+    # ver migrations/m0003_transaction_indexes.py
+    __table_args__ = (
+        Index("ix_transactions_user_date", "user_id", "transaction_date", "created_at", "id"),
+        Index("ix_transactions_account_date", "account_id", "transaction_date"),
+    )
 
-    id: UUID = Field(default_factory=uuid4, primary_key=True, index=True)
-    user_id: UUID = Field(foreign_key="users.id", index=True)
-    account_id: UUID = Field(foreign_key="accounts.id", index=True)
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    user_id: UUID = Field(foreign_key="users.id")
+    account_id: UUID = Field(foreign_key="accounts.id")
     category_id: Optional[UUID] = Field(default=None, foreign_key="categories.id", index=True)
 
-    type: TxType = Field(index=True)
-    payment_method: Optional[PayMethod] = Field(default=None, index=True)
+    type: TxType
+    payment_method: Optional[PayMethod] = None
 
-    amount: float = Field(gt=0)
-    transaction_date: date = Field(index=True)
+    amount: int = Field(gt=0, sa_column=Column(BigInteger, nullable=False))  # unidades menores
+    transaction_date: date
 
     description: Optional[str] = None
-    counterparty: Optional[str] = Field(default=None, index=True)
+    counterparty: Optional[str] = None
 
-    group_id: Optional[UUID] = Field(default=None, index=True)
+    group_id: Optional[UUID] = None
 
     created_at: datetime = Field(
-        sa_column=Column(DateTime(timezone=True), nullable=False, server_default=text("now()"))
+        sa_column=Column(DateTime(timezone=True), nullable=False, default=utcnow, server_default=func.now())
     )
 
     user: "User" = Relationship(back_populates="transactions")
     account: "Account" = Relationship(back_populates="transactions")
+
+
+class AccountBalance(SQLModel, table=True):
+    __tablename__ = "account_balances"
+
+    account_id: UUID = Field(foreign_key="accounts.id", primary_key=True)
+    user_id: UUID = Field(foreign_key="users.id", index=True)
+
+    # bank/cash: saldo disponible; credit_card: deuda
+    balance: int = Field(default=0, sa_column=Column(BigInteger, nullable=False, default=0))
+
+
+class MonthlyRollup(SQLModel, table=True):
+    __tablename__ = "monthly_rollups"
+
+    user_id: UUID = Field(foreign_key="users.id", primary_key=True)
+    month: date = Field(primary_key=True)  # primer día del mes
+    account_id: UUID = Field(foreign_key="accounts.id", primary_key=True)
+    # movimientos sin categoría usan rollups.NO_CATEGORY (no puede ser NULL en la PK)
+    category_id: UUID = Field(primary_key=True)
+    type: TxType = Field(primary_key=True)
+
+    total: int = Field(default=0, sa_column=Column(BigInteger, nullable=False, default=0))
+    count: int = Field(default=0)
+
+
+class BalanceCheckpoint(SQLModel, table=True):
+    __tablename__ = "balance_checkpoints"
+
+    account_id: UUID = Field(foreign_key="accounts.id", primary_key=True)
+    month: date = Field(primary_key=True)  # primer día del mes; saldo al cierre de ese mes
+    user_id: UUID = Field(foreign_key="users.id", index=True)
+
+    # mismo criterio que account_balances (saldo o deuda)
+    balance: int = Field(sa_column=Column(BigInteger, nullable=False))
+
+
+class CategoryRule(SQLModel, table=True):
+    __tablename__ = "category_rules"
+
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    user_id: UUID = Field(foreign_key="users.id", index=True)
+    category_id: UUID = Field(foreign_key="categories.id")
+
+    # menor = se evalúa primero
+    priority: int = Field(default=100)
+
+    # condiciones (todas opcionales, se combinan con AND); los textos son "contiene",
+    # sin distinguir mayúsculas ni tildes
+    counterparty: Optional[str] = None
+    description: Optional[str] = None
+    min_amount: Optional[int] = Field(default=None, sa_column=Column(BigInteger))
+    max_amount: Optional[int] = Field(default=None, sa_column=Column(BigInteger))
+    account_id: Optional[UUID] = Field(default=None, foreign_key="accounts.id")
+    payment_method: Optional[PayMethod] = None
+
+    created_at: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), nullable=False, default=utcnow, server_default=func.now())
+    )
+
+
+class ReportJob(SQLModel, table=True):
+    __tablename__ = "report_jobs"
+    # búsqueda del resultado cacheado: mismo usuario, reporte, parámetros y versión de datos
+    __table_args__ = (
+        Index("ix_report_jobs_lookup", "user_id", "kind", "data_version"),
+    )
+
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    user_id: UUID = Field(foreign_key="users.id")
+
+    kind: str
+    params: str  # JSON canónico (sort_keys)
+    data_version: int = Field(sa_column=Column(BigInteger, nullable=False))
+
+    # queued | running | done | failed
+    status: str = Field(default="queued", index=True)
+    result: Optional[dict] = Field(default=None, sa_column=Column(JSON))
+    error: Optional[str] = None
+
+    created_at: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), nullable=False, default=utcnow, server_default=func.now())
+    )
+    started_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True)))
+    finished_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True)))
@@ -0,0 +1,221 @@
+import re
+from datetime import date
+
+from sqlalchemy import text
+
+from app.migrations import LOCK_ID
+
+# Particionado de transactions por rango de transaction_date (solo Postgres, opt-in por CLI):
+#  - partitions-setup: convierte la tabla (copia + swap; correr en ventana de mantenimiento)
+#  - partitions-ensure: crea las particiones futuras (corre en cada release, ver Procfile) y saca
+#    de la partición DEFAULT los movimientos que cayeron fuera de rango
+#  - partitions-archive: compacta las particiones viejas (CLUSTER, fillfactor 100) y opcionalmente
+#    las mueve a un tablespace frío; siguen adjuntas, se consultan igual que el resto
+# El planner descarta particiones cuando el WHERE compara transaction_date contra constantes
+# (rango de fechas, cursor del keyset). En SQLite todos los comandos son no-op.
+
+TABLE = "transactions"
+DEFAULT = f"{TABLE}_default"
+GRANULARITIES = ("year", "month")
+
+
+def supported(engine) -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+def period_start(d: date, granularity: str) -> date:
+    return d.replace(month=1, day=1) if granularity == "year" else d.replace(day=1)
+
+
+def next_period(d: date, granularity: str) -> date:
+    if granularity == "year":
+        return date(d.year + 1, 1, 1)
+    return date(d.year + (d.month // 12), (d.month % 12) + 1, 1)
+
+
+def partition_name(start: date, granularity: str) -> str:
+    if granularity == "year":
+        return f"{TABLE}_p{start.year}"
+    return f"{TABLE}_p{start.year}_{start.month:02d}"
+
+
+def is_partitioned(conn) -> bool:
+    kind = conn.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:t)"), {"t": TABLE}).scalar()
+    return kind == "p"
+
+
+_BOUND = re.compile(r"FROM \('(\d{4}-\d{2}-\d{2})'\) TO \('(\d{4}-\d{2}-\d{2})'\)")
+
+
+def partitions(conn) -> list[dict]:
+    rows = conn.execute(text("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), pg_total_relation_size(c.oid),
+               obj_description(c.oid, 'pg_class'), coalesce(t.spcname, 'default')
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        LEFT JOIN pg_tablespace t ON t.oid = c.reltablespace
+        WHERE i.inhparent = to_regclass(:t)
+        ORDER BY c.relname
+    """), {"t": TABLE}).all()
+    out = []
+    for name, bound, size, comment, tablespace in rows:
+        m = _BOUND.search(bound or "")
+        out.append({
+            "name": name,
+            "from": date.fromisoformat(m.group(1)) if m else None,
+            "to": date.fromisoformat(m.group(2)) if m else None,
+            "bytes": size,
+            "tablespace": tablespace,
+            "archived": (comment or "").startswith("archived"),
+        })
+    return out
+
+
+def granularity_of(parts: list[dict]) -> str:
+    ranged = [p for p in parts if p["from"]]
+    if ranged and (ranged[0]["to"] - ranged[0]["from"]).days > 31:
+        return "year"
+    return "month"
+
+
+def _create_partition(conn, start: date, granularity: str, has_default: bool) -> str | None:
+    name = partition_name(start, granularity)
+    end = next_period(start, granularity)
+    exists = conn.execute(text("SELECT to_regclass(:n)"), {"n": name}).scalar()
+    if exists:
+        return None
+    bounds = f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    in_default = has_default and conn.execute(text(
+        f"SELECT EXISTS (SELECT 1 FROM {DEFAULT} WHERE transaction_date >= :s AND transaction_date < :e)"
+    ), {"s": start, "e": end}).scalar()
+    if not in_default:
+        conn.execute(text(f"CREATE TABLE {name} PARTITION OF {TABLE} {bounds}"))
+        return name
+    # con filas en DEFAULT no se puede crear directo: tabla suelta, se mueven las filas y se adjunta
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    conn.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT} WHERE transaction_date >= :s AND transaction_date < :e RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """), {"s": start, "e": end})
+    conn.execute(text(f"ALTER TABLE {TABLE} ATTACH PARTITION {name} {bounds}"))
+    return name
+
+
+def _create_range(conn, first: date, last: date, granularity: str, has_default: bool) -> list[str]:
+    created = []
+    start = period_start(first, granularity)
+    while start <= last:
+        name = _create_partition(conn, start, granularity, has_default)
+        if name:
+            created.append(name)
+        start = next_period(start, granularity)
+    return created
+
+
+def _ahead(today: date, granularity: str, ahead: int) -> date:
+    last = period_start(today, granularity)
+    for _ in range(ahead):
+        last = next_period(last, granularity)
+    return last
+
+
+def setup(engine, granularity: str, ahead: int, today: date | None = None) -> list[str]:
+    # una sola transacción: si algo falla la tabla original queda como estaba
+    today = today or date.today()
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": LOCK_ID})
+        if is_partitioned(conn):
+            return []
+        # índices (salvo la PK y los únicos, que en una tabla particionada deben incluir la fecha) y FKs
+        indexes = conn.execute(text("""
+            SELECT indexdef FROM pg_indexes
+            WHERE schemaname = current_schema() AND tablename = :t AND indexdef NOT LIKE 'CREATE UNIQUE%'
+        """), {"t": TABLE}).scalars().all()
+        fks = conn.execute(text(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = to_regclass(:t) AND contype = 'f'"
+        ), {"t": TABLE}).all()
+        first, last = conn.execute(text(f"SELECT min(transaction_date), max(transaction_date) FROM {TABLE}")).one()
+
+        conn.execute(text(
+            f"CREATE TABLE {TABLE}_partitioned (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE) "
+            "PARTITION BY RANGE (transaction_date)"
+        ))
+        conn.execute(text(f"ALTER TABLE {TABLE}_partitioned ADD CONSTRAINT {TABLE}_pkey_new PRIMARY KEY (id, transaction_date)"))
+        conn.execute(text(f"ALTER TABLE {TABLE} RENAME TO {TABLE}_unpartitioned"))
+        conn.execute(text(f"ALTER TABLE {TABLE}_partitioned RENAME TO {TABLE}"))
+
+        created = _create_range(conn, first or today, max(last or today, _ahead(today, granularity, ahead)), granularity, False)
+        conn.execute(text(f"CREATE TABLE {DEFAULT} PARTITION OF {TABLE} DEFAULT"))
+        conn.execute(text(f"INSERT INTO {TABLE} SELECT * FROM {TABLE}_unpartitioned"))
+        conn.execute(text(f"DROP TABLE {TABLE}_unpartitioned"))
+
+        conn.execute(text(f"ALTER TABLE {TABLE} RENAME CONSTRAINT {TABLE}_pkey_new TO {TABLE}_pkey"))
+        for ddl in indexes:
+            conn.execute(text(ddl))
+        for name, definition in fks:
+            conn.execute(text(f"ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}"))
+        conn.execute(text(f"ANALYZE {TABLE}"))
+    return created
+
+
+def ensure(engine, ahead: int, today: date | None = None) -> list[str]:
+    today = today or date.today()
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            return []
+        parts = partitions(conn)
+        granularity = granularity_of(parts)
+        has_default = any(p["name"] == DEFAULT for p in parts)
+        first = last = today
+        if has_default:
+            lo, hi = conn.execute(text(f"SELECT min(transaction_date), max(transaction_date) FROM {DEFAULT}")).one()
+            first, last = min(lo or today, today), max(hi or today, today)
+        ranged = [p["from"] for p in parts if p["from"]]
+        if ranged:
+            # sin huecos: desde la última existente (o antes, si DEFAULT tiene filas más viejas)
+            first = min(first, max(ranged))
+        return _create_range(conn, first, max(last, _ahead(today, granularity, ahead)), granularity, has_default)
+
+
+def _index_partitions(conn, partition: str) -> list[str]:
+    return conn.execute(text(
+        "SELECT indexrelid::regclass::text FROM pg_index WHERE indrelid = to_regclass(:p)"
+    ), {"p": partition}).scalars().all()
+
+
+def _cluster_index(conn, partition: str) -> str | None:
+    # la partición del índice (user_id, transaction_date, ...): orden de lectura de los listados
+    return conn.execute(text("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_index x ON x.indexrelid = c.oid
+        WHERE i.inhparent = to_regclass('ix_transactions_user_date') AND x.indrelid = to_regclass(:p)
+    """), {"p": partition}).scalar()
+
+
+def archive(engine, before: date, tablespace: str | None = None) -> list[str]:
+    # una transacción por partición: CLUSTER reescribe la tabla con lock exclusivo
+    if tablespace and not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", tablespace):
+        raise ValueError(f"Invalid tablespace name: {tablespace}")
+    with engine.connect() as conn:
+        if not is_partitioned(conn):
+            return []
+        targets = [p["name"] for p in partitions(conn) if p["to"] and p["to"] <= before and not p["archived"]]
+
+    done = []
+    for name in targets:
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {name} SET (fillfactor = 100)"))
+            index = _cluster_index(conn, name)
+            if index:
+                conn.execute(text(f"CLUSTER {name} USING {index}"))
+            if tablespace:
+                conn.execute(text(f"ALTER TABLE {name} SET TABLESPACE {tablespace}"))
+                for ix in _index_partitions(conn, name):
+                    conn.execute(text(f"ALTER INDEX {ix} SET TABLESPACE {tablespace}"))
+            conn.execute(text(f"ANALYZE {name}"))
+            conn.execute(text(f"COMMENT ON TABLE {name} IS 'archived {date.today().isoformat()}'"))
+        done.append(name)
+    return done
@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from uuid import UUID
+
+from sqlalchemy import event
+
+from app.config import settings
+from app.models import User
+
+
+class TTLCache:
+    # LRU acotado con vencimiento por entrada
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, count: bool = True):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[1] <= time.time():
+                if item is not None:
+                    del self._data[key]
+                self.misses += count
+                return None
+            self._data.move_to_end(key)
+            self.hits += count
+            return item[0]
+
+    def set(self, key, value, expires_at: float):
+        if self.maxsize <= 0 or expires_at <= time.time():
+            return
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    id: UUID
+    email: str
+    currency: str
+
+    def to_user(self) -> User:
+        # instancia transitoria (no ligada a ninguna sesión) con lo que usan los routers
+        return User(id=self.id, email=self.email, currency=self.currency, password_hash="")
+
+
+# token -> claims verificados; sub -> snapshot del usuario
+tokens = TTLCache(settings.AUTH_CACHE_SIZE)
+users = TTLCache(settings.AUTH_CACHE_SIZE)
+
+
+def get_claims(token: str) -> dict | None:
+    return tokens.get(token)
+
+
+def put_claims(token: str, claims: dict):
+    # nunca más allá del exp del token
+    expires_at = min(time.time() + settings.AUTH_CACHE_TTL_SEC, float(claims.get("exp", 0)))
+    tokens.set(token, claims, expires_at)
+
+
+def peek_sub(token: str) -> str | None:
+    claims = tokens.get(token, count=False)
+    return claims.get("sub") if claims else None
+
+
+def get_user(user_id: UUID) -> User | None:
+    snap = users.get(user_id)
+    return snap.to_user() if snap else None
+
+
+def put_user(user: User):
+    snap = UserSnapshot(id=user.id, email=user.email, currency=user.currency)
+    users.set(user.id, snap, time.time() + settings.AUTH_CACHE_TTL_SEC)
+
+
+def invalidate_user(user_id: UUID):
+    users.pop(user_id)
+
+
+def clear():
+    tokens.clear()
+    users.clear()
+
+
+def stats() -> dict:
+    return {"tokens": tokens.stats(), "users": users.stats()}
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target):
+    invalidate_user(target.id)
@@ -0,0 +1,44 @@
+from uuid import UUID
+
+import orjson
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import select as sa_select
+
+# Listados rápidos: SELECT de columnas sueltas (filas, sin identity map ni hidratar
+# entidades) y serialización directa con orjson (uuid/date/datetime/enum nativos).
+
+
+def columns(model, fields: str | None) -> tuple[list, list[str]]:
+    # fields="id,amount" -> (columnas a seleccionar, nombres a devolver)
+    table = model.__table__.columns
+    if fields:
+        names = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+        unknown = [n for n in names if n not in table]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    else:
+        names = [c.key for c in table]
+    return [table[n] for n in names], names
+
+
+def rows(result, names: list[str]) -> list[dict]:
+    # columnas extra al final de la fila (p. ej. las del cursor) se descartan
+    return [dict(zip(names, row)) for row in result]
+
+
+def select(*cols):
+    # select de SQLAlchemy: el de sqlmodel con una sola columna devuelve escalares, no filas
+    return sa_select(*cols)
+
+
+def _default(value):
+    # asyncpg devuelve su propio UUID (subclase de uuid.UUID): orjson solo serializa el tipo exacto
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class JSONResponse(ORJSONResponse):
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
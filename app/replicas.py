@@ -0,0 +1,55 @@
+import itertools
+import threading
+import time
+
+
+class ReplicaSet:
+    # Réplicas de lectura: la menos ocupada (conexiones en uso del pool), empates en round-robin.
+    # Una réplica que falla queda fuera retry_after segundos y las lecturas van al primario.
+    def __init__(self, engines: list, retry_after: int):
+        self.engines = engines
+        self.retry_after = retry_after
+        self.picked = 0
+        self.fallbacks = 0
+        self._down: dict[int, float] = {}
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+
+    def _in_use(self, engine) -> int:
+        pool = getattr(engine, "sync_engine", engine).pool
+        checkedout = getattr(pool, "checkedout", None)
+        return checkedout() if checkedout else 0
+
+    def pick(self):
+        if not self.engines:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            healthy = [i for i in range(len(self.engines)) if self._down.get(i, 0) <= now]
+            if not healthy:
+                self.fallbacks += 1
+                return None
+            start = next(self._turn) % len(healthy)
+            rotated = healthy[start:] + healthy[:start]
+            best = min(rotated, key=lambda i: self._in_use(self.engines[i]))
+            self.picked += 1
+            return self.engines[best]
+
+    def mark_down(self, engine):
+        with self._lock:
+            self._down[self.engines.index(engine)] = time.monotonic() + self.retry_after
+            self.fallbacks += 1
+
+    def fallback(self):
+        # réplica atrasada respecto de la última escritura del usuario
+        with self._lock:
+            self.fallbacks += 1
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "replicas": len(self.engines),
+            "down": sum(1 for until in self._down.values() if until > now),
+            "picked": self.picked,
+            "fallbacks": self.fallbacks,
+        }
@@ -0,0 +1,105 @@
+from datetime import date
+from uuid import UUID
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from app import ledger, projection, rollups, versions
+from app.config import settings
+from app.db import lock_user
+from app.models import Account, Category, MonthlyRollup, Transaction, User
+from app.schemas import money_out
+
+# Reportes pesados: corren en el pool de app.jobs (fuera del request) con su propia sesión.
+# Cada uno recibe (session, user, params) y devuelve un dict serializable; los montos salen
+# convertidos con money_out igual que en los endpoints.
+
+
+def yearly_summary(session: Session, user: User, params: dict) -> dict:
+    year = params["year"]
+    start, end = date(year, 1, 1), date(year + 1, 1, 1)
+    totals = rollups.month_totals(session, user.id, start, end)
+    months = []
+    for m in range(1, 13):
+        income, expense = totals.get((year, m), (0, 0))
+        months.append(money_out(
+            {"month": f"{year:04d}-{m:02d}", "income": income, "expense": expense, "balance": income - expense},
+            user.currency,
+        ))
+
+    rows = session.exec(
+        select(MonthlyRollup.category_id, Category.name, MonthlyRollup.type,
+               func.sum(MonthlyRollup.total), func.sum(MonthlyRollup.count))
+        .join(Category, Category.id == MonthlyRollup.category_id, isouter=True)
+        .where(
+            MonthlyRollup.user_id == user.id,
+            MonthlyRollup.month >= start,
+            MonthlyRollup.month < end,
+            MonthlyRollup.type.in_(("income", "expense")),
+        )
+        .group_by(MonthlyRollup.category_id, Category.name, MonthlyRollup.type)
+    ).all()
+    categories = sorted(
+        (
+            {
+                "category_id": None if cat_id == rollups.NO_CATEGORY else str(cat_id),
+                "name": name,
+                "type": tx_type,
+                "total": int(total or 0),
+                "count": int(count or 0),
+            }
+            for cat_id, name, tx_type, total, count in rows
+        ),
+        key=lambda r: r["total"],
+        reverse=True,
+    )
+
+    income = sum(i for i, _ in totals.values())
+    expense = sum(e for _, e in totals.values())
+    return {
+        "year": year,
+        **money_out({"income": income, "expense": expense, "balance": income - expense}, user.currency),
+        "months": months,
+        "categories": [money_out(c, user.currency) for c in categories],
+    }
+
+
+def export(session: Session, user: User, params: dict) -> dict:
+    cols, names = projection.columns(Transaction, None)
+    query = projection.select(*cols).where(Transaction.user_id == user.id)
+    if params.get("from_date"):
+        query = query.where(Transaction.transaction_date >= date.fromisoformat(params["from_date"]))
+    if params.get("to_date"):
+        query = query.where(Transaction.transaction_date <= date.fromisoformat(params["to_date"]))
+    rows = session.exec(
+        query.order_by(Transaction.transaction_date, Transaction.created_at, Transaction.id)
+        .limit(settings.REPORT_EXPORT_MAX_ROWS + 1)
+    ).all()
+    if len(rows) > settings.REPORT_EXPORT_MAX_ROWS:
+        raise ValueError(f"Too many transactions (max {settings.REPORT_EXPORT_MAX_ROWS}), narrow the date range")
+    return {"count": len(rows), "transactions": [money_out(r, user.currency) for r in projection.rows(rows, names)]}
+
+
+def rebuild(session: Session, user: User, params: dict) -> dict:
+    # rollups + saldos del usuario desde transactions (lo mismo que la CLI, acotado a un usuario).
+    # Con el lock del usuario las escrituras concurrentes esperan al commit (o se esperan a ellas):
+    # nada se confirma entre el cálculo y el upsert.
+    lock_user(session, user.id)
+    rollups.rebuild_user(session, user.id)
+    accounts = session.exec(select(Account).where(Account.user_id == user.id)).all()
+    ledger.store_balances(session, accounts, ledger.compute_balances(session, accounts))
+    versions.bump(session, user.id)
+    session.commit()
+    return {"accounts": len(accounts)}
+
+
+REPORTS = {
+    "yearly_summary": yearly_summary,
+    "export": export,
+    "rebuild": rebuild,
+}
+
+
+def run(session: Session, user_id: UUID, kind: str, params: dict) -> dict:
+    user = session.get(User, user_id)
+    return REPORTS[kind](session, user, params)
@@ -0,0 +1,101 @@
+from collections import defaultdict
+from datetime import date
+from uuid import UUID
+
+from sqlalchemy import and_, case, delete, func, insert, literal
+from sqlmodel import Session, select
+
+from app.db import lock_user, upsert
+from app.models import Account, BalanceCheckpoint, MonthlyRollup, Transaction, User
+
+NO_CATEGORY = UUID(int=0)
+
+KEY = ["user_id", "month", "account_id", "category_id", "type"]
+
+
+def _v(value):
+    return getattr(value, "value", value)
+
+
+def month_start(d: date) -> date:
+    return d.replace(day=1)
+
+
+def month_start_sql(column, dialect: str):
+    if dialect == "postgresql":
+        return func.date_trunc("month", column).cast(column.type)
+    return func.date(column, "start of month")
+
+
+def add(session: Session, txs: list[Transaction]):
+    # suma/cuenta por clave (user, mes, cuenta, categoría, tipo) y un solo upsert
+    acc = defaultdict(lambda: [0, 0])
+    for t in txs:
+        key = (t.user_id, month_start(t.transaction_date), t.account_id, t.category_id or NO_CATEGORY, _v(t.type))
+        acc[key][0] += t.amount
+        acc[key][1] += 1
+    rows = [dict(zip(KEY, k), total=v[0], count=v[1]) for k, v in acc.items()]
+    upsert(session, MonthlyRollup, rows, KEY, lambda excluded: {
+        "total": MonthlyRollup.total + excluded.total,
+        "count": MonthlyRollup.count + excluded.count,
+    })
+
+
+def rebuild_user(session: Session, user_id, checkpoints: bool = True):
+    # set-based: borra y recalcula con INSERT ... SELECT ... GROUP BY.
+    # checkpoints=False cuando solo cambian categorías: los saldos no se mueven
+    lock_user(session, user_id)
+    dialect = session.get_bind().dialect.name
+    month = month_start_sql(Transaction.transaction_date, dialect)
+    category = func.coalesce(Transaction.category_id, literal(NO_CATEGORY, Transaction.category_id.type))
+    session.exec(delete(MonthlyRollup).where(MonthlyRollup.user_id == user_id))
+    if checkpoints:
+        # los cierres de mes se derivan de los rollups: se recalculan en la próxima consulta
+        session.exec(delete(BalanceCheckpoint).where(BalanceCheckpoint.user_id == user_id))
+    session.exec(
+        insert(MonthlyRollup).from_select(
+            KEY + ["total", "count"],
+            select(
+                Transaction.user_id, month, Transaction.account_id, category, Transaction.type,
+                func.sum(Transaction.amount), func.count(),
+            )
+            .where(Transaction.user_id == user_id)
+            .group_by(Transaction.user_id, month, Transaction.account_id, category, Transaction.type),
+        )
+    )
+
+
+def rebuild(session: Session, user_id=None) -> int:
+    user_ids = [user_id] if user_id else session.exec(select(User.id)).all()
+    for uid in user_ids:
+        rebuild_user(session, uid)
+        session.commit()
+    return len(user_ids)
+
+
+def month_totals(session: Session, user_id, start: date, end: date) -> dict[tuple[int, int], tuple[int, int]]:
+    # lee de monthly_rollups: el costo depende de meses x categorías, no de la cantidad de movimientos
+    # SUM de BIGINT (unidades menores): exacto en la base
+    # ingresos (solo bank/cash)
+    income = func.sum(case(
+        (and_(MonthlyRollup.type == "income", Account.type.in_(("bank", "cash"))), MonthlyRollup.total),
+        else_=0,
+    ))
+    # gastos "consumo real": expense en bank/cash y en credit_card,
+    # pero OJO: en el frontend podés excluir la categoría "Pago tarjeta" en reportes si querés
+    expense = func.sum(case(
+        (and_(MonthlyRollup.type == "expense", Account.type.in_(("bank", "cash", "credit_card"))), MonthlyRollup.total),
+        else_=0,
+    ))
+
+    rows = session.exec(
+        select(MonthlyRollup.month, income, expense)
+        .join(Account, Account.id == MonthlyRollup.account_id)
+        .where(
+            MonthlyRollup.user_id == user_id,
+            MonthlyRollup.month >= start,
+            MonthlyRollup.month < end,
+        )
+        .group_by(MonthlyRollup.month)
+    ).all()
+    return {(m.year, m.month): (int(inc or 0), int(exp or 0)) for m, inc, exp in rows}
@@ -1,20 +1,60 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
+from datetime import date
+from typing import Literal
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel import Session
 
 from app.db import get_session
-from app.models import Account, User, Transaction
-from app.schemas import AccountCreate, AccountPatch
-from app.deps import get_current_user
+from app.models import Account, AccountBalance, User
+from app.schemas import AccountCreate, AccountPatch, money_out, to_minor
+from app.deps import conditional_get, get_current_user, get_read_session
+from app import history, ledger, projection, versions
+from app.metrics import TimedRoute
 
-router = APIRouter(prefix="/accounts", tags=["accounts"])
+router = APIRouter(prefix="/accounts", tags=["accounts"], route_class=TimedRoute)
 
-@router.get("")
+@router.get("", dependencies=[Depends(conditional_get)])
 def list_accounts(
+    fields: str | None = None,
+    include_balance: bool = False,
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
+):
+    cols, names = projection.columns(Account, fields)
+    if not include_balance:
+        result = session.exec(projection.select(*cols).where(Account.user_id == current_user.id))
+        items = projection.rows(result, names)
+    else:
+        rows = session.exec(_with_balance(projection.select(*cols), current_user.id)).all()
+        items = projection.rows(rows, names)
+        for item, payload in zip(items, _balance_payloads(session, rows)):
+            item.update({k: v for k, v in payload.items() if k not in ("account_id", "type")})
+    return projection.JSONResponse([money_out(item, current_user.currency) for item in items])
+
+def _with_balance(query, user_id):
+    # saldo desde el ledger en la misma consulta: id, type y balance quedan al final de la fila
+    return (
+        query.add_columns(Account.id, Account.type, AccountBalance.balance)
+        .outerjoin(AccountBalance, AccountBalance.account_id == Account.id)
+        .where(Account.user_id == user_id)
+    )
+
+def _balance_payloads(session: Session, rows) -> list[dict]:
+    missing = ledger.balances_by_id(session, [row[-3] for row in rows if row[-1] is None])
+    out = []
+    for row in rows:
+        account_id, acc_type, balance = row[-3:]
+        out.append(ledger.payload(account_id, acc_type, missing[account_id] if balance is None else balance))
+    return out
+
+@router.get("/balances", dependencies=[Depends(conditional_get)])
+def account_balances(
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_read_session),
 ):
-    accounts = session.exec(select(Account).where(Account.user_id == current_user.id)).all()
-    return accounts
+    rows = session.exec(_with_balance(projection.select(), current_user.id)).all()
+    return projection.JSONResponse([money_out(p, current_user.currency) for p in _balance_payloads(session, rows)])
 
 @router.post("")
 def create_account(
@@ -22,15 +62,20 @@ def create_account(
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session),
 ):
-    acc = Account(user_id=current_user.id, name=payload.name, type=payload.type, initial_balance=payload.initial_balance)
+    acc = Account(
+        user_id=current_user.id, name=payload.name, type=payload.type,
+        initial_balance=to_minor(payload.initial_balance, current_user.currency),
+    )
     session.add(acc)
+    ledger.open_account(session, acc)
+    versions.bump(session, current_user.id)
     session.commit()
     session.refresh(acc)
-    return acc
+    return money_out(acc.model_dump(), current_user.currency)
 
 @router.patch("/{account_id}")
 def patch_account(
-    account_id: str,
+    account_id: UUID,
     payload: AccountPatch,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session),
@@ -44,38 +89,55 @@ def patch_account(
     if payload.active is not None:
         acc.active = payload.active
     if payload.initial_balance is not None:
-        acc.initial_balance = payload.initial_balance
+        old_initial = acc.initial_balance
+        acc.initial_balance = to_minor(payload.initial_balance, current_user.currency)
+        ledger.adjust(session, acc, acc.initial_balance - old_initial)
+        if acc.initial_balance != old_initial:
+            ledger.invalidate_checkpoints(session, {acc.id: date.min})
 
     session.add(acc)
+    versions.bump(session, current_user.id)
     session.commit()
     session.refresh(acc)
-    return acc
+    return money_out(acc.model_dump(), current_user.currency)
 
-@router.get("/{account_id}/balance")
+@router.get("/{account_id}/balance", dependencies=[Depends(conditional_get)])
 def account_balance(
-    account_id: str,
+    account_id: UUID,
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
 ):
     acc = session.get(Account, account_id)
     if not acc or acc.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Account not found")
 
-    txs = session.exec(select(Transaction).where(
-        Transaction.user_id == current_user.id,
-        Transaction.account_id == acc.id
-    )).all()
-
-    if acc.type in ("bank", "cash"):
-        income = sum(t.amount for t in txs if t.type == "income")
-        tin = sum(t.amount for t in txs if t.type == "transfer_in")
-        expense = sum(t.amount for t in txs if t.type == "expense")
-        tout = sum(t.amount for t in txs if t.type == "transfer_out")
-        balance = float(acc.initial_balance + income + tin - expense - tout)
-        return {"account_id": str(acc.id), "type": acc.type, "balance": balance}
-
-    # credit card debt
-    spend = sum(t.amount for t in txs if t.type == "expense")
-    paid = sum(t.amount for t in txs if t.type == "credit_payment")
-    debt = float(acc.initial_balance + spend - paid)
-    return {"account_id": str(acc.id), "type": acc.type, "debt": debt}
+    return money_out(ledger.balance_payload(acc, ledger.get_balance(session, acc)), current_user.currency)
+
+@router.get("/{account_id}/history", dependencies=[Depends(conditional_get)])
+def account_history(
+    account_id: UUID,
+    from_: date = Query(alias="from", ge=history.MIN_DATE),
+    to: date = Query(),
+    granularity: Literal["day", "week", "month"] = "month",
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_read_session),
+):
+    if from_ > to:
+        raise HTTPException(status_code=400, detail="from must be before to")
+    if history.point_count(from_, to, granularity) > history.MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"Range too large (max {history.MAX_POINTS} points)")
+
+    acc = session.get(Account, account_id)
+    if not acc or acc.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Account not found")
+
+    points = history.balance_history(session, acc, from_, to, granularity)
+    key = "balance" if acc.type in ("bank", "cash") else "debt"
+    return {
+        "account_id": str(acc.id),
+        "type": acc.type,
+        "granularity": granularity,
+        "points": [
+            money_out({"from": p["from"], "to": p["to"], key: p["balance"]}, current_user.currency) for p in points
+        ],
+    }
@@ -0,0 +1,67 @@
+import inspect
+
+from fastapi import APIRouter, Depends
+from fastapi.routing import APIRoute
+
+from app.db import get_async_session, get_session
+from app.deps import (
+    conditional_get, conditional_get_async, get_current_user, get_current_user_async,
+    get_read_session, get_read_session_async,
+)
+
+# dependencias sync -> equivalente async
+ASYNC_DEPENDENCIES = {
+    get_session: get_async_session,
+    get_current_user: get_current_user_async,
+    conditional_get: conditional_get_async,
+    get_read_session: get_read_session_async,
+}
+
+
+def _async_endpoint(endpoint):
+    # Misma lógica del handler sync, pero corrida con AsyncSession.run_sync:
+    # el I/O a la base va por el driver async (greenlet) y no ocupa el threadpool.
+    sig = inspect.signature(endpoint)
+    session_param = None
+    params = []
+    for p in sig.parameters.values():
+        dep = getattr(p.default, "dependency", None)
+        if dep in (get_session, get_read_session):
+            session_param = p.name
+        if dep in ASYNC_DEPENDENCIES:
+            p = p.replace(default=Depends(ASYNC_DEPENDENCIES[dep]), annotation=inspect.Parameter.empty)
+        params.append(p)
+    if session_param is None:
+        return None
+
+    async def handler(**kwargs):
+        session = kwargs.pop(session_param)
+        return await session.run_sync(lambda s: endpoint(**kwargs, **{session_param: s}))
+
+    handler.__signature__ = sig.replace(parameters=params)
+    handler.__name__ = endpoint.__name__
+    handler.__doc__ = endpoint.__doc__
+    return handler
+
+
+def asyncify(router: APIRouter) -> APIRouter:
+    # copia de las rutas del router; las que usan sesión pasan a la versión async
+    out = APIRouter(route_class=router.route_class)
+    for route in router.routes:
+        if not isinstance(route, APIRoute):
+            out.routes.append(route)
+            continue
+        endpoint = _async_endpoint(route.endpoint) or route.endpoint
+        dependencies = [Depends(ASYNC_DEPENDENCIES.get(d.dependency, d.dependency)) for d in route.dependencies]
+        out.add_api_route(
+            route.path,
+            endpoint,
+            dependencies=dependencies,
+            methods=list(route.methods),
+            response_model=route.response_model,
+            status_code=route.status_code,
+            tags=route.tags,
+            name=route.name,
+            response_class=route.response_class,
+        )
+    return out
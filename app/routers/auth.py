@@ -1,32 +1,50 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlmodel import Session, select
 
 from app.db import get_session
 from app.models import User
 from app.schemas import RegisterIn, LoginIn, TokenOut, UserOut
-from app.security import hash_password, verify_password, create_access_token
+from app.security import hash_password, verify_and_update, create_access_token
 from app.deps import get_current_user
+from app.metrics import TimedRoute
 
-router = APIRouter(prefix="/auth", tags=["auth"])
+router = APIRouter(prefix="/auth", tags=["auth"], route_class=TimedRoute)
 
-@router.post("/register", response_model=UserOut)
-def register(payload: RegisterIn, session: Session = Depends(get_session)):
-    existing = session.exec(select(User).where(User.email == payload.email)).first()
-    if existing:
-        raise HTTPException(status_code=409, detail="Email already registered")
+def _find_user(session: Session, email: str) -> User | None:
+    return session.exec(select(User).where(User.email == email)).first()
 
-    user = User(email=payload.email, password_hash=hash_password(payload.password))
+def _save(session: Session, user: User) -> User:
     session.add(user)
     session.commit()
     session.refresh(user)
+    return user
+
+# async: mientras corre bcrypt (password_pool) el request no ocupa un hilo del threadpool;
+# las consultas (Session sync) sí van al threadpool, y son cortas
+@router.post("/register", response_model=UserOut)
+async def register(payload: RegisterIn, session: Session = Depends(get_session)):
+    existing = await run_in_threadpool(_find_user, session, payload.email)
+    if existing:
+        raise HTTPException(status_code=409, detail="Email already registered")
+
+    password_hash = await hash_password(payload.password)
+    user = await run_in_threadpool(_save, session, User(email=payload.email, password_hash=password_hash))
 #    return {"user_id": str(user.id), "message": "registered"}
     return user
 
 @router.post("/login", response_model=TokenOut)
-def login(payload: LoginIn, session: Session = Depends(get_session)):
-    user = session.exec(select(User).where(User.email == payload.email)).first()
-    if not user or not verify_password(payload.password, user.password_hash):
+async def login(payload: LoginIn, session: Session = Depends(get_session)):
+    user = await run_in_threadpool(_find_user, session, payload.email)
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    ok, new_hash = await verify_and_update(payload.password, user.password_hash)
+    if not ok:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        # rehash transparente cuando cambia BCRYPT_ROUNDS
+        user.password_hash = new_hash
+        await run_in_threadpool(_save, session, user)
 
     token = create_access_token(sub=str(user.id))
     return TokenOut(access_token=token)
@@ -1,23 +1,30 @@
+from uuid import UUID
+
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import delete, update
 from sqlmodel import Session, select
 
 from app.db import get_session
-from app.models import Category, User
-from app.schemas import CategoryCreate
-from app.deps import get_current_user
+from app.models import Account, Category, CategoryRule, Transaction, User
+from app.schemas import CategoryCreate, CategoryRuleCreate, RecategorizeIn, money_out, to_minor
+from app.deps import conditional_get, get_current_user, get_read_session
+from app import categorize, projection, rollups, versions
+from app.metrics import TimedRoute
 
-router = APIRouter(prefix="/categories", tags=["categories"])
+router = APIRouter(prefix="/categories", tags=["categories"], route_class=TimedRoute)
 
-@router.get("")
+@router.get("", dependencies=[Depends(conditional_get)])
 def list_categories(
     type: str | None = None,
+    fields: str | None = None,
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
 ):
-    q = select(Category).where(Category.user_id == current_user.id)
+    cols, names = projection.columns(Category, fields)
+    q = projection.select(*cols).where(Category.user_id == current_user.id)
     if type:
         q = q.where(Category.type == type)
-    return session.exec(q).all()
+    return projection.JSONResponse(projection.rows(session.exec(q), names))
 
 @router.post("")
 def create_category(
@@ -27,19 +34,132 @@ def create_category(
 ):
     cat = Category(user_id=current_user.id, name=payload.name, type=payload.type)
     session.add(cat)
+    versions.bump(session, current_user.id)
     session.commit()
     session.refresh(cat)
     return cat
 
+def _own_category(session: Session, user_id: UUID, category_id: UUID | None, name: str) -> Category:
+    cat = session.get(Category, category_id) if category_id else None
+    if not cat or cat.user_id != user_id:
+        raise HTTPException(status_code=404, detail=f"{name} not found")
+    return cat
+
+def _merge(session: Session, user_id: UUID, source: Category, target: Category) -> tuple[int, int]:
+    # set-based: movimientos y reglas de source pasan a target; devuelve (movimientos, reglas)
+    if source.id == target.id:
+        raise HTTPException(status_code=400, detail="Source and target categories must differ")
+    if source.type != target.type:
+        raise HTTPException(status_code=400, detail="Source and target categories must have the same type")
+    res = session.exec(
+        update(Transaction)
+        .where(Transaction.user_id == user_id, Transaction.category_id == source.id)
+        .values(category_id=target.id)
+        .execution_options(synchronize_session=False)
+    )
+    rules = session.exec(
+        update(CategoryRule)
+        .where(CategoryRule.user_id == user_id, CategoryRule.category_id == source.id)
+        .values(category_id=target.id)
+        .execution_options(synchronize_session=False)
+    )
+    return res.rowcount, rules.rowcount
+
 @router.delete("/{category_id}")
 def delete_category(
-    category_id: str,
+    category_id: UUID,
+    reassign_to: UUID | None = None,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session),
 ):
-    cat = session.get(Category, category_id)
-    if not cat or cat.user_id != current_user.id:
-        raise HTTPException(status_code=404, detail="Category not found")
+    cat = _own_category(session, current_user.id, category_id, "Category")
+    if reassign_to:
+        target = _own_category(session, current_user.id, reassign_to, "Target category")
+        moved, _ = _merge(session, current_user.id, cat, target)
+        if moved:
+            rollups.rebuild_user(session, current_user.id, checkpoints=False)
+    else:
+        # los movimientos referencian la categoría (FK): hay que reasignarlos antes de borrarla
+        used = session.exec(select(Transaction.id).where(Transaction.category_id == cat.id).limit(1)).first()
+        if used:
+            raise HTTPException(status_code=409, detail="Category has transactions, pass reassign_to")
+        session.exec(delete(CategoryRule).where(CategoryRule.category_id == cat.id))
+    categorize.invalidate(current_user.id)
     session.delete(cat)
+    versions.bump(session, current_user.id)
     session.commit()
     return {"message": "deleted"}
+
+@router.get("/rules")
+def list_rules(
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+):
+    return [money_out(rule.model_dump(), current_user.currency) for rule, _ in categorize.load_rules(session, current_user.id)]
+
+@router.post("/rules")
+def create_rule(
+    payload: CategoryRuleCreate,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+):
+    _own_category(session, current_user.id, payload.category_id, "Category")
+    if payload.account_id:
+        acc = session.get(Account, payload.account_id)
+        if not acc or acc.user_id != current_user.id:
+            raise HTTPException(status_code=404, detail="Account not found")
+
+    rule = CategoryRule(user_id=current_user.id, **payload.model_dump(exclude={"min_amount", "max_amount"}))
+    rule.min_amount = to_minor(payload.min_amount, current_user.currency)
+    rule.max_amount = to_minor(payload.max_amount, current_user.currency)
+    session.add(rule)
+    session.commit()
+    session.refresh(rule)
+    categorize.invalidate(current_user.id)
+    return money_out(rule.model_dump(), current_user.currency)
+
+@router.delete("/rules/{rule_id}")
+def delete_rule(
+    rule_id: UUID,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+):
+    rule = session.get(CategoryRule, rule_id)
+    if not rule or rule.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Rule not found")
+    session.delete(rule)
+    session.commit()
+    categorize.invalidate(current_user.id)
+    return {"message": "deleted"}
+
+@router.post("/recategorize")
+def recategorize(
+    payload: RecategorizeIn,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+):
+    if payload.mode == "merge":
+        source = _own_category(session, current_user.id, payload.source_category_id, "Source category")
+        target = _own_category(session, current_user.id, payload.target_category_id, "Target category")
+        updated, rules = _merge(session, current_user.id, source, target)
+        if payload.delete_source:
+            session.delete(source)
+        categorize.invalidate(current_user.id)
+        # borrar la categoría o mover reglas también es una escritura (aunque no haya movimientos)
+        changed = bool(updated or rules or payload.delete_source)
+    else:
+        extra = []
+        if payload.from_date:
+            extra.append(Transaction.transaction_date >= payload.from_date)
+        if payload.to_date:
+            extra.append(Transaction.transaction_date <= payload.to_date)
+        updated = categorize.recategorize(session, current_user.id, payload.only_uncategorized, extra)
+        changed = bool(updated)
+
+    # los rollups van por categoría: se recalculan una vez para todo el usuario
+    if updated:
+        rollups.rebuild_user(session, current_user.id, checkpoints=False)
+    if changed:
+        versions.bump(session, current_user.id)
+    session.commit()
+    return {"updated": updated}
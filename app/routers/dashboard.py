@@ -1,37 +1,121 @@
 from datetime import date
-from fastapi import APIRouter, Depends
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func
 from sqlmodel import Session, select
 
-from app.db import get_session
-from app.models import Account, Transaction, User
-from app.deps import get_current_user
+from app import analytics, rollups
+from app.schemas import money_out
+from app.models import Category, MonthlyRollup, TxType, User
+from app.rollups import NO_CATEGORY
+from app.deps import conditional_get, get_current_user, get_read_session
+from app.metrics import TimedRoute
 
-router = APIRouter(prefix="/dashboard", tags=["dashboard"])
+router = APIRouter(prefix="/dashboard", tags=["dashboard"], route_class=TimedRoute)
 
-@router.get("/monthly")
+MAX_SERIES_MONTHS = 120
+
+def _next_month(year: int, month: int) -> tuple[int, int]:
+    return year + (month // 12), (month % 12) + 1
+
+def _parse_month(value: str, name: str) -> tuple[int, int]:
+    try:
+        year, month = (int(p) for p in value.split("-"))
+        date(year, month, 1)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be YYYY-MM")
+    return year, month
+
+def _month_range(from_: str, to: str) -> tuple[int, int, int, int, int]:
+    y0, m0 = _parse_month(from_, "from")
+    y1, m1 = _parse_month(to, "to")
+    count = (y1 - y0) * 12 + (m1 - m0) + 1
+    if count < 1:
+        raise HTTPException(status_code=400, detail="from must be before to")
+    if count > MAX_SERIES_MONTHS:
+        raise HTTPException(status_code=400, detail=f"Range too large (max {MAX_SERIES_MONTHS} months)")
+    return y0, m0, y1, m1, count
+
+def _period(year: int, month: int, totals: dict, currency: str) -> dict:
+    income, expense = totals.get((year, month), (0, 0))
+    return money_out(
+        {"period": {"year": year, "month": month}, "income": income, "expense": expense, "balance": income - expense},
+        currency,
+    )
+
+@router.get("/monthly", dependencies=[Depends(conditional_get)])
 def monthly(year: int, month: int,
             current_user: User = Depends(get_current_user),
-            session: Session = Depends(get_session)):
+            session: Session = Depends(get_read_session)):
     # rango de fechas del mes
     start = date(year, month, 1)
-    end = date(year + (month // 12), (month % 12) + 1, 1)
+    end = date(*_next_month(year, month), 1)
+
+    totals = rollups.month_totals(session, current_user.id, start, end)
+    return _period(year, month, totals, current_user.currency)
 
-    txs = session.exec(select(Transaction).where(
-        Transaction.user_id == current_user.id,
-        Transaction.transaction_date >= start,
-        Transaction.transaction_date < end
-    )).all()
+@router.get("/series", dependencies=[Depends(conditional_get)])
+def series(from_: str = Query(alias="from"), to: str = Query(),
+           current_user: User = Depends(get_current_user),
+           session: Session = Depends(get_read_session)):
+    y0, m0, y1, m1, count = _month_range(from_, to)
+    totals = rollups.month_totals(session, current_user.id, date(y0, m0, 1), date(*_next_month(y1, m1), 1))
 
-    # ingresos (solo bank/cash)
-    accounts = session.exec(select(Account).where(Account.user_id == current_user.id)).all()
-    acc_type = {a.id: a.type for a in accounts}
+    out = []
+    y, m = y0, m0
+    for _ in range(count):
+        out.append(_period(y, m, totals, current_user.currency))
+        y, m = _next_month(y, m)
+    return {"from": from_, "to": to, "series": out}
 
-    income = sum(t.amount for t in txs if t.type == "income" and acc_type.get(t.account_id) in ("bank","cash"))
+@router.get("/categories", dependencies=[Depends(conditional_get)])
+def categories(from_: str = Query(alias="from"), to: str = Query(),
+               current_user: User = Depends(get_current_user),
+               session: Session = Depends(get_read_session)):
+    y0, m0, y1, m1, _ = _month_range(from_, to)
 
-    # gastos "consumo real": expense en bank/cash y en credit_card,
-    # pero OJO: en el frontend podés excluir la categoría "Pago tarjeta" en reportes si querés
-    expense = sum(t.amount for t in txs if t.type == "expense" and acc_type.get(t.account_id) in ("bank","cash","credit_card"))
+    rows = session.exec(
+        select(MonthlyRollup.category_id, Category.name, MonthlyRollup.type,
+               func.sum(MonthlyRollup.total), func.sum(MonthlyRollup.count))
+        .join(Category, Category.id == MonthlyRollup.category_id, isouter=True)
+        .where(
+            MonthlyRollup.user_id == current_user.id,
+            MonthlyRollup.month >= date(y0, m0, 1),
+            MonthlyRollup.month < date(*_next_month(y1, m1), 1),
+            MonthlyRollup.type.in_(("income", "expense")),
+        )
+        .group_by(MonthlyRollup.category_id, Category.name, MonthlyRollup.type)
+    ).all()
 
-    balance = income - expense
+    out = [
+        {
+            "category_id": None if cat_id == NO_CATEGORY else str(cat_id),
+            "name": name,
+            "type": tx_type,
+            "total": int(total or 0),
+            "count": int(count or 0),
+        }
+        for cat_id, name, tx_type, total, count in rows
+    ]
+    out.sort(key=lambda r: r["total"], reverse=True)
+    return {"from": from_, "to": to, "categories": [money_out(r, current_user.currency) for r in out]}
 
-    return {"period": {"year": year, "month": month}, "income": income, "expense": expense, "balance": balance}
+@router.get("/aggregate")
+def aggregate(group_by: Literal[analytics.GROUP_BY] = Query(),
+              from_: date = Query(alias="from"), to: date = Query(),
+              type: list[TxType] | None = Query(default=None),
+              version: int = Depends(conditional_get),
+              current_user: User = Depends(get_current_user),
+              session: Session = Depends(get_read_session)):
+    if from_ > to:
+        raise HTTPException(status_code=400, detail="from must be before to")
+    snap = analytics.snapshot(session, current_user.id, version, from_, to)
+    # sin filtro: solo gastos (los totales no mezclan tipos)
+    types = sorted({t.value for t in type}) if type else ["expense"]
+    return {
+        "from": from_.isoformat(),
+        "to": to.isoformat(),
+        "group_by": group_by,
+        "types": types,
+        "groups": [money_out(g, current_user.currency) for g in snap.aggregate(group_by, from_, to, types)],
+    }
@@ -1,30 +1,48 @@
-from uuid import uuid4
+from uuid import UUID, uuid4
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session
+from sqlmodel import Session, select
 
+from app.config import settings
 from app.db import get_session
 from app.models import Account, Category, Transaction, User
-from app.schemas import TransferCreate, CreditCardPaymentCreate
+from app.schemas import AmountPrecisionError, TransferCreate, CreditCardPaymentCreate, OperationsBatch, to_minor
 from app.deps import get_current_user
-
-router = APIRouter(prefix="/operations", tags=["operations"])
-
-@router.post("/transfer")
-def transfer(
-    payload: TransferCreate,
-    current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session),
-):
+from app import ledger
+from app.metrics import TimedRoute
+
+router = APIRouter(prefix="/operations", tags=["operations"], route_class=TimedRoute)
+
+def _preload(session: Session, user_id: UUID, account_ids: set, category_ids: set):
+    # cuentas y categorías del usuario en una consulta por tabla (sirve para 1 o N operaciones)
+    accounts = {
+        a.id: a for a in session.exec(
+            select(Account).where(Account.user_id == user_id, Account.id.in_(account_ids))
+        ).all()
+    } if account_ids else {}
+    categories = {
+        c.id: c for c in session.exec(
+            select(Category).where(Category.user_id == user_id, Category.id.in_(category_ids))
+        ).all()
+    } if category_ids else {}
+    return accounts, categories
+
+def _fee_category(payload, categories: dict) -> Category:
+    fee_cat = categories.get(payload.fee_category_id)
+    if not fee_cat or fee_cat.type != "expense":
+        raise HTTPException(status_code=400, detail="Invalid fee_category_id")
+    return fee_cat
+
+def _transfer_txs(payload: TransferCreate, user_id: UUID, currency: str, accounts: dict, categories: dict):
     if payload.from_account_id == payload.to_account_id:
         raise HTTPException(status_code=400, detail="from_account_id and to_account_id must differ")
     if payload.fee > 0 and not payload.fee_category_id:
         raise HTTPException(status_code=400, detail="fee_category_id required when fee > 0")
 
-    a_from = session.get(Account, payload.from_account_id)
-    a_to = session.get(Account, payload.to_account_id)
-    if not a_from or a_from.user_id != current_user.id:
+    a_from = accounts.get(payload.from_account_id)
+    a_to = accounts.get(payload.to_account_id)
+    if not a_from:
         raise HTTPException(status_code=404, detail="From account not found")
-    if not a_to or a_to.user_id != current_user.id:
+    if not a_to:
         raise HTTPException(status_code=404, detail="To account not found")
 
     if a_from.type == "credit_card" or a_to.type == "credit_card":
@@ -33,68 +51,57 @@ def transfer(
     group_id = uuid4()
 
     tx_out = Transaction(
-        user_id=current_user.id,
+        user_id=user_id,
         account_id=a_from.id,
         type="transfer_out",
         payment_method=payload.payment_method,
-        amount=payload.amount,
+        amount=to_minor(payload.amount, currency),
         transaction_date=payload.transaction_date,
         description=payload.description,
         group_id=group_id
     )
     tx_in = Transaction(
-        user_id=current_user.id,
+        user_id=user_id,
         account_id=a_to.id,
         type="transfer_in",
         payment_method=payload.payment_method,
-        amount=payload.amount,
+        amount=to_minor(payload.amount, currency),
         transaction_date=payload.transaction_date,
         description=payload.description,
         group_id=group_id
     )
 
-    session.add(tx_out)
-    session.add(tx_in)
-
     created = [{"type":"transfer_out"}, {"type":"transfer_in"}]
+    txs = [tx_out, tx_in]
 
     if payload.fee and payload.fee > 0:
-        fee_cat = session.get(Category, payload.fee_category_id)
-        if not fee_cat or fee_cat.user_id != current_user.id or fee_cat.type != "expense":
-            raise HTTPException(status_code=400, detail="Invalid fee_category_id")
+        fee_cat = _fee_category(payload, categories)
 
         tx_fee = Transaction(
-            user_id=current_user.id,
+            user_id=user_id,
             account_id=a_from.id,
             category_id=fee_cat.id,
             type="expense",
             payment_method=payload.payment_method,
-            amount=payload.fee,
+            amount=to_minor(payload.fee, currency),
             transaction_date=payload.transaction_date,
             description="Fee: " + (payload.description or "transfer"),
             group_id=group_id
         )
-        session.add(tx_fee)
         created.append({"type":"expense", "note":"fee"})
+        txs.append(tx_fee)
 
-    session.commit()
-    return {"group_id": str(group_id), "created": created}
+    return group_id, txs, created
 
-
-@router.post("/credit-card-payment")
-def credit_card_payment(
-    payload: CreditCardPaymentCreate,
-    current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session),
-):
+def _credit_card_payment_txs(payload: CreditCardPaymentCreate, user_id: UUID, currency: str, accounts: dict, categories: dict):
     if payload.fee > 0 and not payload.fee_category_id:
         raise HTTPException(status_code=400, detail="fee_category_id required when fee > 0")
 
-    bank = session.get(Account, payload.bank_account_id)
-    card = session.get(Account, payload.credit_card_account_id)
-    if not bank or bank.user_id != current_user.id:
+    bank = accounts.get(payload.bank_account_id)
+    card = accounts.get(payload.credit_card_account_id)
+    if not bank:
         raise HTTPException(status_code=404, detail="Bank account not found")
-    if not card or card.user_id != current_user.id:
+    if not card:
         raise HTTPException(status_code=404, detail="Credit card account not found")
 
     if bank.type not in ("bank", "cash"):
@@ -102,20 +109,20 @@ def credit_card_payment(
     if card.type != "credit_card":
         raise HTTPException(status_code=400, detail="credit_card_account_id must be credit_card")
 
-    pay_cat = session.get(Category, payload.payment_category_id)
-    if not pay_cat or pay_cat.user_id != current_user.id or pay_cat.type != "expense":
+    pay_cat = categories.get(payload.payment_category_id)
+    if not pay_cat or pay_cat.type != "expense":
         raise HTTPException(status_code=400, detail="Invalid payment_category_id (must be expense)")
 
     group_id = uuid4()
 
     # A) sale dinero del banco (categoría Pago tarjeta)
     tx_bank = Transaction(
-        user_id=current_user.id,
+        user_id=user_id,
         account_id=bank.id,
         category_id=pay_cat.id,
         type="expense",
         payment_method=payload.payment_method,
-        amount=payload.amount,
+        amount=to_minor(payload.amount, currency),
         transaction_date=payload.transaction_date,
         description=payload.description or f"Credit card payment ({payload.reference or ''})".strip(),
         group_id=group_id
@@ -123,40 +130,120 @@ def credit_card_payment(
 
     # B) abono a la tarjeta (reduce deuda)
     tx_card = Transaction(
-        user_id=current_user.id,
+        user_id=user_id,
         account_id=card.id,
         type="credit_payment",
         payment_method=payload.payment_method,
-        amount=payload.amount,
+        amount=to_minor(payload.amount, currency),
         transaction_date=payload.transaction_date,
         description=payload.description or "Credit card payment",
         group_id=group_id
     )
 
-    session.add(tx_bank)
-    session.add(tx_card)
-
     created = [{"type":"expense","note":"bank_out"}, {"type":"credit_payment","note":"card_in"}]
+    txs = [tx_bank, tx_card]
 
     # C) comisión opcional (gasto real)
     if payload.fee and payload.fee > 0:
-        fee_cat = session.get(Category, payload.fee_category_id)
-        if not fee_cat or fee_cat.user_id != current_user.id or fee_cat.type != "expense":
-            raise HTTPException(status_code=400, detail="Invalid fee_category_id")
+        fee_cat = _fee_category(payload, categories)
 
         tx_fee = Transaction(
-            user_id=current_user.id,
+            user_id=user_id,
             account_id=bank.id,
             category_id=fee_cat.id,
             type="expense",
             payment_method=payload.payment_method,
-            amount=payload.fee,
+            amount=to_minor(payload.fee, currency),
             transaction_date=payload.transaction_date,
             description="Fee: " + (payload.description or "card payment"),
             group_id=group_id
         )
-        session.add(tx_fee)
         created.append({"type":"expense","note":"fee"})
-
+        txs.append(tx_fee)
+
+    return group_id, txs, created
+
+def _referenced_ids(payload) -> tuple[set, set]:
+    if isinstance(payload, TransferCreate):
+        accounts = {payload.from_account_id, payload.to_account_id}
+        categories = {payload.fee_category_id}
+    else:
+        accounts = {payload.bank_account_id, payload.credit_card_account_id}
+        categories = {payload.payment_category_id, payload.fee_category_id}
+    return accounts, categories - {None}
+
+def _save(session: Session, payload, user: User, builder):
+    account_ids, category_ids = _referenced_ids(payload)
+    accounts, categories = _preload(session, user.id, account_ids, category_ids)
+    group_id, txs, created = builder(payload, user.id, user.currency, accounts, categories)
+    session.add_all(txs)
+    ledger.record_transactions(session, txs, list(accounts.values()))
     session.commit()
     return {"group_id": str(group_id), "created": created}
+
+@router.post("/transfer")
+def transfer(
+    payload: TransferCreate,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+):
+    return _save(session, payload, current_user, _transfer_txs)
+
+
+@router.post("/credit-card-payment")
+def credit_card_payment(
+    payload: CreditCardPaymentCreate,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+):
+    return _save(session, payload, current_user, _credit_card_payment_txs)
+
+
+@router.post("/batch")
+def batch(
+    payload: OperationsBatch,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+):
+    if len(payload.operations) > settings.OPERATIONS_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"Too many operations (max {settings.OPERATIONS_BATCH_MAX})")
+
+    account_ids, category_ids = set(), set()
+    for op in payload.operations:
+        a, c = _referenced_ids(op)
+        account_ids |= a
+        category_ids |= c
+    accounts, categories = _preload(session, current_user.id, account_ids, category_ids)
+
+    results = []
+    txs = []
+    failed = False
+    for i, op in enumerate(payload.operations):
+        builder = _transfer_txs if op.kind == "transfer" else _credit_card_payment_txs
+        try:
+            group_id, op_txs, created = builder(op, current_user.id, current_user.currency, accounts, categories)
+        except HTTPException as e:
+            failed = True
+            results.append({"index": i, "kind": op.kind, "status_code": e.status_code, "detail": e.detail})
+            continue
+        except AmountPrecisionError as e:
+            failed = True
+            results.append({"index": i, "kind": op.kind, "status_code": 422, "detail": str(e)})
+            continue
+        txs.extend(op_txs)
+        results.append({"index": i, "kind": op.kind, "group_id": str(group_id), "created": created})
+
+    if failed and payload.all_or_nothing:
+        raise HTTPException(status_code=400, detail={
+            "message": "Batch rejected, no operations were saved",
+            "errors": [r for r in results if "status_code" in r],
+        })
+
+    # un solo INSERT por lotes + actualización del ledger y un commit para todo el batch
+    ledger.insert_transactions(session, txs, list(accounts.values()))
+    session.commit()
+    return {
+        "saved": sum(1 for r in results if "group_id" in r),
+        "failed": sum(1 for r in results if "status_code" in r),
+        "results": results,
+    }
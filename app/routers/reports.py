@@ -0,0 +1,68 @@
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlmodel import Session, select
+
+from app.config import settings
+from app.db import get_session
+from app.deps import get_current_user
+from app.jobs import QueueFull, UserLimit, report_queue
+from app.metrics import TimedRoute
+from app.models import ReportJob, User
+from app.schemas import ReportCreate
+
+router = APIRouter(prefix="/reports", tags=["reports"], route_class=TimedRoute)
+
+def _job_out(job: ReportJob) -> dict:
+    out = {
+        "id": str(job.id),
+        "kind": job.kind,
+        "status": job.status,
+        "data_version": job.data_version,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+    if job.status == "done":
+        out["result"] = job.result
+    if job.status == "failed":
+        out["error"] = job.error
+    return out
+
+@router.post("", status_code=202)
+def create_report(
+    payload: ReportCreate,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+):
+    # la versión de datos identifica el resultado: sin escrituras en el medio se reutiliza el job
+    version = session.exec(select(User.data_version).where(User.id == current_user.id)).one()
+    params = payload.model_dump(mode="json", exclude={"kind"})
+    try:
+        job, created = report_queue.submit(session, current_user.id, payload.kind, params, version)
+    except UserLimit:
+        raise HTTPException(
+            status_code=429, detail="Too many reports in progress",
+            headers={"Retry-After": str(settings.REPORT_RETRY_AFTER_SEC)},
+        )
+    except QueueFull:
+        raise HTTPException(
+            status_code=503, detail="Report queue is full, retry shortly",
+            headers={"Retry-After": str(settings.REPORT_RETRY_AFTER_SEC)},
+        )
+    if not created and job.status == "done":
+        response.status_code = 200
+    response.headers["Location"] = f"/reports/{job.id}"
+    return _job_out(job)
+
+@router.get("/{job_id}")
+def get_report(
+    job_id: UUID,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+):
+    job = report_queue.get(session, job_id)
+    if not job or job.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return _job_out(job)
@@ -1,25 +1,48 @@
-from fastapi import APIRouter, Depends, HTTPException
+import base64
+from collections import Counter
+import csv
+import io
+import json
+from datetime import date, datetime
+from enum import Enum
+from typing import Literal
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import tuple_
 from sqlmodel import Session, select
 
-from app.db import get_session
+from app.config import settings
+from app.db import engine, get_session
 from app.models import Transaction, Account, Category, User
-from app.schemas import TransactionCreate
-from app.deps import get_current_user
+from app.schemas import AmountPrecisionError, TransactionCreate, from_minor, money_out, to_minor
+from app.deps import conditional_get, get_current_user, get_read_session
+from app import categorize, ledger, projection, search
+from app.metrics import TimedRoute
 
-router = APIRouter(prefix="/transactions", tags=["transactions"])
+router = APIRouter(prefix="/transactions", tags=["transactions"], route_class=TimedRoute)
 
-@router.get("")
-def list_transactions(
-    from_date: str | None = None,
-    to_date: str | None = None,
-    account_id: str | None = None,
-    category_id: str | None = None,
-    payment_method: str | None = None,
-    q: str | None = None,
-    current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session),
-):
-    query = select(Transaction).where(Transaction.user_id == current_user.id)
+CURSOR_FIELDS = ("transaction_date", "created_at", "id")
+
+def _encode_cursor(row) -> str:
+    # row: fila del SELECT, con CURSOR_FIELDS en las últimas tres posiciones
+    tx_date, created, tx_id = row[-3:]
+    raw = json.dumps([tx_date.isoformat(), created.isoformat(), str(tx_id)])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str) -> tuple[date, datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        d, created, tx_id = json.loads(raw)
+        return date.fromisoformat(d), datetime.fromisoformat(created), UUID(tx_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _filtered_query(query, dialect, user_id, from_date, to_date, account_id, category_id, payment_method, q):
+    # devuelve (query, relevancia); relevancia es None si no hay q
+    query = query.where(Transaction.user_id == user_id)
     if from_date:
         query = query.where(Transaction.transaction_date >= from_date)
     if to_date:
@@ -30,10 +53,148 @@ def list_transactions(
         query = query.where(Transaction.category_id == category_id)
     if payment_method:
         query = query.where(Transaction.payment_method == payment_method)
+    rank = None
     if q:
-        query = query.where(Transaction.description.contains(q) | Transaction.counterparty.contains(q))
-    query = query.order_by(Transaction.transaction_date.desc(), Transaction.created_at.desc())
-    return session.exec(query).all()
+        query, rank = search.apply(query, q, dialect)
+    return query, rank
+
+@router.get("", dependencies=[Depends(conditional_get)])
+def list_transactions(
+    from_date: date | None = None,
+    to_date: date | None = None,
+    account_id: UUID | None = None,
+    category_id: UUID | None = None,
+    payment_method: str | None = None,
+    q: str | None = None,
+    sort: Literal["date", "relevance"] = "date",
+    limit: int | None = Query(default=None, ge=1),
+    cursor: str | None = None,
+    fields: str | None = None,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_read_session),
+):
+    cols, names = projection.columns(Transaction, fields)
+    # las columnas del cursor van siempre al final (y no se devuelven si no se pidieron)
+    cols += [Transaction.__table__.columns[n] for n in CURSOR_FIELDS]
+    query, rank = _filtered_query(
+        projection.select(*cols), session.get_bind().dialect.name, current_user.id,
+        from_date, to_date, account_id, category_id, payment_method, q,
+    )
+    limit = min(limit or settings.TX_PAGE_SIZE, settings.TX_PAGE_MAX)
+
+    if sort == "relevance":
+        # una sola página con los más relevantes (el cursor es por fecha)
+        if not q:
+            raise HTTPException(status_code=400, detail="sort=relevance requires q")
+        if cursor:
+            raise HTTPException(status_code=400, detail="cursor is not supported with sort=relevance")
+        if rank is not None:
+            query = query.order_by(rank.desc())
+        query = query.order_by(Transaction.transaction_date.desc(), Transaction.created_at.desc()).limit(limit)
+        rows = [money_out(item, current_user.currency) for item in projection.rows(session.exec(query), names)]
+        return projection.JSONResponse({"items": rows, "next_cursor": None})
+
+    # keyset: (fecha, created_at, id) desc, la página N cuesta lo mismo que la 1
+    if cursor:
+        after = _decode_cursor(cursor)
+        # la condición de fecha sola es redundante, pero con transactions particionada el planner
+        # solo descarta particiones comparando la columna contra una constante (no con la tupla)
+        query = query.where(
+            Transaction.transaction_date <= after[0],
+            tuple_(Transaction.transaction_date, Transaction.created_at, Transaction.id) < after,
+        )
+    query = query.order_by(
+        Transaction.transaction_date.desc(), Transaction.created_at.desc(), Transaction.id.desc()
+    ).limit(limit + 1)
+
+    items = session.exec(query).all()
+    next_cursor = _encode_cursor(items[limit - 1]) if len(items) > limit else None
+    rows = [money_out(item, current_user.currency) for item in projection.rows(items[:limit], names)]
+    return projection.JSONResponse({"items": rows, "next_cursor": next_cursor})
+
+EXPORT_COLUMNS = [
+    Transaction.id, Transaction.transaction_date, Transaction.type, Transaction.amount,
+    Transaction.account_id, Transaction.category_id, Transaction.payment_method,
+    Transaction.description, Transaction.counterparty, Transaction.group_id, Transaction.created_at,
+]
+EXPORT_BATCH = 1000
+EXPORT_AMOUNT = [c.key for c in EXPORT_COLUMNS].index("amount")
+
+def _plain(value):
+    if value is None:
+        return None
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, (int, float, str)) and not isinstance(value, Enum):
+        return value
+    return str(getattr(value, "value", value))
+
+def _export_row(row, currency: str) -> list:
+    out = [_plain(v) for v in row]
+    out[EXPORT_AMOUNT] = from_minor(out[EXPORT_AMOUNT], currency)
+    return out
+
+def _export_rows(query, currency: str):
+    # Sesión propia: el generador corre después de que FastAPI cerró las dependencias.
+    # yield_per => cursor del lado del servidor (psycopg2) y lotes de EXPORT_BATCH filas.
+    with Session(engine) as session:
+        result = session.exec(query.execution_options(yield_per=EXPORT_BATCH))
+        for batch in result.partitions():
+            yield [_export_row(row, currency) for row in batch]
+
+def _csv_stream(query, currency: str):
+    names = [c.key for c in EXPORT_COLUMNS]
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(names)
+    yield buf.getvalue()
+    for batch in _export_rows(query, currency):
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows(batch)
+        yield buf.getvalue()
+
+def _ndjson_stream(query, currency: str):
+    names = [c.key for c in EXPORT_COLUMNS]
+    for batch in _export_rows(query, currency):
+        yield "".join(json.dumps(dict(zip(names, row))) + "\n" for row in batch)
+
+@router.get("/export")
+def export_transactions(
+    format: Literal["csv", "ndjson"] = "csv",
+    from_date: date | None = None,
+    to_date: date | None = None,
+    account_id: UUID | None = None,
+    category_id: UUID | None = None,
+    payment_method: str | None = None,
+    q: str | None = None,
+    current_user: User = Depends(get_current_user),
+):
+    query, _ = _filtered_query(
+        select(*EXPORT_COLUMNS), engine.dialect.name, current_user.id,
+        from_date, to_date, account_id, category_id, payment_method, q,
+    )
+    query = query.order_by(Transaction.transaction_date.desc(), Transaction.created_at.desc(), Transaction.id.desc())
+
+    if format == "csv":
+        return StreamingResponse(
+            _csv_stream(query, current_user.currency), media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="transactions.csv"'},
+        )
+    return StreamingResponse(_ndjson_stream(query, current_user.currency), media_type="application/x-ndjson")
+
+def _account_rule_error(acc_type, tx_type) -> str | None:
+    # Validaciones por tipo de cuenta
+    if acc_type in ("bank", "cash"):
+        if tx_type == "credit_payment":
+            return "credit_payment is only for credit cards"
+        if tx_type in ("transfer_in", "transfer_out"):
+            return "Use /operations/transfer for transfers"
+    else:  # credit_card
+        if tx_type not in ("expense", "credit_payment"):
+            return "Credit cards only allow expense or credit_payment"
+        # opcional: forzar category_id null en credit_payment
+    return None
 
 @router.post("")
 def create_transaction(
@@ -45,18 +206,9 @@ def create_transaction(
     if not acc or acc.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Account not found")
 
-    # Validaciones por tipo de cuenta
-    if acc.type in ("bank", "cash"):
-        if payload.type == "credit_payment":
-            raise HTTPException(status_code=400, detail="credit_payment is only for credit cards")
-        if payload.type in ("transfer_in", "transfer_out"):
-            raise HTTPException(status_code=400, detail="Use /operations/transfer for transfers")
-    else:  # credit_card
-        if payload.type not in ("expense", "credit_payment"):
-            raise HTTPException(status_code=400, detail="Credit cards only allow expense or credit_payment")
-        if payload.type == "credit_payment" and payload.category_id is not None:
-            # opcional: forzamos category_id null en credit_payment
-            pass
+    error = _account_rule_error(acc.type, payload.type)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
 
     if payload.category_id:
         cat = session.get(Category, payload.category_id)
@@ -69,12 +221,137 @@ def create_transaction(
         category_id=payload.category_id,
         type=payload.type,
         payment_method=payload.payment_method,
-        amount=payload.amount,
+        amount=to_minor(payload.amount, current_user.currency),
         transaction_date=payload.transaction_date,
         description=payload.description,
         counterparty=payload.counterparty,
     )
+    categorize.apply(session, current_user.id, [tx])
     session.add(tx)
+    ledger.record_transactions(session, [tx], [acc])
     session.commit()
     session.refresh(tx)
-    return tx
+    return money_out(tx.model_dump(), current_user.currency)
+
+def _fingerprint(account_id, transaction_date, tx_type, amount, description, counterparty) -> tuple:
+    return (
+        str(account_id), transaction_date, getattr(tx_type, "value", tx_type), int(amount),
+        (description or "").strip().lower(), (counterparty or "").strip().lower(),
+    )
+
+async def _bulk_rows(request: Request) -> list[dict]:
+    content_type = request.headers.get("content-type", "")
+    body = await request.body()
+    if content_type.startswith("text/csv"):
+        try:
+            reader = csv.DictReader(io.StringIO(body.decode("utf-8-sig")))
+            # celdas vacías del CSV => None
+            return [{k: (v if v != "" else None) for k, v in row.items()} for row in reader]
+        except (UnicodeDecodeError, csv.Error):
+            raise HTTPException(status_code=400, detail="Invalid CSV body")
+    try:
+        rows = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array of transactions")
+    return rows
+
+@router.post("/bulk")
+def bulk_create_transactions(
+    dedupe: bool = False,
+    rows: list[dict] = Depends(_bulk_rows),
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+):
+    if len(rows) > settings.BULK_IMPORT_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"Too many rows (max {settings.BULK_IMPORT_MAX_ROWS})")
+
+    errors = []
+    payloads = []
+    for i, raw in enumerate(rows):
+        try:
+            payloads.append((i, TransactionCreate.model_validate(raw)))
+        except ValidationError as e:
+            errors.append({"row": i, "detail": e.errors(include_url=False, include_context=False)})
+
+    # validamos propiedad una vez por id distinto (una consulta por tabla)
+    account_ids = {p.account_id for _, p in payloads}
+    category_ids = {p.category_id for _, p in payloads if p.category_id}
+    accounts = {
+        a.id: a for a in session.exec(
+            select(Account).where(Account.user_id == current_user.id, Account.id.in_(account_ids))
+        ).all()
+    } if account_ids else {}
+    categories = set(session.exec(
+        select(Category.id).where(Category.user_id == current_user.id, Category.id.in_(category_ids))
+    ).all()) if category_ids else set()
+
+    valid = []
+    for i, p in payloads:
+        acc = accounts.get(p.account_id)
+        if not acc:
+            errors.append({"row": i, "detail": "Account not found"})
+            continue
+        error = _account_rule_error(acc.type, p.type)
+        if error:
+            errors.append({"row": i, "detail": error})
+            continue
+        if p.category_id and p.category_id not in categories:
+            errors.append({"row": i, "detail": "Category not found"})
+            continue
+        try:
+            to_minor(p.amount, current_user.currency)
+        except AmountPrecisionError as e:
+            errors.append({"row": i, "detail": str(e)})
+            continue
+        valid.append((i, p))
+
+    # duplicados contra lo ya guardado (multiconjunto: dos cafés iguales el mismo día siguen siendo dos)
+    duplicates = []
+    if dedupe and valid:
+        dates = [p.transaction_date for _, p in valid]
+        existing = Counter(
+            _fingerprint(*row) for row in session.exec(
+                select(
+                    Transaction.account_id, Transaction.transaction_date, Transaction.type,
+                    Transaction.amount, Transaction.description, Transaction.counterparty,
+                ).where(
+                    Transaction.user_id == current_user.id,
+                    Transaction.account_id.in_({p.account_id for _, p in valid}),
+                    Transaction.transaction_date >= min(dates),
+                    Transaction.transaction_date <= max(dates),
+                )
+            ).all()
+        )
+        fresh = []
+        for i, p in valid:
+            amount = to_minor(p.amount, current_user.currency)
+            fp = _fingerprint(p.account_id, p.transaction_date, p.type, amount, p.description, p.counterparty)
+            if existing[fp] > 0:
+                existing[fp] -= 1
+                duplicates.append(i)
+            else:
+                fresh.append((i, p))
+        valid = fresh
+
+    txs = [
+        Transaction(
+            user_id=current_user.id,
+            account_id=p.account_id,
+            category_id=p.category_id,
+            type=p.type,
+            payment_method=p.payment_method,
+            amount=to_minor(p.amount, current_user.currency),
+            transaction_date=p.transaction_date,
+            description=p.description,
+            counterparty=p.counterparty,
+        )
+        for _, p in valid
+    ]
+    categorize.apply(session, current_user.id, txs)
+    ledger.insert_transactions(session, txs, list(accounts.values()))
+    session.commit()
+
+    errors.sort(key=lambda e: e["row"])
+    return {"inserted": len(txs), "duplicates": duplicates, "errors": errors}
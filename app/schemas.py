@@ -1,13 +1,56 @@
 from datetime import date
-from typing import Optional, Literal
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Annotated, Optional, Literal, Union
 from uuid import UUID
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, model_validator
 
 AccountType = Literal["bank", "cash", "credit_card"]
 CategoryType = Literal["income", "expense"]
 TxType = Literal["income", "expense", "transfer_in", "transfer_out", "credit_payment"]
 PayMethod = Literal["cash", "card", "sinpe", "bank_transfer"]
 
+# Montos: en la API con decimales (Money), en la base enteros en unidades menores de la
+# moneda del usuario (BIGINT). La conversión se hace solo acá: to_minor al entrar, money_out al salir.
+Money = Annotated[Decimal, Field(allow_inf_nan=False, max_digits=18, decimal_places=3)]
+
+# ISO 4217, las que no usan 2 decimales
+MINOR_DIGITS = {
+    "BIF": 0, "CLP": 0, "DJF": 0, "GNF": 0, "ISK": 0, "JPY": 0, "KMF": 0, "KRW": 0, "PYG": 0,
+    "RWF": 0, "UGX": 0, "VND": 0, "VUV": 0, "XAF": 0, "XOF": 0, "XPF": 0,
+    "BHD": 3, "IQD": 3, "JOD": 3, "KWD": 3, "LYD": 3, "OMR": 3, "TND": 3,
+}
+MONEY_FIELDS = ("amount", "initial_balance", "balance", "debt", "total", "income", "expense", "min_amount", "max_amount")
+
+def minor_digits(currency: str) -> int:
+    return MINOR_DIGITS.get(currency.upper(), 2)
+
+class AmountPrecisionError(ValueError):
+    pass
+
+def to_minor(value: Decimal | int | float | None, currency: str) -> int | None:
+    if value is None:
+        return None
+    digits = minor_digits(currency)
+    # float vía str: 12.34 y no 12.339999999999999857891452847979962825775146484375
+    minor = (Decimal(str(value)) if isinstance(value, float) else Decimal(value)) * 10 ** digits
+    # sin redondeo: 0.001 en una moneda de 2 decimales no puede quedar guardado como 0
+    if minor != minor.to_integral_value():
+        raise AmountPrecisionError(f"Amount {value} has more decimals than {currency.upper()} allows ({digits})")
+    return int(minor.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def from_minor(value: int | None, currency: str) -> float | None:
+    # int / 10**d es el float más cercano al decimal exacto (se serializa sin ruido: 12.3, no 12.299999)
+    if value is None:
+        return None
+    return int(value) / 10 ** minor_digits(currency)
+
+def money_out(item: dict, currency: str) -> dict:
+    # in place: los campos de MONEY_FIELDS pasan a decimales
+    for key in MONEY_FIELDS:
+        if key in item:
+            item[key] = from_minor(item[key], currency)
+    return item
+
 class RegisterIn(BaseModel):
     email: EmailStr
     password: str = Field(min_length=8, max_length=128)
@@ -28,12 +71,12 @@ class TokenOut(BaseModel):
 class AccountCreate(BaseModel):
     name: str
     type: AccountType
-    initial_balance: float = 0.0
+    initial_balance: Money = Decimal(0)
 
 class AccountPatch(BaseModel):
     name: Optional[str] = None
     active: Optional[bool] = None
-    initial_balance: Optional[float] = None
+    initial_balance: Optional[Money] = None
 
 class CategoryCreate(BaseModel):
     name: str
@@ -44,7 +87,7 @@ class TransactionCreate(BaseModel):
     category_id: Optional[UUID] = None
     type: TxType
     payment_method: Optional[PayMethod] = None
-    amount: float
+    amount: Money = Field(gt=0)
     transaction_date: date
     description: Optional[str] = None
     counterparty: Optional[str] = None
@@ -52,21 +95,74 @@ class TransactionCreate(BaseModel):
 class TransferCreate(BaseModel):
     from_account_id: UUID
     to_account_id: UUID
-    amount: float
+    amount: Money = Field(gt=0)
     transaction_date: date
     payment_method: PayMethod = "bank_transfer"
-    fee: float = 0.0
+    fee: Money = Field(default=Decimal(0), ge=0)
     fee_category_id: Optional[UUID] = None
     description: Optional[str] = None
 
 class CreditCardPaymentCreate(BaseModel):
     bank_account_id: UUID
     credit_card_account_id: UUID
-    amount: float
+    amount: Money = Field(gt=0)
     transaction_date: date
     payment_method: PayMethod = "sinpe"
     payment_category_id: UUID
-    fee: float = 0.0
+    fee: Money = Field(default=Decimal(0), ge=0)
     fee_category_id: Optional[UUID] = None
     reference: Optional[str] = None
     description: Optional[str] = None
+
+class TransferOperation(TransferCreate):
+    kind: Literal["transfer"]
+
+class CreditCardPaymentOperation(CreditCardPaymentCreate):
+    kind: Literal["credit_card_payment"]
+
+class OperationsBatch(BaseModel):
+    operations: list[Annotated[Union[TransferOperation, CreditCardPaymentOperation], Field(discriminator="kind")]]
+    # True: si alguna operación falla no se guarda ninguna; False: se guardan las válidas
+    all_or_nothing: bool = True
+
+class CategoryRuleCreate(BaseModel):
+    category_id: UUID
+    priority: int = 100
+    counterparty: Optional[str] = Field(default=None, min_length=1)
+    description: Optional[str] = Field(default=None, min_length=1)
+    min_amount: Optional[Money] = None
+    max_amount: Optional[Money] = None
+    account_id: Optional[UUID] = None
+    payment_method: Optional[PayMethod] = None
+
+    @model_validator(mode="after")
+    def has_condition(self):
+        if not any(v is not None for v in (
+            self.counterparty, self.description, self.min_amount, self.max_amount, self.account_id, self.payment_method,
+        )):
+            raise ValueError("A rule needs at least one condition")
+        return self
+
+class RecategorizeIn(BaseModel):
+    # rules: aplica las reglas del usuario; merge: mueve los movimientos de source a target
+    mode: Literal["rules", "merge"]
+    only_uncategorized: bool = True
+    from_date: Optional[date] = None
+    to_date: Optional[date] = None
+    source_category_id: Optional[UUID] = None
+    target_category_id: Optional[UUID] = None
+    delete_source: bool = False
+
+class YearlySummaryReport(BaseModel):
+    kind: Literal["yearly_summary"]
+    year: int = Field(ge=1900, le=9999)
+
+class ExportReport(BaseModel):
+    kind: Literal["export"]
+    from_date: Optional[date] = None
+    to_date: Optional[date] = None
+
+class RebuildReport(BaseModel):
+    kind: Literal["rebuild"]
+
+ReportCreate = Annotated[Union[YearlySummaryReport, ExportReport, RebuildReport], Field(discriminator="kind")]
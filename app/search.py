@@ -0,0 +1,115 @@
+import re
+import unicodedata
+
+from sqlalchemy import false, func, inspect, literal_column, select, text
+
+from app.models import Transaction
+
+# Búsqueda indexada sobre description + counterparty, sin distinguir mayúsculas ni tildes.
+#  - Postgres: índice GIN pg_trgm sobre f_unaccent(lower(...)); LIKE '%q%' usa el índice.
+#  - SQLite: tabla FTS5 (unicode61 remove_diacritics) mantenida con triggers.
+
+PG_SEARCH_TEXT = "f_unaccent(lower(coalesce(description, '') || ' ' || coalesce(counterparty, '')))"
+
+PG_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    # unaccent() no es IMMUTABLE, no se puede usar directo en un índice
+    """
+    CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    AS $$ SELECT public.unaccent('public.unaccent', $1) $$
+    """,
+    f"CREATE INDEX IF NOT EXISTS ix_transactions_search_trgm ON transactions USING gin ({PG_SEARCH_TEXT} gin_trgm_ops)",
+]
+
+SQLITE_BODY = "coalesce({t}.description, '') || ' ' || coalesce({t}.counterparty, '')"
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5("
+    "id UNINDEXED, body, tokenize = 'unicode61 remove_diacritics 2')",
+    f"""
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_ai AFTER INSERT ON transactions BEGIN
+        INSERT INTO transactions_fts (id, body) VALUES (new.id, {SQLITE_BODY.format(t="new")});
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_ad AFTER DELETE ON transactions BEGIN
+        DELETE FROM transactions_fts WHERE id = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_au AFTER UPDATE OF description, counterparty ON transactions BEGIN
+        DELETE FROM transactions_fts WHERE id = old.id;
+        INSERT INTO transactions_fts (id, body) VALUES (new.id, {SQLITE_BODY.format(t="new")});
+    END
+    """,
+]
+
+
+def unaccent(value: str | None) -> str | None:
+    # equivalente en Python de f_unaccent (se registra como función en SQLite)
+    if value is None:
+        return None
+    return "".join(c for c in unicodedata.normalize("NFKD", value) if not unicodedata.combining(c))
+
+
+def install(connection):
+    # idempotente; se corre después de crear las tablas
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        for ddl in PG_DDL:
+            connection.execute(text(ddl))
+    elif dialect == "sqlite":
+        existed = inspect(connection).has_table("transactions_fts")
+        for ddl in SQLITE_DDL:
+            connection.execute(text(ddl))
+        if not existed:
+            connection.execute(text(
+                f"INSERT INTO transactions_fts (id, body) SELECT id, {SQLITE_BODY.format(t='transactions')} FROM transactions"
+            ))
+
+
+def _pg_text():
+    blank = literal_column("''")
+    return func.f_unaccent(func.lower(
+        func.coalesce(Transaction.description, blank)
+        .op("||")(literal_column("' '"))
+        .op("||")(func.coalesce(Transaction.counterparty, blank))
+    ))
+
+
+def _fts_query(q: str) -> str:
+    # cada palabra como prefijo, todas requeridas: "super" "mercado"*
+    words = [w for w in re.split(r"\W+", q) if w]
+    return " ".join(f'"{w}"*' for w in words)
+
+
+def apply(query, q: str, dialect: str):
+    # filtra por q y devuelve (query, expresión de relevancia: mayor = mejor)
+    if dialect == "postgresql":
+        needle = func.f_unaccent(func.lower(q))
+        pattern = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        target = _pg_text()
+        # concatenación con || (immutable) para que el planner pueda usar el índice trigram
+        wildcard = literal_column("'%'")
+        like = wildcard.op("||")(func.f_unaccent(func.lower(pattern))).op("||")(wildcard)
+        query = query.where(target.like(like, escape="\\"))
+        return query, func.word_similarity(needle, target)
+
+    if dialect == "sqlite":
+        match = _fts_query(q)
+        if not match:
+            # sin palabras buscables (solo signos): no hay coincidencias
+            return query.where(false()), None
+        fts = literal_column("transactions_fts")
+        hits = (
+            select(literal_column("transactions_fts.id").label("id"), (-func.bm25(fts)).label("rank"))
+            .select_from(text("transactions_fts"))
+            .where(fts.op("MATCH")(match))
+            .subquery()
+        )
+        return query.join(hits, hits.c.id == Transaction.id), hits.c.rank
+
+    # otros motores: búsqueda sin índice
+    return query.where(Transaction.description.contains(q) | Transaction.counterparty.contains(q)), None
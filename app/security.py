@@ -1,15 +1,83 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from passlib.context import CryptContext
 from jose import jwt, JWTError
 from app.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min = max = default => un cambio de BCRYPT_ROUNDS marca los hashes viejos para rehash
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
 
-def verify_password(password: str, password_hash: str) -> bool:
-    return pwd_context.verify(password, password_hash)
+class PasswordPoolBusy(Exception):
+    pass
+
+
+class PasswordPool:
+    # bcrypt en un pool propio y acotado; el request espera el resultado con await, sin ocupar
+    # un hilo del threadpool compartido: una ráfaga de logins no lo agota
+    def __init__(self, workers: int, queue: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(workers + queue)
+        self._lock = threading.Lock()
+        self.workers = workers
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_sec = 0.0
+        self.max_sec = 0.0
+
+    async def run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordPoolBusy()
+        with self._lock:
+            self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            return await asyncio.wrap_future(self._executor.submit(fn, *args))
+        finally:
+            elapsed = time.perf_counter() - start
+            self._slots.release()
+            with self._lock:
+                self.in_flight -= 1
+                self.completed += 1
+                self.total_sec += elapsed
+                self.max_sec = max(self.max_sec, elapsed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "in_flight": self.in_flight,
+                "queued": max(0, self.in_flight - self.workers),
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_ms": round(1000 * self.total_sec / self.completed, 2) if self.completed else 0.0,
+                "max_ms": round(1000 * self.max_sec, 2),
+            }
+
+
+password_pool = PasswordPool(settings.PWD_WORKERS, settings.PWD_QUEUE)
+
+async def hash_password(password: str) -> str:
+    return await password_pool.run(pwd_context.hash, password)
+
+async def verify_password(password: str, password_hash: str) -> bool:
+    return await password_pool.run(pwd_context.verify, password, password_hash)
+
+async def verify_and_update(password: str, password_hash: str) -> tuple[bool, str | None]:
+    # (ok, nuevo_hash) — nuevo_hash != None si el costo configurado cambió
+    return await password_pool.run(pwd_context.verify_and_update, password, password_hash)
 
 def create_access_token(sub: str) -> str:
     now = datetime.now(timezone.utc)
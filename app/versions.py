@@ -0,0 +1,57 @@
+from uuid import UUID
+
+from sqlalchemy import update
+from sqlmodel import Session
+
+from app.models import User
+
+# Versión de datos por usuario: cada escritura la incrementa dentro de su propia
+# transacción y las lecturas la usan como ETag (If-None-Match => 304 sin consultar nada más).
+
+
+def bump(session: Session, *user_ids: UUID):
+    # UPDATE directo (sin pasar por el ORM): no dispara los eventos de User del cache de principals
+    ids = set(user_ids)
+    if ids:
+        rows = session.exec(
+            update(User).where(User.id.in_(ids)).values(data_version=User.data_version + 1)
+            .returning(User.id, User.data_version)
+        ).all()
+        # versiones nuevas de esta transacción (las usa analytics después del commit)
+        bumped = session.info.setdefault("bumped", {})
+        for user_id, version in rows:
+            bumped.setdefault(user_id, []).append(version)
+
+
+def etag(user_id: UUID, version: int) -> str:
+    return f'W/"{user_id.hex[:12]}.{version}"'
+
+
+def matches(if_none_match: str | None, tag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [t.strip() for t in if_none_match.split(",")]
+    # comparación débil: W/"x" == "x"
+    return "*" in candidates or tag.removeprefix("W/") in {t.removeprefix("W/") for t in candidates}
+
+
+class ETagMiddleware:
+    # agrega ETag/Cache-Control a las respuestas 200 de las lecturas que lo calcularon (request.state.etag)
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return await self.app(scope, receive, send)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                tag = scope.get("state", {}).get("etag")
+                if tag:
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"etag", tag.encode()),
+                        (b"cache-control", b"private, no-cache"),
+                    ]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
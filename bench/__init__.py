@@ -0,0 +1,8 @@
+# Benchmarks reproducibles de la API.
+#
+#   pip install -r requirements.txt -r bench/requirements.txt
+#   python -m bench --db sqlite:///bench.db --users 5 --years 2 --out bench_output.json
+#   python -m bench --db postgresql://localhost/finance_bench --mode uvicorn --concurrency 16
+#
+# datagen.py genera datos deterministas (misma semilla => mismos datos),
+# scenarios.py define los requests y runner.py los ejecuta y mide.
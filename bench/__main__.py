@@ -0,0 +1,83 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench")
+    parser.add_argument("--db", default="sqlite:///bench.db", help="DATABASE_URL to benchmark against")
+    parser.add_argument("--users", type=int, default=3)
+    parser.add_argument("--years", type=int, default=1)
+    parser.add_argument("--tx-per-month", type=int, default=60)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mode", choices=["asgi", "uvicorn"], default="asgi")
+    parser.add_argument("--scenarios", default="all", help="comma separated names (default: all)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--out", default="bench_output.json")
+    args = parser.parse_args(argv)
+
+    # la configuración de la app se lee al importarla. Admisión y pool de bcrypt explícitos: con los
+    # defaults de producción parte de los requests vuelve como 503 y mide el rechazo, no el endpoint.
+    # Nunca hay más de `concurrency` requests en curso: ni el límite global ni la cola de bcrypt cortan.
+    os.environ["DATABASE_URL"] = args.db
+    os.environ.setdefault("JWT_SECRET", "bench-secret")
+    bench_settings = {
+        "ADMISSION_MAX_CONCURRENT": str(args.concurrency),
+        "ADMISSION_PER_USER": "0",
+        "PWD_WORKERS": "2",
+        "PWD_QUEUE": str(args.concurrency),
+    }
+    os.environ.update(bench_settings)
+
+    from sqlmodel import Session
+
+    from app import migrations
+    from app.db import async_engine, engine
+    from app.main import app
+    from bench import datagen, runner
+    from bench.scenarios import SCENARIOS
+
+    names = list(SCENARIOS) if args.scenarios == "all" else args.scenarios.split(",")
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    migrations.migrate(engine, log=lambda *a: None)
+    started = time.perf_counter()
+    with Session(engine) as session:
+        data = datagen.generate(session, args.users, args.years, args.tx_per_month, args.seed)
+    data["seconds"] = round(time.perf_counter() - started, 2)
+
+    engines = [engine] + ([async_engine.sync_engine] if async_engine else [])
+    result = asyncio.run(runner.run(
+        app, engines, names, args.users, args.requests, args.concurrency, args.mode, seed=args.seed,
+    ))
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k != "out"} | {"dialect": engine.dialect.name},
+        "settings": bench_settings | {"DB_ASYNC": async_engine is not None},
+        "environment": {"python": sys.version.split()[0], "platform": platform.platform()},
+        "data": data,
+        **result,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    errors = 0
+    for name, r in result["scenarios"].items():
+        print(f"{name:26} p50={r['p50_ms']:8.2f}ms p95={r['p95_ms']:8.2f}ms "
+              f"p99={r['p99_ms']:8.2f}ms {r['throughput_rps']:8.1f} rps q/req={r['queries_per_request']} "
+              f"errors={r['errors']}{' ' + str(r['error_statuses']) if r['errors'] else ''}")
+        errors += r["errors"]
+    print(f"peak RSS {result['peak_rss_kb']} KB -> {args.out}")
+    if errors:
+        print(f"{errors} request(s) failed: the numbers above only cover successful responses", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,126 @@
+import random
+from datetime import date, timedelta
+from uuid import UUID
+
+from sqlmodel import Session, select
+
+from app import ledger
+from app.models import Account, Category, Transaction, User
+from app.schemas import to_minor
+from app.security import pwd_context
+
+PASSWORD = "bench-password"
+END = date(2025, 12, 31)  # fijo: los datos no dependen del día en que se corre
+
+INCOME_CATEGORIES = ["Salary", "Other income"]
+EXPENSE_CATEGORIES = ["Food", "Transport", "Rent", "Utilities", "Entertainment", "Health", "Card payment", "Fees"]
+COUNTERPARTIES = [
+    "Auto Mercado", "Más x Menos", "Uber", "Netflix", "Shell", "Café Britt",
+    "Amazon", "ICE", "Farmacia Fischel", "Spoon", "Walmart", "Cinépolis",
+]
+METHODS = ["card", "sinpe", "cash", "bank_transfer"]
+
+
+def email(i: int) -> str:
+    return f"bench{i}@example.com"
+
+
+class _Ids:
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+
+    def __call__(self) -> UUID:
+        return UUID(int=self.rng.getrandbits(128), version=4)
+
+
+def _months(start: date, end: date):
+    d = start.replace(day=1)
+    while d <= end:
+        yield d
+        d = date(d.year + (d.month // 12), (d.month % 12) + 1, 1)
+
+
+def _user(session: Session, i: int, password_hash: str, years: int, tx_per_month: int, rng, new_id) -> int:
+    user = User(id=new_id(), email=email(i), password_hash=password_hash)
+    session.add(user)
+
+    bank = Account(id=new_id(), user_id=user.id, name="Bank", type="bank", initial_balance=to_minor(500000, user.currency))
+    cash = Account(id=new_id(), user_id=user.id, name="Cash", type="cash", initial_balance=to_minor(20000, user.currency))
+    card = Account(id=new_id(), user_id=user.id, name="Card", type="credit_card", initial_balance=0)
+    accounts = [bank, cash, card]
+    session.add_all(accounts)
+    # account_balances no tiene relationship con accounts: sin este flush el unit of work puede
+    # insertarla antes que las cuentas (falla la FK en Postgres)
+    session.flush()
+    for a in accounts:
+        ledger.open_account(session, a)
+
+    cats = {}
+    for name in INCOME_CATEGORIES:
+        cats[name] = Category(id=new_id(), user_id=user.id, name=name, type="income")
+    for name in EXPENSE_CATEGORIES:
+        cats[name] = Category(id=new_id(), user_id=user.id, name=name, type="expense")
+    session.add_all(cats.values())
+    session.flush()
+
+    spend_cats = [cats[n] for n in EXPENSE_CATEGORIES if n not in ("Card payment", "Fees")]
+    start = END - timedelta(days=365 * years)
+    txs = []
+
+    def tx(acc, type_, amount, day, **kw):
+        t = Transaction(
+            id=new_id(), user_id=user.id, account_id=acc.id, type=type_,
+            amount=to_minor(round(amount, 2), user.currency), transaction_date=day, **kw,
+        )
+        txs.append(t)
+        return t
+
+    for month in _months(start, END):
+        tx(bank, "income", rng.uniform(800000, 1200000), month, category_id=cats["Salary"].id,
+           payment_method="bank_transfer", description="Salary", counterparty="Employer S.A.")
+
+        card_spend = 0.0
+        for _ in range(tx_per_month):
+            day = month + timedelta(days=rng.randrange(28))
+            acc = rng.choices(accounts, weights=[50, 15, 35])[0]
+            amount = rng.lognormvariate(9, 1)
+            if acc is card:
+                card_spend += round(amount, 2)
+            tx(acc, "expense", amount, day, category_id=rng.choice(spend_cats).id,
+               payment_method="cash" if acc is cash else rng.choice(METHODS[:2]),
+               counterparty=rng.choice(COUNTERPARTIES), description=rng.choice(["", "compra", "pago", "mensual"]) or None)
+
+        # transferencia banco -> efectivo (mismo group_id que /operations/transfer)
+        group = new_id()
+        amount = rng.uniform(20000, 60000)
+        day = month + timedelta(days=rng.randrange(28))
+        tx(bank, "transfer_out", amount, day, payment_method="bank_transfer", group_id=group)
+        tx(cash, "transfer_in", amount, day, payment_method="bank_transfer", group_id=group)
+
+        # pago de tarjeta del mes (como /operations/credit-card-payment)
+        if card_spend:
+            group = new_id()
+            day = month + timedelta(days=27)
+            tx(bank, "expense", card_spend, day, category_id=cats["Card payment"].id,
+               payment_method="sinpe", description="Credit card payment", group_id=group)
+            tx(card, "credit_payment", card_spend, day, payment_method="sinpe",
+               description="Credit card payment", group_id=group)
+
+    ledger.insert_transactions(session, txs, accounts)
+    return len(txs)
+
+
+def generate(session: Session, users: int = 3, years: int = 1, tx_per_month: int = 60, seed: int = 1234) -> dict:
+    # idempotente: si los usuarios del benchmark ya existen no genera nada
+    if session.exec(select(User).where(User.email == email(0))).first():
+        return {"users": users, "transactions": None, "reused": True}
+
+    rng = random.Random(seed)
+    new_id = _Ids(rng)
+    # fuera de un request: directo, sin password_pool
+    password_hash = pwd_context.hash(PASSWORD)
+    total = 0
+    for i in range(users):
+        total += _user(session, i, password_hash, years, tx_per_month, rng, new_id)
+        session.commit()
+    return {"users": users, "transactions": total, "reused": False}
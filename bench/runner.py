@@ -0,0 +1,140 @@
+import asyncio
+import random
+import resource
+import statistics
+import threading
+import time
+from collections import Counter
+
+import httpx
+from sqlalchemy import event
+
+from bench.datagen import PASSWORD, email
+from bench.scenarios import SCENARIOS
+
+
+class QueryCounter:
+    # cuenta sentencias SQL en los engines (mismo proceso: asgi o uvicorn en un hilo);
+    # con DB_ASYNC las queries pasan por async_engine.sync_engine, no por engine
+    def __init__(self, *engines):
+        self.count = 0
+        self._lock = threading.Lock()
+        self._engines = engines
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self._inc)
+
+    def _inc(self, *args):
+        with self._lock:
+            self.count += 1
+
+    def close(self):
+        for engine in self._engines:
+            event.remove(engine, "before_cursor_execute", self._inc)
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * p
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def peak_rss_kb() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+async def _contexts(client: httpx.AsyncClient, users: int) -> list[dict]:
+    out = []
+    for i in range(users):
+        ctx = {"email": email(i), "password": PASSWORD}
+        r = await client.post("/auth/login", json={"email": ctx["email"], "password": PASSWORD})
+        r.raise_for_status()
+        headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+        ctx["headers"] = headers
+        accounts = (await client.get("/accounts", headers=headers)).json()
+        if isinstance(accounts, dict):
+            accounts = accounts.get("items", [])
+        for a in accounts:
+            ctx[{"bank": "bank", "cash": "cash", "credit_card": "card"}[a["type"]]] = a["id"]
+        categories = (await client.get("/categories", headers=headers)).json()
+        if isinstance(categories, dict):
+            categories = categories.get("items", [])
+        ctx["card_payment_category"] = next(c["id"] for c in categories if c["name"] == "Card payment")
+        out.append(ctx)
+    return out
+
+
+async def _run_scenario(client, scenario, contexts, requests: int, concurrency: int, seed: int, counter) -> dict:
+    rng = random.Random(seed)
+    plan = [(rng.choice(contexts), random.Random(rng.random())) for _ in range(requests)]
+    # percentiles solo sobre respuestas exitosas: un 503 rechazado en 0.2ms no es una latencia del endpoint
+    latencies, errors = [], Counter()
+    queue = iter(plan)
+    queries_before = counter.count
+
+    async def worker():
+        for ctx, req_rng in queue:
+            method, url, body = scenario.build(ctx, req_rng)
+            headers = ctx["headers"] if scenario.auth else {}
+            start = time.perf_counter()
+            r = await client.request(method, url, json=body, headers=headers)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if r.status_code >= 400:
+                errors[r.status_code] += 1
+            else:
+                latencies.append(elapsed_ms)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests": requests,
+        "errors": sum(errors.values()),
+        "error_statuses": {str(k): v for k, v in sorted(errors.items())},
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "mean_ms": round(statistics.fmean(latencies), 3) if latencies else 0.0,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "queries_per_request": round((counter.count - queries_before) / requests, 2) if requests else 0.0,
+    }
+
+
+def _start_uvicorn(app, port: int):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+async def run(app, engines: list, scenarios: list[str], users: int, requests: int, concurrency: int,
+              mode: str = "asgi", port: int = 8765, seed: int = 1234) -> dict:
+    counter = QueryCounter(*engines)
+    server = None
+    if mode == "uvicorn":
+        server, thread = _start_uvicorn(app, port)
+        client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60)
+    else:
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+
+    results = {}
+    try:
+        async with client:
+            contexts = await _contexts(client, users)
+            for i, name in enumerate(scenarios):
+                results[name] = await _run_scenario(
+                    client, SCENARIOS[name], contexts, requests, concurrency, seed + i, counter,
+                )
+    finally:
+        counter.close()
+        if server:
+            server.should_exit = True
+            thread.join()
+    return {"scenarios": results, "peak_rss_kb": peak_rss_kb()}
@@ -0,0 +1,83 @@
+import random
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable
+
+from bench.datagen import END
+
+# Cada escenario arma un request a partir del contexto de un usuario del benchmark:
+# (método, url, json)
+
+
+@dataclass
+class Scenario:
+    name: str
+    build: Callable[[dict, random.Random], tuple[str, str, dict | None]]
+    auth: bool = True
+
+
+def _month(rng):
+    return rng.randint(END.year - 1, END.year), rng.randint(1, 12)
+
+
+def _transactions(ctx, rng):
+    return "GET", "/transactions?limit=100", None
+
+
+def _transactions_filtered(ctx, rng):
+    y, m = _month(rng)
+    return "GET", f"/transactions?from_date={y}-{m:02d}-01&to_date={y}-{m:02d}-28&account_id={ctx['bank']}", None
+
+
+def _transactions_search(ctx, rng):
+    return "GET", f"/transactions?q={rng.choice(['mercado', 'uber', 'cafe', 'shell'])}", None
+
+
+def _dashboard_monthly(ctx, rng):
+    y, m = _month(rng)
+    return "GET", f"/dashboard/monthly?year={y}&month={m}", None
+
+
+def _dashboard_series(ctx, rng):
+    return "GET", f"/dashboard/series?from={END.year - 1}-01&to={END.year}-12", None
+
+
+def _account_balance(ctx, rng):
+    return "GET", f"/accounts/{rng.choice([ctx['bank'], ctx['cash'], ctx['card']])}/balance", None
+
+
+def _accounts(ctx, rng):
+    return "GET", "/accounts", None
+
+
+def _login(ctx, rng):
+    return "POST", "/auth/login", {"email": ctx["email"], "password": ctx["password"]}
+
+
+def _transfer(ctx, rng):
+    return "POST", "/operations/transfer", {
+        "from_account_id": ctx["bank"], "to_account_id": ctx["cash"],
+        "amount": round(rng.uniform(1000, 5000), 2), "transaction_date": date.today().isoformat(),
+    }
+
+
+def _card_payment(ctx, rng):
+    return "POST", "/operations/credit-card-payment", {
+        "bank_account_id": ctx["bank"], "credit_card_account_id": ctx["card"],
+        "amount": round(rng.uniform(1000, 5000), 2), "transaction_date": date.today().isoformat(),
+        "payment_category_id": ctx["card_payment_category"],
+    }
+
+
+SCENARIOS = {s.name: s for s in [
+    Scenario("transactions", _transactions),
+    Scenario("transactions_filtered", _transactions_filtered),
+    Scenario("transactions_search", _transactions_search),
+    Scenario("dashboard_monthly", _dashboard_monthly),
+    Scenario("dashboard_series", _dashboard_series),
+    Scenario("account_balance", _account_balance),
+    Scenario("accounts", _accounts),
+    Scenario("auth_login", _login, auth=False),
+    Scenario("operations_transfer", _transfer),
+    Scenario("operations_card_payment", _card_payment),
+]}
@@ -0,0 +1,34 @@
+import os
+import tempfile
+from uuid import uuid4
+
+import pytest
+
+# la configuración se lee al importar app.*: base SQLite temporal por corrida
+_db = os.path.join(tempfile.mkdtemp(), "test.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_db}")
+os.environ.setdefault("JWT_SECRET", "test-secret")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import migrations  # noqa: E402
+from app.db import engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    migrations.migrate(engine, log=lambda *a: None)
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def auth(client):
+    # usuario nuevo por test: data_version y ETags no se cruzan entre tests
+    email = f"{uuid4().hex[:12]}@example.com"
+    r = client.post("/auth/register", json={"email": email, "password": "password1"})
+    assert r.status_code == 200, r.text
+    r = client.post("/auth/login", json={"email": email, "password": "password1"})
+    assert r.status_code == 200, r.text
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
@@ -0,0 +1,70 @@
+import asyncio
+import time
+
+from app import principals
+from app.admission import AdmissionController, AdmissionMiddleware
+from app.config import settings
+
+
+def _run(controller: AdmissionController, requests: list[list]) -> list[int]:
+    # todos los requests en curso a la vez: la app espera hasta que entraron (o fueron rechazados) todos
+    async def main():
+        release = asyncio.Event()
+
+        async def app(scope, receive, send):
+            await release.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        middleware = AdmissionMiddleware(app, controller)
+
+        async def call(headers):
+            statuses = []
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    statuses.append(message["status"])
+
+            scope = {"type": "http", "path": "/accounts", "method": "GET", "headers": headers, "client": ("10.0.0.1", 1)}
+            await middleware(scope, None, send)
+            return statuses[0]
+
+        tasks = [asyncio.ensure_future(call(r)) for r in requests]
+        await asyncio.sleep(0.01)
+        release.set()
+        return await asyncio.gather(*tasks)
+
+    return asyncio.run(main())
+
+
+def _bearer(token: str) -> list:
+    return [(b"authorization", f"Bearer {token}".encode())]
+
+
+def test_unverified_requests_only_count_globally():
+    # logins y tokens desconocidos detrás del mismo proxy no comparten un cupo
+    controller = AdmissionController(max_concurrent=10, per_user=2, retry_after=1)
+    statuses = _run(controller, [[]] * 4 + [_bearer("unknown")] * 4)
+    assert statuses == [200] * 8
+    assert controller.active == 0 and not controller.active_by_user
+
+    assert _run(controller, [[]] * 12).count(503) == 2
+
+
+def test_verified_users_have_their_own_cap():
+    principals.put_claims("token-a", {"sub": "user-a", "exp": time.time() + 60})
+    principals.put_claims("token-b", {"sub": "user-b", "exp": time.time() + 60})
+    controller = AdmissionController(max_concurrent=10, per_user=2, retry_after=1)
+    statuses = _run(controller, [_bearer("token-a")] * 3 + [_bearer("token-b")] * 2)
+    assert statuses == [200, 200, 503, 200, 200]
+    assert controller.active == 0 and not controller.active_by_user
+
+    unlimited = AdmissionController(max_concurrent=10, per_user=0, retry_after=1)
+    assert _run(unlimited, [_bearer("token-a")] * 8) == [200] * 8
+
+
+def test_defaults_allow_parallel_page_loads():
+    principals.put_claims("token-c", {"sub": "user-c", "exp": time.time() + 60})
+    controller = AdmissionController(0, settings.ADMISSION_PER_USER, settings.ADMISSION_RETRY_AFTER_SEC)
+    assert _run(controller, [_bearer("token-c")] * 8) == [200] * 8
+    assert _run(controller, [[]] * 8) == [200] * 8
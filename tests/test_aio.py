@@ -0,0 +1,42 @@
+import inspect
+
+from fastapi import APIRouter, Depends
+from fastapi.routing import APIRoute
+from sqlmodel import Session
+
+from app.config import settings
+from app.db import async_url, get_async_session, get_session
+from app.deps import get_current_user, get_current_user_async
+from app.main import app
+from app.routers import aio
+
+
+def test_async_url_picks_the_async_driver():
+    assert async_url("postgresql://u@h/db") == "postgresql+asyncpg://u@h/db"
+    assert async_url("postgres://u@h/db") == "postgresql+asyncpg://u@h/db"
+    assert async_url("postgresql+psycopg2://u@h/db") == "postgresql+asyncpg://u@h/db"
+    assert async_url("sqlite:///./local.db") == "sqlite+aiosqlite:///./local.db"
+
+
+def test_asyncify_swaps_session_dependencies():
+    router = APIRouter()
+
+    @router.get("/with-session")
+    def with_session(user=Depends(get_current_user), session: Session = Depends(get_session)):
+        return {}
+
+    @router.get("/plain")
+    def plain():
+        return {}
+
+    routes = {r.path: r for r in aio.asyncify(router).routes}
+    converted = routes["/with-session"]
+    assert inspect.iscoroutinefunction(converted.endpoint)
+    deps = {p.name: p.default.dependency for p in inspect.signature(converted.endpoint).parameters.values()}
+    assert deps == {"user": get_current_user_async, "session": get_async_session}
+    assert routes["/plain"].endpoint is plain
+
+
+def test_app_routes_follow_db_async():
+    route = next(r for r in app.routes if isinstance(r, APIRoute) and r.path == "/accounts" and "GET" in r.methods)
+    assert inspect.iscoroutinefunction(route.endpoint) == settings.DB_ASYNC
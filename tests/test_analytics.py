@@ -0,0 +1,93 @@
+from datetime import date
+from uuid import UUID
+
+import pytest
+
+from app import analytics
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setattr(analytics.settings, "ANALYTICS_ENABLED", True)
+    analytics.snapshots.clear()
+    yield
+    analytics.snapshots.clear()
+
+
+def _tx(account_id, amount, day, category_id=None):
+    return {"account_id": account_id, "category_id": category_id, "type": "expense", "amount": amount,
+            "transaction_date": day}
+
+
+def _aggregate(client, auth, group_by, **params) -> dict:
+    r = client.get("/dashboard/aggregate", params={"group_by": group_by, "from": "2024-01-01", "to": "2024-12-31", **params},
+                   headers=auth)
+    assert r.status_code == 200, r.text
+    return {g["key"]: (g["total"], g["count"]) for g in r.json()["groups"]}
+
+
+def test_snapshot_insert_keeps_dates_sorted():
+    snap = analytics.Snapshot(1)
+    snap.extend([(date(2024, 1, 1), 100, "expense", None, None, None, None),
+                 (date(2024, 3, 1), 300, "expense", None, None, "cash", "Uber")])
+    snap.insert([(date(2024, 2, 1), 200, "income", None, None, None, None)])
+    assert list(snap.day) == sorted(snap.day)
+    assert snap.aggregate("month", date(2024, 1, 1), date(2024, 12, 31), ["expense", "income"]) == [
+        {"key": "2024-03", "total": 300, "count": 1},
+        {"key": "2024-02", "total": 200, "count": 1},
+        {"key": "2024-01", "total": 100, "count": 1},
+    ]
+    assert snap.aggregate("counterparty", date(2024, 3, 1), date(2024, 3, 1), ["expense"]) == [
+        {"key": "Uber", "total": 300, "count": 1},
+    ]
+
+
+def test_cache_patches_consecutive_versions_only():
+    cache = analytics.SnapshotCache(10**6)
+    user = UUID(int=1)
+    row = (date(2024, 1, 1), 100, "expense", None, None, None, None)
+    cache.put(user, analytics.Snapshot(3))
+    cache.patch(user, [4], [row])
+    assert cache.get(user, 4) is not None and len(cache.get(user, 4).day) == 1
+    # hueco de versiones (o escritura sin filas): se descarta
+    cache.patch(user, [6], [row])
+    assert cache.get(user, 4) is None and cache.get(user, 6) is None
+
+
+def test_aggregate_is_patched_after_writes(client, auth, enabled):
+    user_id = UUID(client.get("/auth/me", headers=auth).json()["user_id"])
+    bank = client.post("/accounts", json={"name": "bank", "type": "bank"}, headers=auth).json()
+    food = client.post("/categories", json={"name": "food", "type": "expense"}, headers=auth).json()
+    other = client.post("/categories", json={"name": "other", "type": "expense"}, headers=auth).json()
+    client.post("/transactions/bulk", json=[
+        _tx(bank["id"], "10", "2024-03-01", food["id"]), _tx(bank["id"], "5", "2024-05-01", other["id"]),
+    ], headers=auth)
+    assert _aggregate(client, auth, "month") == {"2024-03": (10.0, 1), "2024-05": (5.0, 1)}
+    snap = analytics.snapshots._data[user_id]
+
+    # movimiento nuevo y retroactivo: se intercala en la misma copia, sin reconstruirla
+    client.post("/transactions", json=_tx(bank["id"], "7", "2024-01-15", food["id"]), headers=auth)
+    client.post("/transactions/bulk", json=[_tx(bank["id"], "1", "2024-05-02")], headers=auth)
+    misses = analytics.snapshots.misses
+    assert _aggregate(client, auth, "month") == {"2024-01": (7.0, 1), "2024-03": (10.0, 1), "2024-05": (6.0, 2)}
+    assert analytics.snapshots._data[user_id] is snap and analytics.snapshots.misses == misses
+
+    # recategorizar no se puede aplicar como parche: se descarta y se arma de nuevo
+    client.post("/categories/recategorize", json={
+        "mode": "merge", "source_category_id": other["id"], "target_category_id": food["id"],
+    }, headers=auth)
+    assert user_id not in analytics.snapshots._data
+    assert _aggregate(client, auth, "category") == {food["id"]: (22.0, 3), None: (1.0, 1)}
+    assert analytics.snapshots._data[user_id] is not snap
+
+
+def test_aggregate_matches_without_cache(client, auth, enabled, monkeypatch):
+    bank = client.post("/accounts", json={"name": "bank", "type": "bank"}, headers=auth).json()
+    client.post("/transactions/bulk", json=[
+        _tx(bank["id"], "3", "2024-01-01"), _tx(bank["id"], "4", "2024-01-08"),
+        {"account_id": bank["id"], "type": "income", "amount": "50", "transaction_date": "2024-02-01"},
+    ], headers=auth)
+    cached = {g: _aggregate(client, auth, g, type=["expense", "income"]) for g in analytics.GROUP_BY}
+    monkeypatch.setattr(analytics.settings, "ANALYTICS_ENABLED", False)
+    assert {g: _aggregate(client, auth, g, type=["expense", "income"]) for g in analytics.GROUP_BY} == cached
+    assert cached["weekday"] == {"monday": (7.0, 2), "thursday": (50.0, 1)}
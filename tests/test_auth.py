@@ -0,0 +1,61 @@
+import time
+from uuid import UUID
+
+from sqlmodel import Session
+
+from app import principals
+from app.db import engine
+from app.models import User
+from app.principals import TTLCache
+
+
+def test_ttl_cache_evicts_least_recent_and_expired():
+    cache = TTLCache(2)
+    later = time.time() + 60
+    cache.set("a", 1, later)
+    cache.set("b", 2, later)
+    assert cache.get("a") == 1
+    cache.set("c", 3, later)
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+
+    cache.set("old", 4, time.time() - 1)
+    assert cache.get("old") is None
+    disabled = TTLCache(0)
+    disabled.set("a", 1, later)
+    assert disabled.get("a") is None
+
+
+def test_token_and_user_are_cached(client, auth):
+    assert client.get("/auth/me", headers=auth).status_code == 200
+    before = principals.stats()
+    for _ in range(3):
+        assert client.get("/auth/me", headers=auth).status_code == 200
+    after = principals.stats()
+    assert after["tokens"]["hits"] - before["tokens"]["hits"] == 3
+    assert after["users"]["hits"] - before["users"]["hits"] == 3
+    assert after["tokens"]["misses"] == before["tokens"]["misses"]
+
+
+def test_user_changes_invalidate_the_cache(client, auth):
+    me = client.get("/auth/me", headers=auth).json()
+    user_id = UUID(me["user_id"])
+    with Session(engine) as session:
+        user = session.get(User, user_id)
+        user.currency = "USD"
+        session.add(user)
+        session.commit()
+    assert client.get("/auth/me", headers=auth).json()["currency"] == "USD"
+
+    with Session(engine) as session:
+        session.delete(session.get(User, user_id))
+        session.commit()
+    r = client.get("/auth/me", headers=auth)
+    assert r.status_code == 401 and r.json()["detail"] == "User not found"
+
+
+def test_invalid_tokens_are_not_cached(client):
+    before = principals.stats()["tokens"]["size"]
+    for _ in range(2):
+        r = client.get("/auth/me", headers={"Authorization": "Bearer not-a-token"})
+        assert r.status_code == 401
+    assert principals.stats()["tokens"]["size"] == before
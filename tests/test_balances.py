@@ -0,0 +1,32 @@
+import re
+
+
+def _queries(response) -> int:
+    return int(re.search(r'db;[^,]*desc="(\d+) queries"', response.headers["server-timing"]).group(1))
+
+
+def test_all_balances_in_constant_queries(client, auth):
+    counts = []
+    for n in (1, 5):
+        while len(client.get("/accounts", headers=auth).json()) < n:
+            client.post("/accounts", json={"name": "cash", "type": "cash", "initial_balance": "7"}, headers=auth)
+        r = client.get("/accounts/balances", headers=auth)
+        assert r.status_code == 200 and len(r.json()) == n
+        counts.append(_queries(r))
+    assert counts[0] == counts[1]
+    assert all(b["balance"] == 7.0 for b in r.json())
+
+
+def test_include_balance_on_account_list(client, auth):
+    bank = client.post("/accounts", json={"name": "bank", "type": "bank", "initial_balance": "10"}, headers=auth).json()
+    card = client.post("/accounts", json={"name": "card", "type": "credit_card"}, headers=auth).json()
+    client.post("/transactions", json={
+        "account_id": card["id"], "type": "expense", "amount": "4", "transaction_date": "2024-01-05",
+    }, headers=auth)
+
+    items = {a["id"]: a for a in client.get("/accounts", params={"include_balance": "true"}, headers=auth).json()}
+    assert items[bank["id"]]["balance"] == 10.0 and items[bank["id"]]["name"] == "bank"
+    assert items[card["id"]]["debt"] == 4.0 and "balance" not in items[card["id"]]
+
+    r = client.get("/accounts", params={"include_balance": "true", "fields": "name"}, headers=auth)
+    assert sorted(r.json(), key=lambda a: a["name"]) == [{"name": "bank", "balance": 10.0}, {"name": "card", "debt": 4.0}]
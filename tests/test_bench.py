@@ -0,0 +1,51 @@
+import itertools
+
+import pytest
+from sqlmodel import Session
+
+from app.db import async_engine, engine
+from app.main import app
+from bench import datagen, runner
+from bench.scenarios import Scenario
+
+
+@pytest.fixture(scope="module")
+def bench_data(client):
+    with Session(engine) as session:
+        datagen.generate(session, users=1, years=1, tx_per_month=5)
+
+
+def _engines() -> list:
+    return [engine] + ([async_engine.sync_engine] if async_engine else [])
+
+
+def test_percentile():
+    assert runner.percentile([], 0.5) == 0.0
+    assert runner.percentile([3.0, 1.0, 2.0], 0.5) == 2.0
+    assert runner.percentile([1.0, 2.0], 0.99) == pytest.approx(1.99)
+
+
+def test_scenarios_count_queries_and_errors(client, bench_data):
+    result = client.portal.call(runner.run, app, _engines(), ["accounts", "dashboard_monthly"], 1, 10, 2)
+    for r in result["scenarios"].values():
+        assert r["errors"] == 0 and r["error_statuses"] == {}
+        assert r["queries_per_request"] > 0 and r["p50_ms"] > 0
+
+
+def test_failed_requests_are_counted_by_status(client, bench_data):
+    missing = "/accounts/00000000-0000-0000-0000-000000000001/balance"
+    calls = itertools.count()
+    scenario = Scenario("mixed", lambda ctx, rng: ("GET", missing if next(calls) % 2 else "/accounts", None))
+
+    async def run():
+        counter = runner.QueryCounter(*_engines())
+        try:
+            async with runner.httpx.AsyncClient(transport=runner.httpx.ASGITransport(app=app), base_url="http://bench") as c:
+                contexts = await runner._contexts(c, 1)
+                return await runner._run_scenario(c, scenario, contexts, 20, 4, 7, counter)
+        finally:
+            counter.close()
+
+    r = client.portal.call(run)
+    assert r["errors"] == 10 and r["error_statuses"] == {"404": 10}
+    assert r["throughput_rps"] > 0
@@ -0,0 +1,117 @@
+from uuid import UUID
+
+from sqlmodel import Session, select
+
+from app import categorize
+from app.db import engine
+from app.models import BalanceCheckpoint
+
+
+def test_merge_deleting_empty_category_invalidates_etag(client, auth):
+    source = client.post("/categories", json={"name": "old", "type": "expense"}, headers=auth).json()
+    target = client.post("/categories", json={"name": "new", "type": "expense"}, headers=auth).json()
+    r = client.get("/categories", headers=auth)
+    assert r.status_code == 200
+    etag = r.headers["etag"]
+
+    r = client.post("/categories/recategorize", json={
+        "mode": "merge",
+        "source_category_id": source["id"],
+        "target_category_id": target["id"],
+        "delete_source": True,
+    }, headers=auth)
+    assert r.status_code == 200, r.text
+    assert r.json()["updated"] == 0
+
+    r = client.get("/categories", headers={**auth, "If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["etag"] != etag
+    assert source["id"] not in {c["id"] for c in r.json()}
+
+
+def test_delete_category_with_transactions_requires_reassign(client, auth):
+    bank = client.post("/accounts", json={"name": "bank", "type": "bank"}, headers=auth).json()
+    food = client.post("/categories", json={"name": "food", "type": "expense"}, headers=auth).json()
+    other = client.post("/categories", json={"name": "other", "type": "expense"}, headers=auth).json()
+    r = client.post("/transactions", json={
+        "account_id": bank["id"], "category_id": food["id"], "type": "expense",
+        "amount": "5", "transaction_date": "2024-01-05",
+    }, headers=auth)
+    assert r.status_code == 200, r.text
+
+    assert client.delete(f"/categories/{food['id']}", headers=auth).status_code == 409
+    r = client.delete(f"/categories/{food['id']}", params={"reassign_to": other["id"]}, headers=auth)
+    assert r.status_code == 200, r.text
+    assert client.delete(f"/categories/{other['id']}", headers=auth).status_code == 409
+
+
+def _category_ids(client, auth) -> dict:
+    items = client.get("/transactions", params={"fields": "description,category_id"}, headers=auth).json()["items"]
+    return {t["description"]: t["category_id"] for t in items}
+
+
+def test_rules_categorize_on_ingest_and_recategorize(client, auth):
+    bank = client.post("/accounts", json={"name": "bank", "type": "bank"}, headers=auth).json()
+    food = client.post("/categories", json={"name": "food", "type": "expense"}, headers=auth).json()
+    salary = client.post("/categories", json={"name": "salary", "type": "income"}, headers=auth).json()
+    client.post("/transactions/bulk", json=[
+        {"account_id": bank["id"], "type": "expense", "amount": "8", "transaction_date": "2024-05-01",
+         "description": "antes", "counterparty": "Más x Menos"},
+    ], headers=auth)
+    r = client.post("/categories/rules", json={"category_id": food["id"], "counterparty": "mas x menos"}, headers=auth)
+    assert r.status_code == 200, r.text
+    client.post("/categories/rules", json={"category_id": salary["id"], "description": "planilla"}, headers=auth)
+
+    client.post("/transactions/bulk", json=[
+        {"account_id": bank["id"], "type": "expense", "amount": "9", "transaction_date": "2024-05-02",
+         "description": "despues", "counterparty": "MAS X MENOS Escazú"},
+        {"account_id": bank["id"], "type": "income", "amount": "100", "transaction_date": "2024-05-03",
+         "description": "Planilla mayo"},
+        # el tipo no coincide con la categoría de la regla
+        {"account_id": bank["id"], "type": "expense", "amount": "1", "transaction_date": "2024-05-04",
+         "description": "planilla fee"},
+    ], headers=auth)
+    assert _category_ids(client, auth) == {
+        "antes": None, "despues": food["id"], "Planilla mayo": salary["id"], "planilla fee": None,
+    }
+
+    r = client.post("/categories/recategorize", json={"mode": "rules"}, headers=auth)
+    assert r.status_code == 200 and r.json()["updated"] == 1
+    assert _category_ids(client, auth)["antes"] == food["id"]
+
+
+def test_rule_cache_has_its_own_size(monkeypatch):
+    assert categorize._matchers.maxsize == categorize.settings.RULES_CACHE_SIZE
+    monkeypatch.setattr(categorize._matchers, "maxsize", 0)
+    categorize._matchers.set("user", object(), float("inf"))
+    assert categorize._matchers.get("user") is None
+
+
+def test_merge_keeps_balance_checkpoints(client, auth):
+    bank = client.post("/accounts", json={"name": "bank", "type": "bank", "initial_balance": "10"}, headers=auth).json()
+    old = client.post("/categories", json={"name": "old", "type": "expense"}, headers=auth).json()
+    new = client.post("/categories", json={"name": "new", "type": "expense"}, headers=auth).json()
+    client.post("/transactions", json={
+        "account_id": bank["id"], "category_id": old["id"], "type": "expense",
+        "amount": "4", "transaction_date": "2024-01-05",
+    }, headers=auth)
+    r = client.get(f"/accounts/{bank['id']}/history", params={"from": "2024-01-01", "to": "2024-03-31"}, headers=auth)
+    points = r.json()["points"]
+
+    def checkpoints():
+        with Session(engine) as session:
+            return session.exec(select(BalanceCheckpoint.month, BalanceCheckpoint.balance)
+                                .where(BalanceCheckpoint.account_id == UUID(bank["id"]))).all()
+
+    before = checkpoints()
+    assert before
+    r = client.post("/categories/recategorize", json={
+        "mode": "merge", "source_category_id": old["id"], "target_category_id": new["id"],
+    }, headers=auth)
+    assert r.json()["updated"] == 1
+    assert checkpoints() == before
+    r = client.get("/dashboard/categories", params={"from": "2024-01", "to": "2024-01"}, headers=auth)
+    assert r.status_code == 200, r.text
+    assert [c["category_id"] for c in r.json()["categories"] if c["total"]] == [new["id"]]
+    r = client.get(f"/accounts/{bank['id']}/history", params={"from": "2024-01-01", "to": "2024-03-31"}, headers=auth)
+    assert r.json()["points"] == points
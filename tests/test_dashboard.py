@@ -0,0 +1,48 @@
+import pytest
+
+
+def _tx(account_id, tx_type, amount, day):
+    return {"account_id": account_id, "type": tx_type, "amount": amount, "transaction_date": day}
+
+
+@pytest.fixture
+def accounts(client, auth):
+    bank = client.post("/accounts", json={"name": "bank", "type": "bank"}, headers=auth).json()
+    card = client.post("/accounts", json={"name": "card", "type": "credit_card"}, headers=auth).json()
+    rows = [
+        _tx(bank["id"], "income", "1000", "2024-01-02"),
+        _tx(bank["id"], "expense", "200", "2024-01-20"),
+        _tx(card["id"], "expense", "50", "2024-01-31"),
+        _tx(bank["id"], "expense", "75.5", "2024-03-01"),
+        _tx(bank["id"], "income", "10", "2023-12-31"),
+    ]
+    r = client.post("/transactions/bulk", json=rows, headers=auth)
+    assert r.status_code == 200 and r.json()["inserted"] == len(rows), r.text
+    return bank, card
+
+
+def test_series_fills_every_month(client, auth, accounts):
+    r = client.get("/dashboard/series", params={"from": "2024-01", "to": "2024-04"}, headers=auth)
+    assert r.status_code == 200, r.text
+    series = r.json()["series"]
+    assert [(p["period"]["year"], p["period"]["month"]) for p in series] == [(2024, 1), (2024, 2), (2024, 3), (2024, 4)]
+    assert [(p["income"], p["expense"], p["balance"]) for p in series] == [
+        (1000.0, 250.0, 750.0), (0.0, 0.0, 0.0), (0.0, 75.5, -75.5), (0.0, 0.0, 0.0),
+    ]
+
+    monthly = client.get("/dashboard/monthly", params={"year": 2024, "month": 1}, headers=auth).json()
+    assert monthly == series[0]
+
+
+def test_series_crosses_years(client, auth, accounts):
+    r = client.get("/dashboard/series", params={"from": "2023-12", "to": "2024-01"}, headers=auth)
+    assert [p["income"] for p in r.json()["series"]] == [10.0, 1000.0]
+
+
+@pytest.mark.parametrize("params", [
+    {"from": "2024-03", "to": "2024-01"},
+    {"from": "2024-13", "to": "2025-01"},
+    {"from": "2000-01", "to": "2024-01"},
+])
+def test_series_rejects_bad_ranges(client, auth, params):
+    assert client.get("/dashboard/series", params=params, headers=auth).status_code == 400
@@ -0,0 +1,44 @@
+from uuid import uuid4
+
+import pytest
+
+from app import versions
+
+
+def test_etag_matching():
+    tag = versions.etag(uuid4(), 3)
+    assert tag.startswith('W/"')
+    assert versions.matches(tag, tag)
+    assert versions.matches(f'"other", {tag.removeprefix("W/")}', tag)
+    assert versions.matches("*", tag)
+    assert not versions.matches(None, tag) and not versions.matches('W/"other"', tag)
+
+
+@pytest.mark.parametrize("path", ["/accounts", "/accounts/balances", "/categories", "/transactions",
+                                  "/dashboard/monthly?year=2024&month=1"])
+def test_conditional_get_until_next_write(client, auth, path):
+    r = client.get(path, headers=auth)
+    assert r.status_code == 200
+    etag = r.headers["etag"]
+    assert r.headers["cache-control"] == "private, no-cache"
+
+    r = client.get(path, headers={**auth, "If-None-Match": etag})
+    assert r.status_code == 304 and r.headers["etag"] == etag and not r.content
+
+    client.post("/categories", json={"name": "new", "type": "expense"}, headers=auth)
+    r = client.get(path, headers={**auth, "If-None-Match": etag})
+    assert r.status_code == 200 and r.headers["etag"] != etag
+
+
+def test_etags_are_per_user(client, auth):
+    etag = client.get("/accounts", headers=auth).headers["etag"]
+    email = f"{uuid4().hex[:12]}@example.com"
+    client.post("/auth/register", json={"email": email, "password": "password1"})
+    token = client.post("/auth/login", json={"email": email, "password": "password1"}).json()["access_token"]
+    r = client.get("/accounts", headers={"Authorization": f"Bearer {token}", "If-None-Match": etag})
+    assert r.status_code == 200
+
+
+def test_writes_do_not_carry_etags(client, auth):
+    r = client.post("/accounts", json={"name": "bank", "type": "bank"}, headers=auth)
+    assert r.status_code == 200 and "etag" not in r.headers
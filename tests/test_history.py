@@ -0,0 +1,76 @@
+import threading
+import time
+from datetime import date
+from uuid import UUID
+
+import pytest
+from sqlmodel import Session
+
+from app import ledger
+from app.db import engine, lock_user
+from app.models import Account, Transaction
+
+
+def _tx(account_id, tx_type, amount, day):
+    return {"account_id": account_id, "type": tx_type, "amount": amount, "transaction_date": day}
+
+
+def _history(client, auth, account_id, **params) -> list:
+    r = client.get(f"/accounts/{account_id}/history", params=params, headers=auth)
+    assert r.status_code == 200, r.text
+    return [(p["to"], p["balance"]) for p in r.json()["points"]]
+
+
+def test_history_uses_checkpoints_and_sees_backdated_writes(client, auth):
+    bank = client.post("/accounts", json={"name": "bank", "type": "bank", "initial_balance": "100"}, headers=auth).json()
+    client.post("/transactions/bulk", json=[
+        _tx(bank["id"], "income", "50", "2024-01-10"), _tx(bank["id"], "expense", "30", "2024-03-05"),
+    ], headers=auth)
+
+    params = {"from": "2024-02-01", "to": "2024-04-30"}
+    expected = [("2024-02-29", 150.0), ("2024-03-31", 120.0), ("2024-04-30", 120.0)]
+    assert _history(client, auth, bank["id"], **params) == expected
+    assert _history(client, auth, bank["id"], **params) == expected
+
+    # movimiento retroactivo: invalida los cierres guardados desde enero
+    client.post("/transactions", json=_tx(bank["id"], "expense", "20", "2024-01-20"), headers=auth)
+    assert _history(client, auth, bank["id"], **params) == [(d, b - 20) for d, b in expected]
+
+    days = _history(client, auth, bank["id"], **{"from": "2024-03-04", "to": "2024-03-06", "granularity": "day"})
+    assert days == [("2024-03-04", 130.0), ("2024-03-05", 100.0), ("2024-03-06", 100.0)]
+
+
+def test_history_date_bounds(client, auth):
+    bank = client.post("/accounts", json={"name": "bank", "type": "bank"}, headers=auth).json()
+    r = client.get(f"/accounts/{bank['id']}/history", params={"from": "0001-01-01", "to": "0001-02-01"}, headers=auth)
+    assert r.status_code == 422
+    for granularity, count in (("day", 31), ("week", 5), ("month", 1)):
+        points = _history(client, auth, bank["id"], **{"from": "9999-12-01", "to": "9999-12-31", "granularity": granularity})
+        assert len(points) == count and points[-1] == ("9999-12-31", 0.0)
+
+
+@pytest.mark.skipif(engine.dialect.name != "postgresql", reason="advisory locks need Postgres")
+def test_checkpoints_wait_for_backdated_write(client, auth):
+    bank = client.post("/accounts", json={"name": "bank", "type": "bank", "initial_balance": "100"}, headers=auth).json()
+    client.post("/transactions", json=_tx(bank["id"], "income", "50", "2024-01-10"), headers=auth)
+    results = []
+
+    def read():
+        results.append(_history(client, auth, bank["id"], **{"from": "2024-03-01", "to": "2024-03-31"}))
+
+    # escritura retroactiva en curso (lock tomado, sin commit): el historial no guarda cierres hasta que termine
+    with Session(engine) as session:
+        acc = session.get(Account, UUID(bank["id"]))
+        lock_user(session, acc.user_id)
+        reader = threading.Thread(target=read)
+        reader.start()
+        time.sleep(0.3)
+        assert reader.is_alive() and not results
+        tx = Transaction(user_id=acc.user_id, account_id=acc.id, type="expense", amount=2000,
+                         transaction_date=date(2024, 1, 20))
+        session.add(tx)
+        ledger.record_transactions(session, [tx], [acc])
+        session.commit()
+    reader.join(5)
+    assert results == [[("2024-03-31", 130.0)]]
+    assert _history(client, auth, bank["id"], **{"from": "2024-02-01", "to": "2024-02-29"}) == [("2024-02-29", 130.0)]
@@ -0,0 +1,91 @@
+import threading
+import time
+from uuid import UUID
+
+import pytest
+from sqlalchemy import delete, update
+from sqlmodel import Session, select
+
+from app import ledger
+from app.db import engine, lock_user
+from app.models import Account, AccountBalance
+
+
+def _tx(account_id, tx_type, amount, day="2024-01-05"):
+    return {"account_id": account_id, "type": tx_type, "amount": amount, "transaction_date": day}
+
+
+def _balances(client, auth) -> dict:
+    return {b["account_id"]: b for b in client.get("/accounts/balances", headers=auth).json()}
+
+
+def test_ledger_follows_every_write(client, auth):
+    bank = client.post("/accounts", json={"name": "bank", "type": "bank", "initial_balance": "100"}, headers=auth).json()
+    card = client.post("/accounts", json={"name": "card", "type": "credit_card"}, headers=auth).json()
+    for tx in (_tx(bank["id"], "income", "50"), _tx(bank["id"], "expense", "20.25"), _tx(card["id"], "expense", "30")):
+        assert client.post("/transactions", json=tx, headers=auth).status_code == 200
+
+    balances = _balances(client, auth)
+    assert balances[bank["id"]]["balance"] == 129.75
+    assert balances[card["id"]]["debt"] == 30.0
+    assert client.get(f"/accounts/{bank['id']}/balance", headers=auth).json()["balance"] == 129.75
+
+    r = client.patch(f"/accounts/{bank['id']}", json={"initial_balance": "0"}, headers=auth)
+    assert r.status_code == 200, r.text
+    assert _balances(client, auth)[bank["id"]]["balance"] == 29.75
+
+
+def test_rebuild_reports_and_fixes_drift(client, auth):
+    bank = client.post("/accounts", json={"name": "bank", "type": "bank", "initial_balance": "10"}, headers=auth).json()
+    client.post("/transactions", json=_tx(bank["id"], "income", "5"), headers=auth)
+    account_id = UUID(bank["id"])
+
+    with Session(engine) as session:
+        session.exec(update(AccountBalance).where(AccountBalance.account_id == account_id).values(balance=1))
+        session.commit()
+        wrong = [m for m in ledger.rebuild(session, fix=False) if m["account_id"] == bank["id"]]
+        assert wrong == [{"account_id": bank["id"], "stored": 1, "expected": 1500}]
+        ledger.rebuild(session)
+        assert not [m for m in ledger.rebuild(session, fix=False) if m["account_id"] == bank["id"]]
+
+    assert _balances(client, auth)[bank["id"]]["balance"] == 15.0
+
+
+def test_missing_ledger_row_is_filled_on_read(client, auth):
+    bank = client.post("/accounts", json={"name": "bank", "type": "bank", "initial_balance": "10"}, headers=auth).json()
+    client.post("/transactions", json=_tx(bank["id"], "expense", "4"), headers=auth)
+    account_id = UUID(bank["id"])
+    with Session(engine) as session:
+        session.exec(delete(AccountBalance).where(AccountBalance.account_id == account_id))
+        session.commit()
+
+    assert _balances(client, auth)[bank["id"]]["balance"] == 6.0
+    with Session(engine) as session:
+        assert session.get(AccountBalance, account_id).balance == 600
+
+
+@pytest.mark.skipif(engine.dialect.name != "postgresql", reason="advisory locks need Postgres")
+def test_lazy_fill_waits_for_concurrent_write(client, auth):
+    bank = client.post("/accounts", json={"name": "bank", "type": "bank", "initial_balance": "10"}, headers=auth).json()
+    account_id = UUID(bank["id"])
+    with Session(engine) as session:
+        session.exec(delete(AccountBalance).where(AccountBalance.account_id == account_id))
+        session.commit()
+    results = []
+
+    def read():
+        results.append(_balances(client, auth)[bank["id"]]["balance"])
+
+    # una escritura en curso (lock tomado, sin commit): la lectura no calcula hasta que termine
+    with Session(engine) as session:
+        acc = session.exec(select(Account).where(Account.id == account_id)).one()
+        lock_user(session, acc.user_id)
+        reader = threading.Thread(target=read)
+        reader.start()
+        time.sleep(0.3)
+        assert reader.is_alive() and not results
+        acc.initial_balance = 2000
+        session.add(acc)
+        session.commit()
+    reader.join(5)
+    assert results == [20.0]
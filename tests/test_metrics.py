@@ -0,0 +1,43 @@
+import logging
+import re
+
+from app import metrics
+
+
+def test_normalize_collapses_parameters_and_literals():
+    assert metrics.normalize("SELECT * FROM t\n WHERE id IN (?, ?, ?) AND name = 'x'") == (
+        "SELECT * FROM t WHERE id IN (?, ...) AND name = ?"
+    )
+    assert metrics.normalize("VALUES (%(a)s, %(b)s) LIMIT 10") == "VALUES (?, ...) LIMIT ?"
+    assert metrics.normalize("WHERE a = $1 OR b IN ($2, $3)") == "WHERE a = $1 OR b IN (?, ...)"
+
+
+def _server_timing(response) -> dict:
+    out = {}
+    for part in response.headers["server-timing"].split(", "):
+        name, *attrs = part.split(";")
+        out[name] = dict(a.split("=", 1) for a in attrs)
+    return out
+
+
+def test_server_timing_reports_queries_and_stages(client, auth):
+    timing = _server_timing(client.get("/accounts", headers=auth))
+    assert set(timing) >= {"db", "auth", "app", "ser", "total"}
+    assert int(re.match(r'"(\d+) queries"', timing["db"]["desc"]).group(1)) >= 1
+    assert float(timing["total"]["dur"]) >= float(timing["app"]["dur"])
+
+
+def test_metrics_expose_routes_and_query_counts(client, auth):
+    client.get("/accounts", headers=auth)
+    body = client.get("/metrics").text
+    assert 'http_request_duration_seconds_count{method="GET",route="/accounts",status="200"}' in body
+    queries = re.search(r'db_queries_total\{method="GET",route="/accounts"\} (\d+)', body)
+    assert queries and int(queries.group(1)) >= 1
+    assert re.search(r"^admission_shed \d+$", body, re.M)
+
+
+def test_slow_queries_are_logged(client, auth, caplog, monkeypatch):
+    monkeypatch.setattr(metrics.settings, "SLOW_QUERY_MS", 1e-6)
+    with caplog.at_level(logging.WARNING, logger="app.sql.slow"):
+        client.get("/accounts", headers=auth)
+    assert any("route=/accounts" in r.getMessage() for r in caplog.records)
@@ -0,0 +1,25 @@
+from sqlalchemy import inspect
+from sqlmodel import create_engine
+
+from app import migrations
+from app.db import prepare_engine
+from app.migrations import m0003_transaction_indexes
+
+
+def test_migrate_applies_every_version_once(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    prepare_engine(engine)
+    versions = [v for v, _, _ in migrations.discover()]
+    assert versions == list(range(1, len(versions) + 1))
+
+    assert migrations.migrate(engine, log=lambda *a: None) == versions
+    assert migrations.migrate(engine, log=lambda *a: None) == []
+    assert migrations.pending(engine) == []
+
+    db = inspect(engine)
+    indexes = {ix["name"] for ix in db.get_indexes("transactions")}
+    assert {"ix_transactions_user_date", "ix_transactions_account_date", "ix_transactions_category_id"} <= indexes
+    assert not indexes & set(m0003_transaction_indexes.DROP)
+    assert {"transactions_fts", "monthly_rollups", "account_balances", "balance_checkpoints"} <= set(db.get_table_names())
+    assert "data_version" in {c["name"] for c in db.get_columns("users")}
+    engine.dispose()
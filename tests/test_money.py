@@ -0,0 +1,38 @@
+import pytest
+
+from app.schemas import AmountPrecisionError, to_minor
+
+
+def test_to_minor_rejects_digits_below_minor_unit():
+    assert to_minor("12.34", "CRC") == 1234
+    assert to_minor(12.34, "CRC") == 1234
+    assert to_minor("500", "JPY") == 500
+    assert to_minor("1.005", "KWD") == 1005
+    for value, currency in (("0.001", "CRC"), ("12.345", "USD"), ("0.5", "JPY")):
+        with pytest.raises(AmountPrecisionError):
+            to_minor(value, currency)
+
+
+@pytest.fixture
+def bank(client, auth):
+    r = client.post("/accounts", json={"name": "bank", "type": "bank"}, headers=auth)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_sub_minor_amounts_are_rejected(client, auth, bank):
+    tx = {"account_id": bank["id"], "type": "expense", "amount": "0.001", "transaction_date": "2024-01-05"}
+    r = client.post("/transactions", json=tx, headers=auth)
+    assert r.status_code == 422, r.text
+
+    r = client.post("/transactions/bulk", json=[tx, {**tx, "amount": "1.50"}], headers=auth)
+    assert r.status_code == 200, r.text
+    assert r.json()["inserted"] == 1
+    assert [e["row"] for e in r.json()["errors"]] == [0]
+
+    r = client.patch(f"/accounts/{bank['id']}", json={"initial_balance": "10.005"}, headers=auth)
+    assert r.status_code == 422, r.text
+
+    r = client.get("/dashboard/monthly", params={"year": 2024, "month": 1}, headers=auth)
+    assert r.status_code == 200, r.text
+    assert r.json()["expense"] == 1.5
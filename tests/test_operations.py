@@ -0,0 +1,66 @@
+import pytest
+
+
+@pytest.fixture
+def setup(client, auth):
+    bank = client.post("/accounts", json={"name": "bank", "type": "bank", "initial_balance": "1000"}, headers=auth).json()
+    cash = client.post("/accounts", json={"name": "cash", "type": "cash"}, headers=auth).json()
+    card = client.post("/accounts", json={"name": "card", "type": "credit_card", "initial_balance": "300"}, headers=auth).json()
+    pay = client.post("/categories", json={"name": "Card payment", "type": "expense"}, headers=auth).json()
+    return {"bank": bank["id"], "cash": cash["id"], "card": card["id"], "pay": pay["id"]}
+
+
+def _transfer(s, amount, **kw):
+    return {"kind": "transfer", "from_account_id": s["bank"], "to_account_id": s["cash"],
+            "amount": amount, "transaction_date": "2024-01-05", **kw}
+
+
+def _payment(s, amount):
+    return {"kind": "credit_card_payment", "bank_account_id": s["bank"], "credit_card_account_id": s["card"],
+            "amount": amount, "transaction_date": "2024-01-06", "payment_category_id": s["pay"]}
+
+
+def _balances(client, auth, s) -> tuple:
+    b = {x["account_id"]: x for x in client.get("/accounts/balances", headers=auth).json()}
+    return b[s["bank"]]["balance"], b[s["cash"]]["balance"], b[s["card"]]["debt"]
+
+
+def test_batch_saves_everything_in_one_commit(client, auth, setup):
+    r = client.post("/operations/batch", json={"operations": [
+        _transfer(setup, "100"), _payment(setup, "50"), _transfer(setup, "1.5"),
+    ]}, headers=auth)
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert body["saved"] == 3 and body["failed"] == 0
+    assert len({res["group_id"] for res in body["results"]}) == 3
+    assert _balances(client, auth, setup) == (848.5, 101.5, 250.0)
+    assert len(client.get("/transactions", headers=auth).json()["items"]) == 6
+
+
+def test_all_or_nothing_rejects_the_whole_batch(client, auth, setup):
+    ops = [_transfer(setup, "100"), _transfer(setup, "5", to_account_id=setup["bank"]), _transfer(setup, "0.001")]
+    r = client.post("/operations/batch", json={"operations": ops}, headers=auth)
+    assert r.status_code == 400
+    assert [(e["index"], e["status_code"]) for e in r.json()["detail"]["errors"]] == [(1, 400), (2, 422)]
+    assert _balances(client, auth, setup) == (1000.0, 0.0, 300.0)
+
+
+def test_partial_batch_saves_valid_operations(client, auth, setup):
+    ops = [_transfer(setup, "100"), _transfer(setup, "5", to_account_id=setup["card"]), _payment(setup, "20")]
+    r = client.post("/operations/batch", json={"operations": ops, "all_or_nothing": False}, headers=auth)
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert body["saved"] == 2 and body["failed"] == 1
+    assert body["results"][1]["status_code"] == 400
+    assert _balances(client, auth, setup) == (880.0, 100.0, 280.0)
+
+
+def test_single_operations(client, auth, setup):
+    transfer = {k: v for k, v in _transfer(setup, "10", fee="1").items() if k != "kind"}
+    assert client.post("/operations/transfer", json=transfer, headers=auth).status_code == 400
+    pay = client.post("/categories", json={"name": "fees", "type": "expense"}, headers=auth).json()
+    r = client.post("/operations/transfer", json={**transfer, "fee_category_id": pay["id"]}, headers=auth)
+    assert r.status_code == 200, r.text
+    payment = {k: v for k, v in _payment(setup, "30").items() if k != "kind"}
+    assert client.post("/operations/credit-card-payment", json=payment, headers=auth).status_code == 200
+    assert _balances(client, auth, setup) == (959.0, 10.0, 270.0)
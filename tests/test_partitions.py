@@ -0,0 +1,76 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+
+from app import partitions
+from app.db import engine
+
+
+def test_periods():
+    assert partitions.period_start(date(2024, 5, 17), "year") == date(2024, 1, 1)
+    assert partitions.period_start(date(2024, 5, 17), "month") == date(2024, 5, 1)
+    assert partitions.next_period(date(2024, 12, 1), "month") == date(2025, 1, 1)
+    assert partitions.next_period(date(2024, 1, 1), "year") == date(2025, 1, 1)
+    assert partitions.partition_name(date(2024, 3, 1), "month") == "transactions_p2024_03"
+    assert partitions.partition_name(date(2024, 1, 1), "year") == "transactions_p2024"
+
+
+def test_archive_rejects_bad_tablespace():
+    with pytest.raises(ValueError):
+        partitions.archive(engine, date(2024, 1, 1), "x; DROP TABLE users")
+
+
+# corre solo contra Postgres: DATABASE_URL=postgresql://... python -m pytest tests
+@pytest.mark.skipif(not partitions.supported(engine), reason="partitioning needs Postgres")
+def test_partitioned_transactions(client, auth):
+    bank = client.post("/accounts", json={"name": "bank", "type": "bank"}, headers=auth).json()
+
+    def add(day: str, amount: str = "1.00"):
+        r = client.post("/transactions", json={
+            "account_id": bank["id"], "type": "expense", "amount": amount, "transaction_date": day,
+        }, headers=auth)
+        assert r.status_code == 200, r.text
+
+    for day in ("2023-06-01", "2023-12-31", "2024-01-01", "2024-07-15"):
+        add(day)
+    before = client.get("/transactions", headers=auth).json()["items"]
+
+    partitions.setup(engine, "year", ahead=1, today=date(2024, 7, 1))
+    with engine.connect() as conn:
+        assert partitions.is_partitioned(conn)
+        pk = conn.execute(text(
+            "SELECT pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = 'transactions'::regclass AND contype = 'p'"
+        )).scalar()
+        assert pk == "PRIMARY KEY (id, transaction_date)"
+    assert client.get("/transactions", headers=auth).json()["items"] == before
+
+    # límites de año y una fecha fuera de rango (cae en DEFAULT hasta el próximo ensure)
+    for day in ("2024-12-31", "2025-01-01", "2031-03-03"):
+        add(day, "2.00")
+    partitions.ensure(engine, ahead=1, today=date(2024, 7, 1))
+    with engine.connect() as conn:
+        where = dict(conn.execute(text(
+            "SELECT tableoid::regclass::text, count(*) FROM transactions WHERE account_id = :a GROUP BY 1"
+        ), {"a": bank["id"]}).all())
+        plan = "\n".join(conn.execute(text(
+            "EXPLAIN SELECT * FROM transactions WHERE transaction_date >= '2024-01-01' AND transaction_date < '2025-01-01'"
+        )).scalars())
+    assert where["transactions_p2023"] == 2 and where["transactions_p2024"] == 3
+    assert where["transactions_p2025"] == 1 and where["transactions_p2031"] == 1
+    assert "transactions_default" not in where
+    assert "transactions_p2024" in plan and "transactions_p2023" not in plan
+
+    # keyset pagination entre particiones
+    items, cursor = [], None
+    while True:
+        r = client.get("/transactions", params={"limit": 2, **({"cursor": cursor} if cursor else {})}, headers=auth).json()
+        items += r["items"]
+        cursor = r["next_cursor"]
+        if not cursor:
+            break
+    assert [t["transaction_date"] for t in items] == sorted((t["transaction_date"] for t in items), reverse=True)
+    assert len(items) == 7
+
+    assert "transactions_p2023" in partitions.archive(engine, date(2024, 1, 1))
+    assert client.get("/accounts/balances", headers=auth).json()[0]["balance"] == -10.0
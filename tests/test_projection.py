@@ -0,0 +1,40 @@
+from datetime import date
+from uuid import UUID, uuid4
+
+import orjson
+import pytest
+
+from app import projection
+from app.models import Account
+
+
+def test_columns_and_json_response():
+    cols, names = projection.columns(Account, " name, id ,name")
+    assert names == ["name", "id"] and [c.key for c in cols] == names
+    assert projection.columns(Account, None)[1] == [c.key for c in Account.__table__.columns]
+
+    class DriverUUID(UUID):
+        # como asyncpg: subclase de uuid.UUID
+        pass
+
+    value = uuid4()
+    body = projection.JSONResponse({"id": DriverUUID(str(value)), "day": date(2024, 1, 2)}).body
+    assert orjson.loads(body) == {"id": str(value), "day": "2024-01-02"}
+
+
+@pytest.mark.parametrize("path", ["/accounts", "/categories", "/transactions"])
+def test_list_endpoints_project_fields(client, auth, path):
+    client.post("/accounts", json={"name": "bank", "type": "bank"}, headers=auth)
+    client.post("/categories", json={"name": "food", "type": "expense"}, headers=auth)
+    bank = client.get("/accounts", headers=auth).json()[0]
+    client.post("/transactions", json={
+        "account_id": bank["id"], "type": "income", "amount": "1", "transaction_date": "2024-01-05",
+    }, headers=auth)
+
+    r = client.get(path, params={"fields": "id,user_id"}, headers=auth)
+    assert r.status_code == 200, r.text
+    items = r.json()["items"] if path == "/transactions" else r.json()
+    assert items and all(set(item) == {"id", "user_id"} for item in items)
+
+    r = client.get(path, params={"fields": "id,password_hash"}, headers=auth)
+    assert r.status_code == 400 and "password_hash" in r.json()["detail"]
@@ -0,0 +1,27 @@
+from sqlalchemy import event
+
+from app.db import async_engine, engine
+
+
+def test_read_request_uses_one_connection(client, auth):
+    pool = (async_engine.sync_engine if async_engine else engine).pool
+    state = {"out": 0, "peak": 0}
+
+    def checkout(*args):
+        state["out"] += 1
+        state["peak"] = max(state["peak"], state["out"])
+
+    def checkin(*args):
+        state["out"] -= 1
+
+    event.listen(pool, "checkout", checkout)
+    event.listen(pool, "checkin", checkin)
+    try:
+        for path in ("/categories", "/accounts", "/transactions"):
+            state["peak"] = 0
+            r = client.get(path, headers=auth)
+            assert r.status_code == 200, r.text
+            assert state["peak"] == 1, path
+    finally:
+        event.remove(pool, "checkout", checkout)
+        event.remove(pool, "checkin", checkin)
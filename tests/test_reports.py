@@ -0,0 +1,103 @@
+import threading
+import time
+from uuid import UUID
+
+import pytest
+from sqlmodel import Session, select
+
+from app import ledger, rollups
+from app.db import engine, lock_user
+from app.jobs import ReportQueue
+from app.models import Account, User
+
+
+def _wait(job):
+    for _ in range(200):
+        if job.status in ("done", "failed"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError("report did not finish")
+
+
+def _user_id(client, auth) -> UUID:
+    return UUID(client.get("/auth/me", headers=auth).json()["user_id"])
+
+
+def test_report_cached_until_next_write(client, auth):
+    r = client.post("/reports", json={"kind": "yearly_summary", "year": 2024}, headers=auth)
+    assert r.status_code == 202, r.text
+    job_id = r.json()["id"]
+    for _ in range(200):
+        body = client.get(f"/reports/{job_id}", headers=auth).json()
+        if body["status"] == "done":
+            break
+        time.sleep(0.02)
+    assert body["result"]["year"] == 2024
+
+    r = client.post("/reports", json={"kind": "yearly_summary", "year": 2024}, headers=auth)
+    assert r.status_code == 200 and r.json()["id"] == job_id
+
+    client.post("/accounts", json={"name": "bank", "type": "bank"}, headers=auth)
+    r = client.post("/reports", json={"kind": "yearly_summary", "year": 2024}, headers=auth)
+    assert r.status_code == 202 and r.json()["id"] != job_id
+
+
+def test_result_size_and_memory_are_bounded(client, auth):
+    bank = client.post("/accounts", json={"name": "bank", "type": "bank"}, headers=auth).json()
+    rows = [{"account_id": bank["id"], "type": "expense", "amount": "1.00", "transaction_date": "2024-01-05"}] * 20
+    assert client.post("/transactions/bulk", json=rows, headers=auth).status_code == 200
+    user_id = _user_id(client, auth)
+
+    queue = ReportQueue(workers=1, queue=4, per_user=2, ttl=60, durable=False, max_result=2000, budget=1500)
+    try:
+        with Session(engine) as session:
+            big, _ = queue.submit(session, user_id, "export", {}, 1)
+            first, _ = queue.submit(session, user_id, "yearly_summary", {"year": 2023}, 1)
+        assert _wait(big).status == "failed" and "too large" in big.error
+        assert _wait(first).status == "done"
+
+        with Session(engine) as session:
+            second, _ = queue.submit(session, user_id, "yearly_summary", {"year": 2024}, 1)
+        _wait(second)
+        time.sleep(0.05)
+        with Session(engine) as session:
+            assert queue.get(session, first.id) is None
+            assert queue.get(session, second.id) is second
+        stats = queue.stats()
+        assert stats["evictions"] == 1 and stats["result_bytes"] <= 1500
+    finally:
+        queue.shutdown()
+
+
+@pytest.mark.skipif(engine.dialect.name != "postgresql", reason="advisory locks need Postgres")
+def test_rebuild_does_not_overwrite_concurrent_write(client, auth):
+    bank = client.post("/accounts", json={"name": "bank", "type": "bank", "initial_balance": "100"}, headers=auth).json()
+    user_id = _user_id(client, auth)
+    results = []
+
+    def write():
+        r = client.post("/transactions", json={
+            "account_id": bank["id"], "type": "income", "amount": "5", "transaction_date": "2024-01-05",
+        }, headers=auth)
+        results.append(r.status_code)
+
+    # recálculo a mitad de camino (calculado pero sin guardar) mientras llega una escritura
+    with Session(engine) as session:
+        lock_user(session, user_id)
+        rollups.rebuild_user(session, user_id)
+        accounts = session.exec(select(Account).where(Account.user_id == user_id)).all()
+        expected = ledger.compute_balances(session, accounts)
+        writer = threading.Thread(target=write)
+        writer.start()
+        time.sleep(0.3)
+        assert writer.is_alive() and not results
+        ledger.store_balances(session, accounts, expected)
+        session.commit()
+    writer.join(5)
+    assert results == [200]
+
+    balances = client.get("/accounts/balances", headers=auth).json()
+    assert balances[0]["balance"] == 105.0
+    with Session(engine) as session:
+        assert session.get(User, user_id) is not None
+        assert ledger.rebuild(session, fix=False) == []
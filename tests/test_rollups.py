@@ -0,0 +1,45 @@
+from datetime import date
+from uuid import UUID
+
+from sqlmodel import Session, select
+
+from app import rollups
+from app.db import engine
+from app.models import MonthlyRollup
+
+
+def _rollups(user_id) -> set:
+    with Session(engine) as session:
+        rows = session.exec(select(MonthlyRollup).where(MonthlyRollup.user_id == user_id)).all()
+        return {(r.month, r.account_id, r.category_id, getattr(r.type, "value", r.type), r.total, r.count) for r in rows}
+
+
+def test_rollups_follow_writes_and_match_rebuild(client, auth):
+    user_id = UUID(client.get("/auth/me", headers=auth).json()["user_id"])
+    bank = client.post("/accounts", json={"name": "bank", "type": "bank"}, headers=auth).json()
+    food = client.post("/categories", json={"name": "food", "type": "expense"}, headers=auth).json()
+    rows = [
+        {"account_id": bank["id"], "category_id": food["id"], "type": "expense", "amount": "10", "transaction_date": "2024-01-02"},
+        {"account_id": bank["id"], "category_id": food["id"], "type": "expense", "amount": "2.5", "transaction_date": "2024-01-31"},
+        {"account_id": bank["id"], "type": "income", "amount": "100", "transaction_date": "2024-02-01"},
+    ]
+    assert client.post("/transactions/bulk", json=rows[:2], headers=auth).status_code == 200
+    assert client.post("/transactions", json=rows[2], headers=auth).status_code == 200
+
+    bank_id, food_id = UUID(bank["id"]), UUID(food["id"])
+    incremental = _rollups(user_id)
+    assert incremental == {
+        (date(2024, 1, 1), bank_id, food_id, "expense", 1250, 2),
+        (date(2024, 2, 1), bank_id, rollups.NO_CATEGORY, "income", 10000, 1),
+    }
+
+    with Session(engine) as session:
+        rollups.rebuild_user(session, user_id)
+        session.commit()
+    assert _rollups(user_id) == incremental
+
+    r = client.get("/dashboard/categories", params={"from": "2024-01", "to": "2024-02"}, headers=auth)
+    assert r.status_code == 200, r.text
+    assert [(c["category_id"], c["type"], c["total"], c["count"]) for c in r.json()["categories"]] == [
+        (None, "income", 100.0, 1), (food["id"], "expense", 12.5, 2),
+    ]
@@ -0,0 +1,48 @@
+import pytest
+
+from app.search import _fts_query, unaccent
+
+
+def test_unaccent_and_fts_query():
+    assert unaccent("Más x Menós Ñandú") == "Mas x Menos Nandu"
+    assert unaccent(None) is None
+    assert _fts_query('super "mercado"') == '"super"* "mercado"*'
+    assert _fts_query("%-.") == ""
+
+
+@pytest.fixture
+def tx_ids(client, auth):
+    bank = client.post("/accounts", json={"name": "bank", "type": "bank"}, headers=auth).json()
+    rows = [
+        ("Compra semanal", "Más x Menos"),
+        ("Almuerzo", "Café Britt"),
+        ("Viaje al aeropuerto", "Uber"),
+        ("Café con leche", None),
+    ]
+    r = client.post("/transactions/bulk", json=[
+        {"account_id": bank["id"], "type": "expense", "amount": "1", "transaction_date": f"2024-06-0{i + 1}",
+         "description": description, "counterparty": counterparty}
+        for i, (description, counterparty) in enumerate(rows)
+    ], headers=auth)
+    assert r.json()["inserted"] == len(rows)
+    items = client.get("/transactions", params={"fields": "id,description"}, headers=auth).json()["items"]
+    return {t["description"]: t["id"] for t in items}
+
+
+def _search(client, auth, q, **params) -> list[str]:
+    r = client.get("/transactions", params={"q": q, "fields": "description", **params}, headers=auth)
+    assert r.status_code == 200, r.text
+    return [t["description"] for t in r.json()["items"]]
+
+
+def test_search_ignores_case_and_accents(client, auth, tx_ids):
+    assert set(_search(client, auth, "cafe")) == {"Almuerzo", "Café con leche"}
+    assert _search(client, auth, "MENOS") == ["Compra semanal"]
+    assert _search(client, auth, "aeropuerto uber") == ["Viaje al aeropuerto"]
+    assert _search(client, auth, "%") == []
+
+
+def test_relevance_sort(client, auth, tx_ids):
+    assert set(_search(client, auth, "café", sort="relevance")) == {"Almuerzo", "Café con leche"}
+    r = client.get("/transactions", params={"sort": "relevance"}, headers=auth)
+    assert r.status_code == 400
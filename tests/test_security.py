@@ -0,0 +1,79 @@
+import asyncio
+import threading
+import time
+from uuid import uuid4
+
+import anyio
+import pytest
+
+from app import security
+from app.security import PasswordPool, PasswordPoolBusy
+
+
+def _occupy(pool: PasswordPool) -> tuple[threading.Event, threading.Thread]:
+    # toma un worker del pool hasta que se libere el evento
+    gate = threading.Event()
+    thread = threading.Thread(target=lambda: asyncio.run(pool.run(gate.wait, 5)))
+    thread.start()
+    for _ in range(100):
+        if pool.stats()["in_flight"]:
+            break
+        time.sleep(0.01)
+    return gate, thread
+
+
+@pytest.fixture
+def credentials(client):
+    body = {"email": f"{uuid4().hex[:12]}@example.com", "password": "password1"}
+    assert client.post("/auth/register", json=body).status_code == 200
+    return body
+
+
+def test_pool_rejects_beyond_workers_and_queue():
+    pool = PasswordPool(workers=1, queue=0)
+    gate, thread = _occupy(pool)
+    with pytest.raises(PasswordPoolBusy):
+        asyncio.run(pool.run(time.sleep, 0))
+    gate.set()
+    thread.join(5)
+    assert asyncio.run(pool.run(sum, [1, 2])) == 3
+    assert pool.stats()["rejected"] == 1 and pool.stats()["completed"] == 2
+
+
+def test_full_pool_returns_503(client, credentials, monkeypatch):
+    pool = PasswordPool(workers=1, queue=0)
+    monkeypatch.setattr(security, "password_pool", pool)
+    gate, thread = _occupy(pool)
+    try:
+        r = client.post("/auth/login", json=credentials)
+        assert r.status_code == 503
+        assert r.headers["retry-after"] == str(security.settings.PWD_RETRY_AFTER_SEC)
+    finally:
+        gate.set()
+        thread.join(5)
+    assert client.post("/auth/login", json=credentials).status_code == 200
+
+
+def test_login_waits_for_bcrypt_without_a_thread(client, auth, credentials, monkeypatch):
+    # threadpool de un solo hilo: si el login lo ocupara mientras espera a bcrypt, /auth/me no respondería
+    async def limit(tokens):
+        anyio.to_thread.current_default_thread_limiter().total_tokens = tokens
+
+    pool = PasswordPool(workers=1, queue=4)
+    monkeypatch.setattr(security, "password_pool", pool)
+    gate, thread = _occupy(pool)
+    results = []
+    login = threading.Thread(target=lambda: results.append(client.post("/auth/login", json=credentials).status_code))
+    client.portal.call(limit, 1)
+    try:
+        login.start()
+        time.sleep(0.2)
+        assert login.is_alive()
+        assert client.get("/auth/me", headers=auth).status_code == 200
+        assert not results
+    finally:
+        gate.set()
+        thread.join(5)
+        login.join(10)
+        client.portal.call(limit, 40)
+    assert results == [200]
@@ -0,0 +1,120 @@
+import csv
+import io
+import json
+
+import pytest
+
+
+@pytest.fixture
+def bank(client, auth):
+    r = client.post("/accounts", json={"name": "bank", "type": "bank"}, headers=auth)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def _insert(client, auth, rows):
+    r = client.post("/transactions/bulk", json=rows, headers=auth)
+    assert r.status_code == 200 and r.json()["inserted"] == len(rows), r.text
+
+
+def _pages(client, auth, **params) -> list[list[dict]]:
+    pages, cursor = [], None
+    while True:
+        r = client.get("/transactions", params={**params, **({"cursor": cursor} if cursor else {})}, headers=auth)
+        assert r.status_code == 200, r.text
+        pages.append(r.json()["items"])
+        cursor = r.json()["next_cursor"]
+        if not cursor:
+            return pages
+
+
+def test_cursor_pages_through_equal_dates(client, auth, bank):
+    # mismo día (y mismo created_at dentro de un bulk): el desempate es (created_at, id)
+    rows = [{"account_id": bank["id"], "type": "expense", "amount": str(i + 1), "transaction_date": "2024-01-05",
+             "description": f"tx {i}"} for i in range(7)]
+    rows.append({"account_id": bank["id"], "type": "income", "amount": "1", "transaction_date": "2024-01-06"})
+    _insert(client, auth, rows)
+
+    pages = _pages(client, auth, limit=3)
+    assert [len(p) for p in pages] == [3, 3, 2]
+    items = [t for p in pages for t in p]
+    assert len({t["id"] for t in items}) == 8
+    assert items[0]["transaction_date"] == "2024-01-06"
+    keys = [(t["transaction_date"], t["created_at"], t["id"]) for t in items]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_cursor_keeps_filters_and_projection(client, auth, bank):
+    rows = [{"account_id": bank["id"], "type": "expense", "amount": "1", "transaction_date": f"2024-02-{d:02d}"}
+            for d in range(1, 6)]
+    _insert(client, auth, rows)
+
+    pages = _pages(client, auth, limit=2, from_date="2024-02-02", to_date="2024-02-04", fields="transaction_date")
+    assert [[t["transaction_date"] for t in p] for p in pages] == [["2024-02-04", "2024-02-03"], ["2024-02-02"]]
+    assert all(set(t) == {"transaction_date"} for p in pages for t in p)
+
+
+def test_bad_cursor_and_fields(client, auth):
+    assert client.get("/transactions", params={"cursor": "nope"}, headers=auth).status_code == 400
+    assert client.get("/transactions", params={"fields": "id,nope"}, headers=auth).status_code == 400
+
+
+def test_export_streams_csv_and_ndjson(client, auth, bank):
+    _insert(client, auth, [
+        {"account_id": bank["id"], "type": "income", "amount": "1200.5", "transaction_date": "2024-03-01",
+         "description": 'pago "marzo", parcial'},
+        {"account_id": bank["id"], "type": "expense", "amount": "3", "transaction_date": "2024-03-02"},
+        {"account_id": bank["id"], "type": "expense", "amount": "9", "transaction_date": "2023-03-02"},
+    ])
+
+    r = client.get("/transactions/export", params={"from_date": "2024-01-01"}, headers=auth)
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(r.text)))
+    assert [(row["transaction_date"], row["type"], row["amount"]) for row in rows] == [
+        ("2024-03-02", "expense", "3.0"), ("2024-03-01", "income", "1200.5"),
+    ]
+    assert rows[1]["description"] == 'pago "marzo", parcial'
+    assert rows[0]["description"] == "" and rows[0]["account_id"] == bank["id"]
+
+    r = client.get("/transactions/export", params={"format": "ndjson"}, headers=auth)
+    assert r.status_code == 200
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert [t["amount"] for t in lines] == [3.0, 1200.5, 9.0]
+    assert lines[0]["description"] is None
+
+
+def test_bulk_reports_row_errors_and_dedupes(client, auth, bank):
+    coffee = {"account_id": bank["id"], "type": "expense", "amount": "2.5", "transaction_date": "2024-04-01",
+              "description": "Coffee"}
+    r = client.post("/transactions/bulk", json=[
+        coffee, coffee, {**coffee, "amount": "-1"}, {**coffee, "type": "transfer_in"},
+        {**coffee, "account_id": "00000000-0000-0000-0000-000000000001"},
+    ], headers=auth)
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert body["inserted"] == 2 and body["duplicates"] == []
+    assert [e["row"] for e in body["errors"]] == [2, 3, 4]
+
+    # ya hay dos cafés iguales: de tres, dos son duplicados (comparación sin mayúsculas)
+    r = client.post("/transactions/bulk", params={"dedupe": "true"},
+                    json=[{**coffee, "description": " coffee"}, coffee, coffee], headers=auth)
+    assert r.json()["inserted"] == 1 and r.json()["duplicates"] == [0, 1]
+
+
+def test_bulk_accepts_csv(client, auth, bank):
+    body = (
+        "account_id,type,amount,transaction_date,description,category_id\n"
+        f"{bank['id']},income,10,2024-05-01,salary,\n"
+        f"{bank['id']},expense,abc,2024-05-02,,\n"
+    )
+    r = client.post("/transactions/bulk", content=body.encode(), headers={**auth, "content-type": "text/csv"})
+    assert r.status_code == 200, r.text
+    assert r.json()["inserted"] == 1 and [e["row"] for e in r.json()["errors"]] == [1]
+    assert client.get(f"/accounts/{bank['id']}/balance", headers=auth).json()["balance"] == 10.0
+
+
+def test_bulk_rejects_bad_bodies(client, auth):
+    assert client.post("/transactions/bulk", json={"rows": []}, headers=auth).status_code == 400
+    r = client.post("/transactions/bulk", content=b"{", headers={**auth, "content-type": "application/json"})
+    assert r.status_code == 400